@@ -0,0 +1,74 @@
+"""
+Throughput of pre-forked workers sharing a warmed-up parent process, like gunicorn --preload.
+
+Each worker runs queries whose answers are unique to the worker and the query,
+so that any response delivered to the wrong worker (a shared socket) is counted as a corruption.
+It needs a running nebula cluster configured the same way as the application.
+
+    python -m benchmarks.fork_workers --workers 4 --queries 2000 --threads 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+from nebula_carina.ngql.connection.connection import run_ngql
+
+
+def _worker(worker_id: int, queries: int, threads: int, output):
+    corrupted = [0]
+    lock = threading.Lock()
+
+    def work(thread_id: int):
+        for i in range(thread_id, queries, threads):
+            expected = f'{worker_id}-{os.getpid()}-{i}'
+            result = run_ngql(f'YIELD "{expected}" AS token;')
+            if result.row_values(0)[0].as_string() != expected:
+                with lock:
+                    corrupted[0] += 1
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=work, args=(i, )) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    output.put({
+        'worker': worker_id, 'pid': os.getpid(), 'queries': queries,
+        'seconds': time.perf_counter() - start, 'corrupted': corrupted[0],
+    })
+
+
+def run(workers: int, queries: int, threads: int) -> dict:
+    # warm up the parent, so that the children inherit a live connection pool and session pool
+    run_ngql('YIELD 1;')
+    context = multiprocessing.get_context('fork')
+    output = context.Queue()
+    start = time.perf_counter()
+    processes = [context.Process(target=_worker, args=(i, queries, threads, output)) for i in range(workers)]
+    for process in processes:
+        process.start()
+    results = [output.get() for _ in processes]
+    for process in processes:
+        process.join()
+    seconds = time.perf_counter() - start
+    return {
+        'workers': workers,
+        'threads_per_worker': threads,
+        'total_queries': workers * queries,
+        'seconds': seconds,
+        'queries_per_second': workers * queries / seconds,
+        'corrupted': sum(r['corrupted'] for r in results),
+        'per_worker': sorted(results, key=lambda r: r['worker']),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+    print(json.dumps(run(args.workers, args.queries, args.threads), indent=2))
@@ -0,0 +1,59 @@
+"""
+Decode the same 10k-row MATCH result through the thrift ResultSet path and the execute_json path.
+Both timings start from the raw response bytes and end with the pydantic models, no cluster is needed.
+
+    python -m benchmarks.json_decode --rows 10000
+"""
+import argparse
+import json
+import time
+
+from tests import fixtures
+from example.models import VirtualCharacter
+from nebula_carina.models.model_builder import ModelBuilder
+from nebula_carina.models.models import EdgeModel
+from nebula_carina.utils.utils import json_loads
+
+
+def _measure(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(rows: int, repeat: int) -> dict:
+    cases = {
+        'vertex': (
+            {'v': VirtualCharacter},
+            fixtures.serialize_response(fixtures.make_vertex_data_set(rows)), fixtures.make_vertex_json(rows)
+        ),
+        'vertex_edge_vertex': (
+            {'v': VirtualCharacter, 'e': EdgeModel, 'v2': VirtualCharacter},
+            fixtures.serialize_response(fixtures.make_edge_data_set(rows)), fixtures.make_edge_json(rows)
+        ),
+    }
+    report = {'rows': rows, 'json_parser': json_loads.__module__, 'cases': {}}
+    for name, (to_model_dict, thrift_payload, json_payload) in cases.items():
+        thrift_seconds = _measure(lambda: list(ModelBuilder.decode(
+            fixtures.deserialize_result_set(thrift_payload), to_model_dict
+        )), repeat)
+        json_seconds = _measure(lambda: list(ModelBuilder.decode_json(json_loads(json_payload), to_model_dict)), repeat)
+        report['cases'][name] = {
+            'thrift_seconds': thrift_seconds,
+            'json_seconds': json_seconds,
+            'thrift_rows_per_second': rows / thrift_seconds,
+            'json_rows_per_second': rows / json_seconds,
+            'speedup': thrift_seconds / json_seconds,
+        }
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.repeat), indent=2))
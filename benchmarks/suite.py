@@ -0,0 +1,190 @@
+"""
+The throughput of the hot paths without a cluster, written as json so that a release can be gated on the last one.
+    decode: the rows per second of ModelBuilder.match, replaying the synthetic responses of the fixtures
+    build: the statements per second of insert_vertex_ngql, insert_edge_ngql and NodeCondition.__str__
+    value2db_str: the values per second of each data type
+    write: the saves per second of the models, against the in-memory backend
+
+    python -m benchmarks.suite --output current.json
+    python -m benchmarks.suite --baseline last_release.json --tolerance 0.2  # exit 1 on a regression
+"""
+import argparse
+import json
+import sys
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time
+
+import pytz
+
+from tests import fixtures
+from example.models import VirtualCharacter, Figure, Source, Love
+from nebula_carina.models.model_builder import ModelBuilder
+from nebula_carina.models.models import EdgeModel
+from nebula_carina.ngql.connection.backend import Backend
+from nebula_carina.ngql.query.conditions import NodeCondition
+from nebula_carina.ngql.record.edge import insert_edge_ngql
+from nebula_carina.ngql.record.vertex import insert_vertex_ngql
+from nebula_carina.ngql.schema import data_types
+from nebula_carina.ngql.statements.edge import EdgeValue
+from nebula_carina.testing import in_memory_backend
+
+
+class _ReplayBackend(Backend):
+    """
+    answer every ngql with the same response
+    """
+
+    def __init__(self, data_set, json_payload: bytes):
+        self.data_set = data_set
+        self.json_payload = json_payload
+
+    def execute(self, ngql, space, params, as_json):
+        if as_json:
+            return fixtures.load_json(self.json_payload)
+        return fixtures.make_result_set(self.data_set)
+
+
+def _throughput(func, operations: int, repeat: int) -> float:
+    """
+    the operations per second of the best of repeat runs of func
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return operations / best
+
+
+def _decode_cases(rows: int, repeat: int) -> dict[str, float]:
+    cases = {
+        'vertex': (
+            '(v:figure:source)', {'v': VirtualCharacter},
+            fixtures.make_vertex_data_set(rows), fixtures.make_vertex_json(rows)
+        ),
+        'vertex_edge_vertex': (
+            '(v)-[e:love]->(v2)', {'v': VirtualCharacter, 'e': EdgeModel, 'v2': VirtualCharacter},
+            fixtures.make_edge_data_set(rows), fixtures.make_edge_json(rows)
+        ),
+    }
+    report = {}
+    for name, (pattern, to_model_dict, data_set, json_payload) in cases.items():
+        with in_memory_backend(_ReplayBackend(data_set, json_payload)):
+            for as_json in (False, True):
+                report[f'{name}{"_json" if as_json else ""}'] = _throughput(lambda: list(ModelBuilder.match(
+                    pattern, to_model_dict, as_json=as_json, coalesce=False
+                )), rows, repeat)
+    return report
+
+
+def _build_cases(operations: int, repeat: int) -> dict[str, float]:
+    tag_props = OrderedDict(figure=['name', 'age', 'is_virtual'], source=['name'])
+    vertex_values = {f'char_{i}': ['"name"', '33', 'true', '"movie"'] for i in range(10)}
+    edge_values = [EdgeValue(f'char_{i}', f'char_{i + 1}', ['"gun"', '40'], ranking=i) for i in range(10)]
+    condition = NodeCondition(v__id__in=['char_1', 'char_2'], v__figure__age__gte=18, v__source__name='movie')
+
+    def loop(build):
+        def run():
+            for _ in range(operations):
+                build()
+        return run
+
+    return {
+        name: _throughput(loop(build), operations, repeat) for name, build in (
+            ('insert_vertex_ngql', lambda: insert_vertex_ngql(tag_props, vertex_values)),
+            ('insert_edge_ngql', lambda: insert_edge_ngql('love', ['way', 'times'], edge_values)),
+            ('node_condition', lambda: str(condition)),
+        )
+    }
+
+
+def _value2db_str_cases(operations: int, repeat: int) -> dict[str, float]:
+    values = {
+        data_types.Int64: 1 << 40, data_types.Int32: 1 << 20, data_types.Int16: 1 << 10, data_types.Int8: 100,
+        data_types.Float: 3.14, data_types.Double: 2.718281828, data_types.String: 'some string',
+        data_types.FixedString: 'fixed', data_types.Bool: True, data_types.Date: date(2022, 1, 1),
+        data_types.Time: dt_time(12, 30, tzinfo=pytz.utc), data_types.Datetime: datetime(2022, 1, 1, tzinfo=pytz.utc),
+    }
+
+    def loop(data_type, value):
+        def run():
+            for _ in range(operations):
+                data_type.value2db_str(value)
+        return run
+
+    return {
+        data_type.__name__: _throughput(loop(data_type, value), operations, repeat)
+        for data_type, value in values.items()
+    }
+
+
+def _write_cases(operations: int, repeat: int) -> dict[str, float]:
+    characters = [
+        VirtualCharacter(vid=f'char_{i}', figure=Figure(name=f'name{i}', age=i % 100), source=Source(name='movie'))
+        for i in range(operations)
+    ]
+    edges = [
+        EdgeModel(src_vid=f'char_{i}', dst_vid=f'char_{i + 1}', ranking=0, edge_type=Love(way='gun', times=i % 100))
+        for i in range(operations)
+    ]
+
+    def loop(models):
+        def run():
+            with in_memory_backend():
+                for model in models:
+                    model.save()
+        return run
+
+    return {
+        'vertex_save': _throughput(loop(characters), operations, repeat),
+        'edge_save': _throughput(loop(edges), operations, repeat),
+    }
+
+
+def run(rows: int, operations: int, repeat: int) -> dict:
+    return {
+        'rows': rows,
+        'operations': operations,
+        'results': {
+            'decode': _decode_cases(rows, repeat),
+            'build': _build_cases(operations, repeat),
+            'value2db_str': _value2db_str_cases(operations, repeat),
+            'write': _write_cases(operations, repeat),
+        },
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """
+    :return: the cases of current slower than baseline by more than the tolerance, e.g. 0.2 for 20%
+    """
+    regressions = []
+    for group, cases in current['results'].items():
+        for name, throughput in cases.items():
+            if (before := baseline['results'].get(group, {}).get(name)) and throughput < before * (1 - tolerance):
+                regressions.append(f'{group}.{name}: {throughput:.0f}/s, was {before:.0f}/s')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--operations', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='the json file to write the results to, default to stdout')
+    parser.add_argument('--baseline', help='the json results of a former run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+    report = run(args.rows, args.operations, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for regression in regressions:
+            print(f'regression {regression}', file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,58 @@
+"""
+The latency of BaseVertexManager.get, a FETCH PROP point read, against the MATCH it used to run.
+It needs a running nebula cluster with the schema of the example models, or --memory for the client side only.
+
+    python -m benchmarks.vertex_get --vertices 100 --queries 2000
+"""
+import argparse
+import json
+import time
+
+from example.models import VirtualCharacter, Figure, Source
+from nebula_carina.models.model_builder import ModelBuilder
+from nebula_carina.ngql.connection.connection import run_ngql
+from nebula_carina.ngql.query.match import Limit, match_ngql
+from nebula_carina.testing import in_memory_backend
+
+
+def _match_get(vid: str) -> VirtualCharacter:
+    ngql = match_ngql(f'(v{VirtualCharacter.get_db_name_pattern()})', 'v', 'id(v) == $vid', limit=Limit(1))
+    results = run_ngql(ngql, space=VirtualCharacter.get_space(), params={'vid': vid}, coalesce=False)
+    return next(iter(ModelBuilder.decode(results, {'v': VirtualCharacter})))['v']
+
+
+def _percentiles(latencies: list[float]) -> dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1000,
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+    }
+
+
+def run(vertices: int, queries: int) -> dict:
+    vids = [f'bench_get_{i}' for i in range(vertices)]
+    for i, vid in enumerate(vids):
+        VirtualCharacter(vid=vid, figure=Figure(name=f'name{i}', age=i % 100), source=Source(name='bench')).save()
+    report = {'vertices': vertices, 'queries': queries, 'cases': {}}
+    for name, get in (('fetch', VirtualCharacter.objects.get), ('match', _match_get)):
+        latencies = []
+        for i in range(queries):
+            start = time.perf_counter()
+            get(vids[i % vertices])
+            latencies.append(time.perf_counter() - start)
+        report['cases'][name] = _percentiles(latencies)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vertices', type=int, default=100)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--memory', action='store_true', help='run against the in-memory backend')
+    args = parser.parse_args()
+    if args.memory:
+        with in_memory_backend():
+            print(json.dumps(run(args.vertices, args.queries), indent=2))
+    else:
+        print(json.dumps(run(args.vertices, args.queries), indent=2))
@@ -0,0 +1,145 @@
+"""
+the hooks observing the queries and the models, for tracing, metrics or counting queries
+nothing is called when no hook is registered, so the hooks cost nothing until they are used
+"""
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Type, Callable
+
+
+class Hook(object):
+    """
+    override the methods of the events to observe, the others do nothing
+    the context of an event is the same dict for its before and after calls, to keep what is needed in between
+    """
+
+    def before_execute(self, ngql: str, context: dict[str, any]):
+        """
+        :param context: the space, params, kind, as_json and timeout of the ngql
+        """
+
+    def after_execute(self, ngql: str, result, elapsed: float, error: Exception | None, context: dict[str, any]):
+        """
+        :param result: the ResultSet, or the decoded json response, None when an error is raised
+        """
+
+    def before_model_event(self, event: str, model: Type, context: dict[str, any]):
+        """
+        :param event: save, insert, upsert, delete or decode
+        :param context: the instance of save, insert and upsert, the vid_list or the edge_definitions of delete,
+            the decoded instance after decode
+        """
+
+    def after_model_event(
+            self, event: str, model: Type, elapsed: float, error: Exception | None, context: dict[str, any]
+    ):
+        pass
+
+
+_hooks: tuple[Hook, ...] = ()
+_hooks_lock = threading.Lock()
+
+
+def get_hooks() -> tuple[Hook, ...]:
+    return _hooks
+
+
+def register_hook(hook: Hook):
+    global _hooks
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks = _hooks + (hook, )
+
+
+def unregister_hook(hook: Hook):
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(h for h in _hooks if h is not hook)
+
+
+@contextmanager
+def hooked(hook: Hook):
+    """
+    register the hook within the block
+    """
+    register_hook(hook)
+    try:
+        yield hook
+    finally:
+        unregister_hook(hook)
+
+
+def execute(ngql: str, run, context: dict[str, any]):
+    """
+    run the ngql by run(), telling the hooks before and after
+    """
+    if not (hooks := _hooks):
+        return run()
+    for hook in hooks:
+        hook.before_execute(ngql, context)
+    start = time.perf_counter()
+    try:
+        result = run()
+    except Exception as e:
+        elapsed = time.perf_counter() - start
+        for hook in hooks:
+            hook.after_execute(ngql, None, elapsed, e, context)
+        raise
+    elapsed = time.perf_counter() - start
+    for hook in hooks:
+        hook.after_execute(ngql, result, elapsed, None, context)
+    return result
+
+
+@contextmanager
+def model_event(event: str, model: Type, **context):
+    """
+    tell the hooks about the event of the model happening within the block
+    """
+    if not (hooks := _hooks):
+        yield context
+        return
+    for hook in hooks:
+        hook.before_model_event(event, model, context)
+    start = time.perf_counter()
+    try:
+        yield context
+    except Exception as e:
+        elapsed = time.perf_counter() - start
+        for hook in hooks:
+            hook.after_model_event(event, model, elapsed, e, context)
+        raise
+    elapsed = time.perf_counter() - start
+    for hook in hooks:
+        hook.after_model_event(event, model, elapsed, None, context)
+
+
+def emits(event: str):
+    """
+    make a method of a model tell the hooks about the event, with the model instance in the context
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not _hooks:
+                return func(self, *args, **kwargs)
+            with model_event(event, type(self), instance=self):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observed_decoder(model: Type, decode: Callable) -> Callable:
+    """
+    the decoder of the model values, telling the hooks about each decoded instance when any hook is registered
+    """
+    if not _hooks:
+        return decode
+
+    def wrapper(*args):
+        with model_event('decode', model) as context:
+            context['instance'] = instance = decode(*args)
+        return instance
+    return wrapper
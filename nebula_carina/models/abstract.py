@@ -3,11 +3,27 @@ from abc import ABC
 from nebula3.common.ttypes import Vertex, Edge
 
 
-class NebulaConvertableProtocol(ABC):
+class SpaceDeclarable(object):
+    @classmethod
+    def get_space(cls) -> str | None:
+        """
+        the space declared by Meta.space, None means the default space
+        """
+        return getattr(getattr(cls, 'Meta', None), 'space', None)
+
+
+class NebulaConvertableProtocol(SpaceDeclarable, ABC):
     @classmethod
     def from_nebula_db_cls(cls, raw_db_item: Vertex | Edge):
         pass
 
+    @classmethod
+    def from_nebula_json(cls, value: dict[str, any], meta: dict[str, any]):
+        """
+        convert an item of the json results, whose properties are in value and whose id is in meta
+        """
+        pass
+
     def dict(self, *args, **kwargs):
         # this method will be overridden by pydantic
         raise NotImplementedError
@@ -1,129 +1,402 @@
 from abc import ABC
+from typing import Callable, Type, Iterable
 
+from nebula_carina import tracing
+from nebula_carina.hooks import model_event, observed_decoder
+from nebula_carina.models.abstract import NebulaConvertableProtocol
 from nebula_carina.models.errors import VertexDoesNotExistError, EdgeDoesNotExistError
-from nebula_carina.ngql.connection.connection import run_ngql
-from nebula_carina.ngql.query.conditions import RawCondition
-from nebula_carina.ngql.query.match import Limit
-from nebula_carina.models.model_builder import ModelBuilder
+from nebula_carina.ngql.connection.connection import run_ngql, run_in_executor, run_ngql_json
+from nebula_carina.ngql.query.conditions import Condition
+from nebula_carina.ngql.query.match import Limit, match_ngql
+from nebula_carina.models.model_builder import ModelBuilder, SingleMatchResult
 from nebula_carina.ngql.record.edge import delete_edge_ngql
-from nebula_carina.ngql.record.vertex import delete_vertex_ngql
+from nebula_carina.ngql.record.vertex import delete_vertex_ngql, fetch_vertex_ngql
 from nebula_carina.ngql.statements.edge import EdgeDefinition
-from nebula_carina.utils.utils import vid2str
+from nebula_carina.settings import database_settings
+from nebula_carina.utils.utils import read_str, vid2str
+
+
+class BulkResult(dict):
+    """
+    the vertices keyed by vid, with the vids not found in missing
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.missing: list[str | int] = []
+
+
+def chunk_vids(vid_list: list[str | int], max_size: int) -> Iterable[list[str | int]]:
+    """
+    split the vids so that the statement listing each chunk stays within max_size bytes, at least one vid per chunk
+    """
+    chunk, size = [], 0
+    for vid in vid_list:
+        vid_size = len(vid2str(vid).encode('utf-8')) + 2  # with the separator
+        if chunk and size + vid_size > max_size:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(vid)
+        size += vid_size
+    if chunk:
+        yield chunk
 
 
 class Manager(ABC):
+    # the limits are part of the template shapes, so the templates are dropped once there are too many of them
+    MAX_TEMPLATES = 256
+
     def __init__(self):
         self.model = None
+        self._templates = {}
 
     def register(self, model):
         self.model = model
 
+    def _template(self, key: tuple, render: Callable[[], str]) -> str:
+        """
+        the ngql template of a method in a shape, rendered once since every model has its own manager
+        """
+        try:
+            return self._templates[key]
+        except KeyError:
+            if len(self._templates) >= self.MAX_TEMPLATES:
+                self._templates.clear()
+            template = self._templates[key] = render()
+            return template
+
+    def _match(
+            self, key: tuple, render: Callable[[], str],
+            to_model_dict: dict[str, Type[NebulaConvertableProtocol]], params: dict[str, any], space: str | None,
+            timeout: float | None = None
+    ) -> Iterable[SingleMatchResult]:
+        def query():
+            with tracing.span('nebula_carina.build', method=key[0]):
+                ngql = self._template(key, render)
+
+            def run():
+                if database_settings.json_results:
+                    return ModelBuilder.decode_json(
+                        run_ngql_json(ngql, space=space, params=params, timeout=timeout, coalesce=False), to_model_dict
+                    )
+                return ModelBuilder.decode(
+                    run_ngql(ngql, space=space, params=params, timeout=timeout, coalesce=False), to_model_dict
+                )
+
+            return self._coalesce((space, ngql, params, to_model_dict), run, timeout, ngql)
+
+        return self._traced('nebula_carina.match', to_model_dict, space, query)
+
+    @staticmethod
+    def _traced(
+            name: str, to_model_dict: dict[str, Type[NebulaConvertableProtocol]], space: str | None,
+            query: Callable[[], Iterable]
+    ) -> Iterable:
+        """
+        run the query in a span named name, like the model builder, the models being decoded as they are consumed
+        """
+        models = {key: model.__name__ for key, model in to_model_dict.items()}
+        with tracing.span(name, models=models, space=space) as span:
+            results = query()
+        if span is None:
+            return results
+        return tracing.traced(results, 'nebula_carina.decode', span, models=models)
+
+    @staticmethod
+    def _coalesce(
+            key: tuple, run: Callable[[], Iterable], timeout: float | None = None, ngql: str | None = None
+    ) -> Iterable:
+        """
+        :param key: what tells the identical reads apart, e.g. the space, the ngql and its parameters
+        :param timeout: the seconds to wait for the identical read in flight
+        """
+        if not database_settings.coalesce_reads:
+            return run()
+        return ModelBuilder.coalesce((*key, database_settings.json_results), run, timeout, ngql)
+
 
 class BaseVertexManager(Manager):
-    def get(self, vid: str | int):
-        try:
-            return list(
-                ModelBuilder.match(
-                    f'(v{self.model.get_db_name_pattern()})', {'v': self.model},
-                    condition=RawCondition(f"id(v) == {vid2str(vid)}"),
-                    limit=Limit(1)
+    def _fetch(self, vid_list: list[str | int], timeout: float | None) -> Iterable[NebulaConvertableProtocol]:
+        """
+        fetch the vertices by a point read, which skips the planner of MATCH,
+        but also returns the vertices having only some of the tags, so they are dropped here
+        """
+        space = self.model.get_space()
+
+        def query():
+            with tracing.span('nebula_carina.build', method='fetch'):
+                # the optional tags are fetched too, the vertices lacking a required one are dropped below
+                tag_models = [(tag_model, required) for _, tag_model, required in self.model.iterate_tag_models()]
+                tags = [tag_model for tag_model, required in tag_models if required]
+                ngql = fetch_vertex_ngql([tag_model.db_name() for tag_model, _ in tag_models], vid_list)
+            if database_settings.json_results:
+                decode = observed_decoder(self.model, self.model.from_nebula_json)
+                # a tag without properties leaves nothing in the json results
+                expected = {tag_model.db_name() for tag_model in tags if tag_model.get_db_field_names()}
+                response = run_ngql_json(ngql, space=space, timeout=timeout, coalesce=False)
+                return (
+                    decode(data['row'][0], data['meta'][0]) for data in response['results'][0].get('data') or []
+                    if expected <= {key.split('.', 1)[0] for key in data['row'][0]}
                 )
-            )[0]['v']
-        except IndexError:
+            decode = observed_decoder(self.model, self.model.from_nebula_db_cls)
+            expected = {tag_model.db_name() for tag_model in tags}
+            results = run_ngql(ngql, space=space, timeout=timeout, coalesce=False)
+            return (
+                decode(vertex) for vertex in (row.values[0].get_vVal() for row in results.rows())
+                if expected <= {read_str(tag.name) for tag in vertex.tags}
+            )
+
+        return self._traced('nebula_carina.fetch', {'v': self.model}, space, query)
+
+    def get(self, vid: str | int, *, timeout: float = None):
+        vertices = self._coalesce(('fetch', self.model, vid), lambda: self._fetch([vid], timeout), timeout)
+        try:
+            return next(iter(vertices))
+        except StopIteration:
             raise VertexDoesNotExistError(vid)
 
-    def delete(self, vid_list: list[str, int], with_edge: bool = True):
-        return run_ngql(delete_vertex_ngql(vid_list, with_edge))
+    def in_bulk(self, vid_list: list[str | int], *, timeout: float = None) -> 'BulkResult':
+        """
+        get the vertices by a FETCH per chunk of vids instead of a round trip per vid
+        :return: the vertices keyed by vid, the vids not found are listed in missing instead of raising
+        """
+        vid_list = list(dict.fromkeys(vid_list))
+        vertices = BulkResult()
+        for chunk in chunk_vids(vid_list, database_settings.max_statement_size):
+            vertices.update((vertex.vid, vertex) for vertex in self._fetch(chunk, timeout))
+        vertices.missing = [vid for vid in vid_list if vid not in vertices]
+        return vertices
+
+    def get_many(self, vid_list: list[str | int], *, timeout: float = None) -> list:
+        """
+        :return: the vertices found, in the order of the vids
+        """
+        vertices = self.in_bulk(vid_list, timeout=timeout)
+        return [vertices[vid] for vid in dict.fromkeys(vid_list) if vid in vertices]
+
+    def delete(self, vid_list: list[str, int], with_edge: bool = True, *, timeout: float = None):
+        with model_event('delete', self.model, vid_list=vid_list):
+            return run_ngql(delete_vertex_ngql(vid_list, with_edge), space=self.model.get_space(), timeout=timeout)
+
+    async def aget(self, vid: str | int, *, timeout: float = None):
+        return await run_in_executor(self.get, vid, timeout=timeout)
+
+    async def ain_bulk(self, vid_list: list[str | int], *, timeout: float = None) -> 'BulkResult':
+        return await run_in_executor(self.in_bulk, vid_list, timeout=timeout)
+
+    async def aget_many(self, vid_list: list[str | int], *, timeout: float = None) -> list:
+        return await run_in_executor(self.get_many, vid_list, timeout=timeout)
+
+    async def adelete(self, vid_list: list[str, int], with_edge: bool = True, *, timeout: float = None):
+        return await run_in_executor(self.delete, vid_list, with_edge, timeout=timeout)
 
     # easy functions
     def find_sources(
             self, dst_vid: str | int, edge_type=None, *,
-            distinct=False, limit: Limit = None
+            distinct=False, limit: Limit = None, timeout: float = None
     ):
         if edge_type is None:
             from nebula_carina.models.models import EdgeTypeModel
             edge_type = EdgeTypeModel
         return [
-            r['v1'] for r in ModelBuilder.match(
-                f'(v1{self.model.get_db_name_pattern()})-[e{edge_type.get_db_name_pattern()}]->(v2)',
-                {'v1': self.model},
-                distinct_field='v1' if distinct else None,
-                condition=RawCondition(
-                    f"id(v2) == {vid2str(dst_vid)}"
+            r['v1'] for r in self._match(
+                ('find_sources', edge_type, distinct, limit),
+                lambda: match_ngql(
+                    f'(v1{self.model.get_db_name_pattern()})-[e{edge_type.get_db_name_pattern()}]->(v2)',
+                    'DISTINCT v1' if distinct else 'v1', 'id(v2) == $vid', limit=limit
                 ),
-                limit=limit
+                {'v1': self.model}, {'vid': dst_vid}, self.model.get_space(), timeout
             )
         ]
 
     def find_destinations(
             self, src_vid: str | int, edge_type, *,
-            distinct=False, limit: Limit = None
+            distinct=False, limit: Limit = None, timeout: float = None
     ):
         if edge_type is None:
             from nebula_carina.models.models import EdgeTypeModel
             edge_type = EdgeTypeModel
         return [
-            r['v2'] for r in ModelBuilder.match(
-                f'(v1)-[e{edge_type.get_db_name_pattern()}]->(v2{self.model.get_db_name_pattern()})',
-                {'v2': self.model},
-                distinct_field='v2' if distinct else None,
-                condition=RawCondition(
-                    f"id(v1) == {vid2str(src_vid)}"
+            r['v2'] for r in self._match(
+                ('find_destinations', edge_type, distinct, limit),
+                lambda: match_ngql(
+                    f'(v1)-[e{edge_type.get_db_name_pattern()}]->(v2{self.model.get_db_name_pattern()})',
+                    'DISTINCT v2' if distinct else 'v2', 'id(v1) == $vid', limit=limit
                 ),
-                limit=limit
+                {'v2': self.model}, {'vid': src_vid}, self.model.get_space(), timeout
+            )
+        ]
+
+    async def afind_sources(
+            self, dst_vid: str | int, edge_type=None, *,
+            distinct=False, limit: Limit = None, timeout: float = None
+    ):
+        return await run_in_executor(
+            self.find_sources, dst_vid, edge_type, distinct=distinct, limit=limit, timeout=timeout
+        )
+
+    async def afind_destinations(
+            self, src_vid: str | int, edge_type, *,
+            distinct=False, limit: Limit = None, timeout: float = None
+    ):
+        return await run_in_executor(
+            self.find_destinations, src_vid, edge_type, distinct=distinct, limit=limit, timeout=timeout
+        )
+
+    def go(
+            self, from_vids: str | int | list[str | int], over=None, *,
+            yield_: str = None, direction: str = 'out', steps: int | tuple[int, int] = 1, distinct=False,
+            condition: Condition = None, limit: Limit = None, timeout: float = None
+    ):
+        """
+        the vertices reached from the vids by GO, e.g. VirtualCharacter.objects.go('char_test1', Love, steps=(1, 2))
+        :param yield_: the expression of the vertices, default to the vertex reached (go.DESTINATION)
+        :param direction: out, in or both
+        """
+        return [
+            r['v'] for r in ModelBuilder.go(
+                from_vids, over, {'v': self.model}, yield_=yield_ and {'v': yield_}, direction=direction, steps=steps,
+                distinct=distinct, condition=condition, limit=limit, timeout=timeout
             )
         ]
 
+    async def ago(
+            self, from_vids: str | int | list[str | int], over=None, *,
+            yield_: str = None, direction: str = 'out', steps: int | tuple[int, int] = 1, distinct=False,
+            condition: Condition = None, limit: Limit = None, timeout: float = None
+    ):
+        return await run_in_executor(
+            self.go, from_vids, over, yield_=yield_, direction=direction, steps=steps, distinct=distinct,
+            condition=condition, limit=limit, timeout=timeout
+        )
+
 
 class BaseEdgeManager(Manager):
     def find_between(
             self, src_vid: str | int, dst_vid: str | int, edge_type=None,
             *,
-            limit: Limit = None
+            limit: Limit = None, timeout: float = None, space: str = None
     ):
+        """
+        :param space: the space of the edges, default to the space of the edge type
+        """
         if edge_type is None:
             from nebula_carina.models.models import EdgeTypeModel
             edge_type = EdgeTypeModel
         return [
-            r['e'] for r in ModelBuilder.match(
-                    f'(v1)-[e{edge_type.get_db_name_pattern()}]->(v2)', {'e': self.model},
-                    condition=RawCondition(
-                        f"id(v1) == {vid2str(src_vid)} AND id(v2) == {vid2str(dst_vid)}"
-                    ), limit=limit
-                )
+            r['e'] for r in self._match(
+                ('find_between', edge_type, limit),
+                lambda: match_ngql(
+                    f'(v1)-[e{edge_type.get_db_name_pattern()}]->(v2)', 'e',
+                    'id(v1) == $src_vid AND id(v2) == $dst_vid', limit=limit
+                ),
+                {'e': self.model}, {'src_vid': src_vid, 'dst_vid': dst_vid}, space or edge_type.get_space(), timeout
+            )
         ]
 
-    def find_by_source(self, src_vid: str, edge_type=None, *, limit: Limit = None):
+    def find_by_source(
+            self, src_vid: str, edge_type=None, *, limit: Limit = None, timeout: float = None, space: str = None
+    ):
         if edge_type is None:
             from nebula_carina.models.models import EdgeTypeModel
             edge_type = EdgeTypeModel
         return [
-            r['e'] for r in ModelBuilder.match(
-                    f'(v1)-[e{edge_type.get_db_name_pattern()}]->()', {'e': self.model},
-                    condition=RawCondition(
-                        f"id(v1) == {vid2str(src_vid)}"
-                    ), limit=limit
-                )
+            r['e'] for r in self._match(
+                ('find_by_source', edge_type, limit),
+                lambda: match_ngql(
+                    f'(v1)-[e{edge_type.get_db_name_pattern()}]->()', 'e', 'id(v1) == $vid', limit=limit
+                ),
+                {'e': self.model}, {'vid': src_vid}, space or edge_type.get_space(), timeout
+            )
         ]
 
-    def find_by_destination(self, dst_vid: str, edge_type, *, limit: Limit = None):
+    def find_by_destination(
+            self, dst_vid: str, edge_type, *, limit: Limit = None, timeout: float = None, space: str = None
+    ):
         if edge_type is None:
             from nebula_carina.models.models import EdgeTypeModel
             edge_type = EdgeTypeModel
         return [
-            r['e'] for r in ModelBuilder.match(
-                    f'()-[e{edge_type.get_db_name_pattern()}]->(v2)', {'e': self.model},
-                    condition=RawCondition(
-                        f"id(v2) == {vid2str(dst_vid)}"
-                    ), limit=limit
-                )
+            r['e'] for r in self._match(
+                ('find_by_destination', edge_type, limit),
+                lambda: match_ngql(
+                    f'()-[e{edge_type.get_db_name_pattern()}]->(v2)', 'e', 'id(v2) == $vid', limit=limit
+                ),
+                {'e': self.model}, {'vid': dst_vid}, space or edge_type.get_space(), timeout
+            )
         ]
 
-    def get(self, src_vid: str | int, dst_vid: str | int, edge_type):
+    def get(self, src_vid: str | int, dst_vid: str | int, edge_type, *, timeout: float = None):
         try:
-            return self.find_between(src_vid, dst_vid, edge_type)[0]
+            return self.find_between(src_vid, dst_vid, edge_type, timeout=timeout)[0]
         except IndexError:
             raise EdgeDoesNotExistError(src_vid, dst_vid)
 
-    def delete(self, edge_definitions: list[EdgeDefinition]):
-        return run_ngql(delete_edge_ngql(self.model.get_edge_type_and_model()[1].db_name(), edge_definitions))
+    def delete(self, edge_definitions: list[EdgeDefinition], edge_type=None, *, timeout: float = None):
+        """
+        :param edge_type: the edge type model of the edges, default to the one the edge_type field is declared as
+        """
+        if edge_type is None:
+            from nebula_carina.models.models import EdgeTypeModel
+            edge_type = self.model.model_fields['edge_type'].annotation
+            if not isinstance(edge_type, type) or edge_type is EdgeTypeModel:
+                raise ValueError('the edge type of the edges to delete is required')
+        with model_event('delete', self.model, edge_definitions=edge_definitions):
+            return run_ngql(
+                delete_edge_ngql(edge_type.db_name(), edge_definitions), space=edge_type.get_space(), timeout=timeout
+            )
+
+    async def afind_between(
+            self, src_vid: str | int, dst_vid: str | int, edge_type=None,
+            *,
+            limit: Limit = None, timeout: float = None, space: str = None
+    ):
+        return await run_in_executor(
+            self.find_between, src_vid, dst_vid, edge_type, limit=limit, timeout=timeout, space=space
+        )
+
+    async def afind_by_source(
+            self, src_vid: str, edge_type=None, *, limit: Limit = None, timeout: float = None, space: str = None
+    ):
+        return await run_in_executor(
+            self.find_by_source, src_vid, edge_type, limit=limit, timeout=timeout, space=space
+        )
+
+    async def afind_by_destination(
+            self, dst_vid: str, edge_type, *, limit: Limit = None, timeout: float = None, space: str = None
+    ):
+        return await run_in_executor(
+            self.find_by_destination, dst_vid, edge_type, limit=limit, timeout=timeout, space=space
+        )
+
+    def go(
+            self, from_vids: str | int | list[str | int], over=None, *,
+            yield_: str = None, direction: str = 'out', steps: int | tuple[int, int] = 1,
+            condition: Condition = None, limit: Limit = None, timeout: float = None
+    ):
+        """
+        the edges walked from the vids by GO, by the last step when there are several
+        :param yield_: the expression of the edges, default to the edge walked (go.EDGE)
+        """
+        return [
+            r['e'] for r in ModelBuilder.go(
+                from_vids, over, {'e': self.model}, yield_=yield_ and {'e': yield_}, direction=direction, steps=steps,
+                condition=condition, limit=limit, timeout=timeout
+            )
+        ]
+
+    async def ago(
+            self, from_vids: str | int | list[str | int], over=None, *,
+            yield_: str = None, direction: str = 'out', steps: int | tuple[int, int] = 1,
+            condition: Condition = None, limit: Limit = None, timeout: float = None
+    ):
+        return await run_in_executor(
+            self.go, from_vids, over, yield_=yield_, direction=direction, steps=steps,
+            condition=condition, limit=limit, timeout=timeout
+        )
+
+    async def aget(self, src_vid: str | int, dst_vid: str | int, edge_type, *, timeout: float = None):
+        return await run_in_executor(self.get, src_vid, dst_vid, edge_type, timeout=timeout)
+
+    async def adelete(self, edge_definitions: list[EdgeDefinition], edge_type=None, *, timeout: float = None):
+        return await run_in_executor(self.delete, edge_definitions, edge_type, timeout=timeout)
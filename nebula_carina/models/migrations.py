@@ -6,15 +6,21 @@ from importlib import import_module
 import inspect
 
 
-def make_migrations():
-    existing_tags = show_tags()
-    existing_edges = show_edges()
+def make_migrations(space: str | None = None):
+    """
+    make the migration NGQLs of the schema models in the space, default to the default space
+    """
+    existing_tags = show_tags(space=space)
+    existing_edges = show_edges(space=space)
     ngql_list = []
     model_paths = database_settings.model_paths
     for model_path in model_paths:
         module = import_module(model_path)
         for name, cls in module.__dict__.items():
             if inspect.isclass(cls) and (issubclass(cls, TagModel) or issubclass(cls, EdgeTypeModel)):
+                default_space = database_settings.default_space
+                if (cls.get_space() or default_space) != (space or default_space):
+                    continue
                 if cls.db_name() in existing_tags or cls.db_name() in existing_edges:
                     alter_schema_ngql = cls.alter_schema_ngql()
                     alter_schema_ngql and ngql_list.append(alter_schema_ngql)
@@ -23,6 +29,6 @@ def make_migrations():
     return ngql_list
 
 
-def migrate(ngql_list):
+def migrate(ngql_list, space: str | None = None):
     for ngql in ngql_list:
-        run_ngql(ngql)
+        run_ngql(ngql, space=space)
@@ -1,7 +1,63 @@
-from typing import Type, Iterable
+from typing import Type, Iterable, AsyncIterator, Callable
+
+from nebula3.common import ttypes
+from nebula3.data.ResultSet import ResultSet
+from pydantic import BaseModel
+
+from nebula_carina import tracing
+from nebula_carina.hooks import observed_decoder
 from nebula_carina.models.abstract import NebulaConvertableProtocol
+from nebula_carina.ngql.connection.connection import run_in_executor, LocalSession
+from nebula_carina.ngql.connection.single_flight import WaitTimeout, freeze
+from nebula_carina.ngql.errors import QueryTimeoutError
 from nebula_carina.ngql.query.conditions import Condition
-from nebula_carina.ngql.query.match import match, OrderBy, Limit
+from nebula_carina.ngql.query.go import go, compile_go, EDGE, DESTINATION, SOURCE
+from nebula_carina.ngql.query.match import match, compile_match, OrderBy, Limit
+from nebula_carina.ngql.schema.data_types import ttype2python_value
+from nebula_carina.settings import database_settings
+from nebula_carina.utils.utils import read_str
+
+
+def _serialize(value: any) -> any:
+	if isinstance(value, list):
+		return [_serialize(item) for item in value]
+	return value.dict() if isinstance(value, BaseModel) else value
+
+
+def _scalar(value: ttypes.Value) -> any:
+	"""
+	the python value of a projection
+	"""
+	if value.getType() == ttypes.Value.NVAL:
+		return None
+	if value.getType() == ttypes.Value.LVAL:
+		return [_scalar(item) for item in value.value.values]
+	if value.getType() == ttypes.Value.MVAL:
+		return {read_str(key): _scalar(item) for key, item in value.value.kvs.items()}
+	return read_str(ttype2python_value(value.value))
+
+
+def _list_decoder(decode: Callable) -> Callable[[ttypes.Value], any]:
+	"""
+	decode the value, or each of its items when it is a list, e.g. the edges of a variable length pattern
+	"""
+	def wrapper(value: ttypes.Value):
+		if value.getType() == ttypes.Value.LVAL:
+			return [decode(item.value) for item in value.value.values]
+		return decode(value.value)
+	return wrapper
+
+
+def _json_list_decoder(decode: Callable) -> Callable[[any, any], any]:
+	def wrapper(value: any, meta: any):
+		if isinstance(value, list):
+			return [decode(item, item_meta) for item, item_meta in zip(value, meta)]
+		return decode(value, meta)
+	return wrapper
+
+
+def _json_scalar(value: any, meta: any) -> any:
+	return value
 
 
 class SingleMatchResult(object):
@@ -10,7 +66,7 @@ class SingleMatchResult(object):
 		self.__data = result
 
 	def dict(self):
-		return {k: v.dict() for k, v in self.__data.items()}
+		return {k: _serialize(v) for k, v in self.__data.items()}
 
 	def __getitem__(self, item):
 		return self.__data[item]
@@ -27,20 +83,199 @@ class ModelBuilder(object):
 	def match(
 			pattern: str, to_model_dict: dict[str, Type[NebulaConvertableProtocol]],
 			*, distinct_field: str = None,
-			condition: Condition = None, order_by: OrderBy = None, limit: Limit = None
+			condition: Condition = None, order_by: OrderBy = None, limit: Limit = None,
+			space: str = None, params: dict[str, any] = None, as_json: bool = None, timeout: float = None,
+			coalesce: bool = None, project: dict[str, str] = None
 	) -> Iterable[SingleMatchResult]:  # should be model
+		"""
+		the edges of a variable length pattern, e.g. (v)-[e:love*1..3]->(v2), are decoded as lists of models
+		:param coalesce: share one call and one list of the results with the identical matches in flight,
+			default to database_settings.coalesce_reads, the shared models should not be modified then
+		:param project: the values returned besides the models, e.g. {'age': 'v2.figure.age'}
+		"""
 		output = ', '.join(
-			("DISTINCT " if key == distinct_field else "") + key
-			for key in to_model_dict.keys()
+			[("DISTINCT " if key == distinct_field else "") + key for key in to_model_dict.keys()]
+			+ [f'{expression} AS {key}' for key, expression in (project or {}).items()]
+		)
+		space, as_json, coalesce = ModelBuilder._defaults(to_model_dict, space, as_json, coalesce)
+		return ModelBuilder._decoded(
+			'nebula_carina.match', to_model_dict, project, space, as_json, coalesce, timeout,
+			lambda: match(
+				pattern, output, condition, order_by, limit,
+				space=space, params=params, as_json=as_json, timeout=timeout, coalesce=False
+			),
+			lambda: compile_match(pattern, output, condition, order_by, limit, params),
 		)
-		results = match(pattern, output, condition, order_by, limit)
+
+	@staticmethod
+	def go(
+			from_vids: list[str | int], over, to_model_dict: dict[str, Type[NebulaConvertableProtocol]],
+			*, yield_: dict[str, str] = None, direction: str = 'out', steps: int | tuple[int, int] = 1,
+			distinct: bool = False, condition: Condition = None, limit: Limit = None,
+			space: str = None, params: dict[str, any] = None, as_json: bool = None, timeout: float = None,
+			coalesce: bool = None, project: dict[str, str] = None
+	) -> Iterable[SingleMatchResult]:
+		"""
+		the one or more steps from known vids by GO, which is cheaper than MATCH for the neighbors
+			ModelBuilder.go(['char_test1'], Love, {'e': EdgeModel, 'v2': VirtualCharacter}, direction='in')
+		:param over: an edge type model or a list of them, any edge type when None or EdgeTypeModel
+		:param yield_: the expression of each key, default to the edge walked (go.EDGE) for the edge models
+			and to the vertex reached (go.DESTINATION) for the vertex models, go.SOURCE is where a step starts
+		:param condition: filtered by graphd, the keys of the models being their expressions,
+			e.g. Q(v2__figure__age__gte=18, love__times__gt=3) or RawCondition('rank(edge) > $rank', {'rank': 0})
+		:param project: the values yielded besides the models, e.g. {'name': '$$.figure.name', 'times': 'love.times'}
+		"""
+		from nebula_carina.models.models import EdgeModel, EdgeTypeModel, VertexModel
+		if isinstance(from_vids, (str, int)):
+			from_vids = [from_vids]
+		if over is None or isinstance(over, type):
+			over = [] if over is None else [over]
+		over_names = [edge_type.db_name() for edge_type in over if edge_type is not EdgeTypeModel]
+		expressions = {
+			key: (yield_ or {}).get(key) or (EDGE if issubclass(model, EdgeModel) else DESTINATION)
+			for key, model in to_model_dict.items()
+		}
+		output = ('DISTINCT ' if distinct else '') + ', '.join(
+			f'{expression} AS {key}' for key, expression in {**expressions, **(project or {})}.items()
+		)
+		aliases = {
+			key: 'properties(edge)' if expression == EDGE else expression for key, expression in expressions.items()
+		}
+		# the vertices reached should have the tags of their models, like the labels of a MATCH pattern
+		tags = {}
+		for key, model in to_model_dict.items():
+			if issubclass(model, VertexModel) and expressions[key] in (SOURCE, DESTINATION):
+				tag_names = tags.setdefault(expressions[key], [])
+				for _, tag_model, required in model.iterate_tag_models():
+					if required and tag_model.db_name() not in tag_names:
+						tag_names.append(tag_model.db_name())
+		if space is None:
+			space = next((edge_type.get_space() for edge_type in over if edge_type.get_space()), None)
+		space, as_json, coalesce = ModelBuilder._defaults(to_model_dict, space, as_json, coalesce)
+		arguments = dict(steps=steps, direction=direction, limit=limit, params=params, tags=tags, aliases=aliases)
+		return ModelBuilder._decoded(
+			'nebula_carina.go', to_model_dict, project, space, as_json, coalesce, timeout,
+			lambda: go(
+				from_vids, over_names, output, condition,
+				space=space, as_json=as_json, timeout=timeout, coalesce=False, **arguments
+			),
+			lambda: compile_go(from_vids, over_names, output, condition, **arguments),
+		)
+
+	@staticmethod
+	def _defaults(
+			to_model_dict: dict[str, Type[NebulaConvertableProtocol]], space: str | None, as_json: bool | None,
+			coalesce: bool | None
+	) -> tuple[str | None, bool, bool]:
+		if space is None:
+			# route the query to the space declared by the models
+			space = next((m.get_space() for m in to_model_dict.values() if m.get_space()), None)
+		if as_json is None:
+			as_json = database_settings.json_results
+		if coalesce is None:
+			coalesce = database_settings.coalesce_reads
+		return space, as_json, coalesce
+
+	@staticmethod
+	def _decoded(
+			name: str, to_model_dict: dict[str, Type[NebulaConvertableProtocol]], project: dict[str, str] | None,
+			space: str | None, as_json: bool, coalesce: bool, timeout: float | None,
+			execute: Callable[[], ResultSet | dict], compile_: Callable[[], tuple[str, dict[str, any] | None]]
+	) -> Iterable[SingleMatchResult]:
+		"""
+		run the query in a span named name and decode its results into the models
+		:param compile_: the ngql and the parameters executed, telling the identical queries to coalesce
+		"""
+		def run():
+			results = execute()
+			if as_json:
+				return ModelBuilder.decode_json(results, to_model_dict, project or ())
+			return ModelBuilder.decode(results, to_model_dict, project or ())
+
+		models = {key: model.__name__ for key, model in to_model_dict.items()}
+		with tracing.span(name, models=models, space=space) as span:
+			if not coalesce:
+				results = run()
+			else:
+				ngql, all_params = compile_()
+				results = ModelBuilder.coalesce((space, ngql, all_params, to_model_dict, as_json), run, timeout, ngql)
+		if span is None:
+			return results
+		# the models are decoded lazily, as the results are consumed after the query
+		return tracing.traced(results, 'nebula_carina.decode', span, models=models)
+
+	@staticmethod
+	def coalesce(
+			key: tuple, run: Callable[[], Iterable[SingleMatchResult]], timeout: float | None = None,
+			ngql: str | None = None
+	) -> Iterable[SingleMatchResult]:
+		"""
+		decode the results once for all the identical queries in flight
+		:param timeout: the seconds to wait for the identical query in flight,
+			default to database_settings.query_timeout
+		"""
+		timeout = database_settings.query_timeout if timeout is None else timeout
+		try:
+			return iter(LocalSession().single_flight.do(('decode', freeze(key)), lambda: list(run()), timeout))
+		except WaitTimeout as e:
+			raise QueryTimeoutError(timeout, ngql) from e
+
+	@staticmethod
+	def decode(
+			results: ResultSet, to_model_dict: dict[str, Type[NebulaConvertableProtocol]], project: Iterable[str] = ()
+	) -> Iterable[SingleMatchResult]:
+		"""
+		:param project: the keys of the values to return as they are
+		"""
+		decoders = {
+			key: _list_decoder(observed_decoder(model, model.from_nebula_db_cls))
+			for key, model in to_model_dict.items()
+		}
+		decoders.update((key, _scalar) for key in project)
 		return (
 			SingleMatchResult({
-				key: to_model_dict[key].from_nebula_db_cls(value.value)
-				for key, value in zip(results.keys(), row.values) if key in to_model_dict
+				key: decoders[key](value)
+				for key, value in zip(results.keys(), row.values) if key in decoders
 			}) for row in results.rows()
 		)
 
+	@staticmethod
+	def decode_json(
+			response: dict, to_model_dict: dict[str, Type[NebulaConvertableProtocol]], project: Iterable[str] = ()
+	) -> Iterable[SingleMatchResult]:
+		"""
+		:param project: the keys of the values to return as they are
+		"""
+		result = response['results'][0]
+		decoders = {
+			key: _json_list_decoder(observed_decoder(model, model.from_nebula_json))
+			for key, model in to_model_dict.items()
+		}
+		decoders.update((key, _json_scalar) for key in project)
+		return (
+			SingleMatchResult({
+				key: decoders[key](value, meta)
+				for key, value, meta in zip(result['columns'], data['row'], data['meta']) if key in decoders
+			}) for data in result.get('data') or []
+		)
+
 	@staticmethod
 	def serialized_match(*args, **kwargs):
 		return [res.dict() for res in ModelBuilder.match(*args, **kwargs)]
+
+	@staticmethod
+	async def amatch(*args, **kwargs) -> AsyncIterator[SingleMatchResult]:
+		# both the network call and the decoding happen in the executor, off the event loop
+		results = await run_in_executor(lambda: list(ModelBuilder.match(*args, **kwargs)))
+		for result in results:
+			yield result
+
+	@staticmethod
+	async def ago(*args, **kwargs) -> AsyncIterator[SingleMatchResult]:
+		results = await run_in_executor(lambda: list(ModelBuilder.go(*args, **kwargs)))
+		for result in results:
+			yield result
+
+	@staticmethod
+	async def aserialized_match(*args, **kwargs):
+		return await run_in_executor(ModelBuilder.serialized_match, *args, **kwargs)
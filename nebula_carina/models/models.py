@@ -11,7 +11,7 @@ from pydantic import BaseModel
 # https://github.com/pydantic/pydantic/issues/6381
 from pydantic._internal._model_construction import ModelMetaclass
 
-from nebula_carina.models.abstract import NebulaConvertableProtocol
+from nebula_carina.models.abstract import NebulaConvertableProtocol, SpaceDeclarable
 from nebula_carina.models.errors import (
     VertexDoesNotExistError,
     EdgeDoesNotExistError,
@@ -20,8 +20,10 @@ from nebula_carina.models.errors import (
 from nebula_carina.models.fields import NebulaFieldInfo
 from nebula_carina.models.managers import Manager, BaseVertexManager, BaseEdgeManager
 from nebula_carina.models.model_builder import ModelBuilder
-from nebula_carina.ngql.connection.connection import run_ngql
-from nebula_carina.ngql.query.conditions import Q
+from nebula_carina.hooks import emits
+from nebula_carina.ngql.connection.connection import run_ngql, run_in_executor
+from nebula_carina.ngql.connection.pipeline import pipeline
+from nebula_carina.ngql.query.conditions import Condition, Q
 from nebula_carina.ngql.record.edge import (
     update_edge_ngql,
     insert_edge_ngql,
@@ -59,7 +61,7 @@ class NebulaSchemaModelMetaClass(ModelMetaclass):
             _edge_type_model_factory[db_name] = cls
 
 
-class NebulaSchemaModel(BaseModel, metaclass=NebulaSchemaModelMetaClass):
+class NebulaSchemaModel(BaseModel, SpaceDeclarable, metaclass=NebulaSchemaModelMetaClass):
     @classmethod
     def _create_db_fields(cls):
         return [
@@ -92,6 +94,21 @@ class NebulaSchemaModel(BaseModel, metaclass=NebulaSchemaModelMetaClass):
     def db_name(cls):
         return pascal_case_to_snake_case(cls.__name__)
 
+    @classmethod
+    def from_json_props(cls, props: dict[str, any]):
+        """
+        convert the properties of a json result
+        """
+        fields = cls.model_fields
+        return cls(
+            **{
+                name: fields[name].data_type.json2python_type(value)
+                if isinstance(fields.get(name), NebulaFieldInfo)
+                else value
+                for name, value in props.items()
+            }
+        )
+
     @classmethod
     def get_schema_type(cls) -> SchemaType:
         schema_type = None
@@ -120,7 +137,9 @@ class NebulaSchemaModel(BaseModel, metaclass=NebulaSchemaModelMetaClass):
         # TODO ttl where to get the ttl info?
         from_dict = {
             db_field.prop_name: db_field
-            for db_field in describe_schema(cls.get_schema_type(), cls.db_name())
+            for db_field in describe_schema(
+                cls.get_schema_type(), cls.db_name(), space=cls.get_space()
+            )
         }
         to_dict = {db_field.prop_name: db_field for db_field in cls._create_db_fields()}
         adds, drop_names, changes = [], [], []
@@ -251,6 +270,28 @@ class VertexModel(NebulaRecordModel):
         """
         return cls.from_vertex(raw_db_item)
 
+    @classmethod
+    def from_nebula_json(cls, value: dict[str, any], meta: dict[str, any]):
+        return cls.from_json_vertex(value, meta)
+
+    @classmethod
+    def from_json_vertex(cls, props: dict[str, any], meta: dict[str, any]):
+        """
+        convert a vertex of the json results, whose properties are keyed like "figure.name"
+        """
+        tag_props = {}
+        for key, value in props.items():
+            tag_name, prop = key.split(".", 1)
+            tag_props.setdefault(tag_name, {})[prop] = value
+        tags = {}
+        for name, tag_model, required in cls.iterate_tag_models():
+            if name in tag_props:
+                tags[name] = tag_model.from_json_props(tag_props[name])
+            elif required and not tag_model.get_db_field_names():
+                # a tag without properties leaves nothing in the json results
+                tags[name] = tag_model()
+        return cls(vid=meta["id"], **tags)
+
     @classmethod
     def from_vertex(cls, vertex: Vertex):
         """
@@ -290,28 +331,33 @@ class VertexModel(NebulaRecordModel):
             ):
                 yield name, field.annotation
 
+    @emits("upsert")
     def upsert(self):
-        for name, tag_model in self._get_tag_models():
-            run_ngql(
-                upsert_vertex_ngql(
-                    tag_model.db_name(),
-                    self.vid,
-                    getattr(self, name).get_db_field_dict(),
+        # one round trip for all the tags
+        with pipeline(space=self.get_space()) as p:
+            for name, tag_model in self._get_tag_models():
+                p.add(
+                    upsert_vertex_ngql(
+                        tag_model.db_name(),
+                        self.vid,
+                        getattr(self, name).get_db_field_dict(),
+                    )
                 )
-            )
 
+    @emits("save")
     def save(self, *, if_not_exists: bool = False):
         #   并发不安全，如果需要并发安全，需要考虑upsert
         try:
             self.objects.get(self.vid)
-            for name, tag_model in self._get_tag_models():
-                run_ngql(
-                    update_vertex_ngql(
-                        tag_model.db_name(),
-                        self.vid,
-                        getattr(self, name).get_db_field_dict(),
+            with pipeline(space=self.get_space()) as p:
+                for name, tag_model in self._get_tag_models():
+                    p.add(
+                        update_vertex_ngql(
+                            tag_model.db_name(),
+                            self.vid,
+                            getattr(self, name).get_db_field_dict(),
+                        )
                     )
-                )
         except VertexDoesNotExistError:
             tag_props = OrderedDict()
             data = []
@@ -326,8 +372,9 @@ class VertexModel(NebulaRecordModel):
             ngql = insert_vertex_ngql(
                 tag_props, {self.vid: data}, if_not_exists=if_not_exists
             )
-            run_ngql(ngql)
+            run_ngql(ngql, space=self.get_space())
 
+    @emits("insert")
     def insert(self, *, if_not_exists: bool = False):
         """
         Alias for save() method to maintain backward compatibility.
@@ -346,10 +393,19 @@ class VertexModel(NebulaRecordModel):
         ngql = insert_vertex_ngql(
             tag_props, {self.vid: data}, if_not_exists=if_not_exists
         )
-        run_ngql(ngql)
+        run_ngql(ngql, space=self.get_space())
+
+    async def aupsert(self):
+        return await run_in_executor(self.upsert)
+
+    async def asave(self, *, if_not_exists: bool = False):
+        return await run_in_executor(self.save, if_not_exists=if_not_exists)
+
+    async def ainsert(self, *, if_not_exists: bool = False):
+        return await run_in_executor(self.insert, if_not_exists=if_not_exists)
 
     def get_out_edges(self, edge_type: EdgeTypeModel = None, *, limit: Limit = None):
-        return EdgeModel.objects.find_by_source(self.vid, edge_type, limit=limit)
+        return EdgeModel.objects.find_by_source(self.vid, edge_type, limit=limit, space=self.get_space())
 
     def get_out_edge_and_destinations(
         self, edge_type, dst_vertex_model, *, limit: Limit = None
@@ -363,6 +419,7 @@ class VertexModel(NebulaRecordModel):
                 {"e": EdgeModel, "v2": dst_vertex_model},
                 condition=Q(v1__id=self.vid),
                 limit=limit,
+                space=self.get_space(),
             )
         )
 
@@ -376,7 +433,7 @@ class VertexModel(NebulaRecordModel):
     def get_reverse_edges(
         self, edge_type: EdgeTypeModel = None, *, limit: Limit = None
     ):
-        return EdgeModel.objects.find_by_destination(self.vid, edge_type, limit=limit)
+        return EdgeModel.objects.find_by_destination(self.vid, edge_type, limit=limit, space=self.get_space())
 
     def get_reverse_edge_and_sources(
         self, edge_type, src_vertex_model, *, limit: Limit = None
@@ -390,6 +447,7 @@ class VertexModel(NebulaRecordModel):
                 {"e": EdgeModel, "v1": src_vertex_model},
                 condition=Q(v2__id=self.vid),
                 limit=limit,
+                space=self.get_space(),
             )
         )
 
@@ -400,6 +458,37 @@ class VertexModel(NebulaRecordModel):
             self.vid, edge_type, distinct=distinct, limit=limit
         )
 
+    def go(
+        self,
+        edge_type,
+        vertex_model,
+        *,
+        direction: str = "out",
+        steps: int | tuple[int, int] = 1,
+        condition: Condition = None,
+        limit: Limit = None,
+        timeout: float = None,
+    ) -> Iterable[dict[str, NebulaConvertableProtocol]]:
+        """
+        the edges walked and the vertices reached by GO, cheaper than get_out_edge_and_destinations
+        e.g. character.go(Love, VirtualCharacter, direction="in") for the sources
+        :param condition: the keys of the models being e and v2, e.g. Q(v2__figure__age__gte=18)
+        """
+        return (
+            {"edge": r["e"], "dst": r["v2"]}
+            for r in ModelBuilder.go(
+                self.vid,
+                edge_type,
+                {"e": EdgeModel, "v2": vertex_model},
+                direction=direction,
+                steps=steps,
+                condition=condition,
+                limit=limit,
+                space=self.get_space(),
+                timeout=timeout,
+            )
+        )
+
 
 class EdgeModel(NebulaRecordModel):
     src_vid: int | str
@@ -416,6 +505,26 @@ class EdgeModel(NebulaRecordModel):
     def from_nebula_db_cls(cls, raw_db_item: Vertex | Edge):
         return cls.from_edge(raw_db_item)
 
+    @classmethod
+    def from_nebula_json(cls, value: dict[str, any], meta: dict[str, any]):
+        return cls.from_json_edge(value, meta)
+
+    @classmethod
+    def from_json_edge(cls, props: dict[str, any], meta: dict[str, any]):
+        """
+        convert an edge of the json results, whose src, dst, name and ranking are in meta
+        """
+        edge_id = meta["id"]
+        edge_type_name = edge_id["name"]
+        edge_type = _edge_type_model_factory.get(edge_type_name)
+        return cls(
+            src_vid=edge_id["src"],
+            dst_vid=edge_id["dst"],
+            ranking=edge_id["ranking"],
+            edge_type_name=edge_type_name,
+            edge_type=edge_type.from_json_props(props) if edge_type else UnknownEdgeType(),
+        )
+
     @classmethod
     def from_edge(cls, edge: Edge):
         src = read_str(edge.src.value)
@@ -440,6 +549,7 @@ class EdgeModel(NebulaRecordModel):
             edge_type=UnknownEdgeType(),
         )
 
+    @emits("upsert")
     def upsert(self):
         _, edge_model = self.get_edge_type_and_model()
         run_ngql(
@@ -447,9 +557,11 @@ class EdgeModel(NebulaRecordModel):
                 edge_model.db_name(),
                 EdgeDefinition(self.src_vid, self.dst_vid, self.ranking),
                 self.edge_type.get_db_field_dict(),
-            )
+            ),
+            space=self.edge_type.get_space(),
         )
 
+    @emits("save")
     def save(self, *, if_not_exists: bool = False):
         #   并发不安全，如果需要并发安全，需要考虑upsert
         _, edge_type_model = self.get_edge_type_and_model()
@@ -461,7 +573,8 @@ class EdgeModel(NebulaRecordModel):
                     edge_type_model.db_name(),
                     EdgeDefinition(self.src_vid, self.dst_vid, self.ranking),
                     self.edge_type.get_db_field_dict(),
-                )
+                ),
+                space=self.edge_type.get_space(),
             )
         except EdgeDoesNotExistError:
             db_field_names = edge_type_model.get_db_field_names()
@@ -481,8 +594,9 @@ class EdgeModel(NebulaRecordModel):
                 ],
                 if_not_exists=if_not_exists,
             )
-            run_ngql(ngql)
+            run_ngql(ngql, space=self.edge_type.get_space())
 
+    @emits("insert")
     def insert(self, *, if_not_exists: bool = False):
         """
         Alias for save() method to maintain backward compatibility.
@@ -506,4 +620,13 @@ class EdgeModel(NebulaRecordModel):
             ],
             if_not_exists=if_not_exists,
         )
-        run_ngql(ngql)
+        run_ngql(ngql, space=self.edge_type.get_space())
+
+    async def aupsert(self):
+        return await run_in_executor(self.upsert)
+
+    async def asave(self, *, if_not_exists: bool = False):
+        return await run_in_executor(self.save, if_not_exists=if_not_exists)
+
+    async def ainsert(self, *, if_not_exists: bool = False):
+        return await run_in_executor(self.insert, if_not_exists=if_not_exists)
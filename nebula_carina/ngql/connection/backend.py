@@ -0,0 +1,14 @@
+from nebula3.data.ResultSet import ResultSet
+
+
+class Backend(object):
+    """
+    what runs the ngqls of run_ngql instead of the nebula servers, see LocalSession.set_backend
+    """
+
+    def execute(self, ngql: str, space: str | None, params: dict[str, any] | None, as_json: bool) -> ResultSet | dict:
+        """
+        :return: the ResultSet, or the decoded json response when as_json
+        :raise NGqlError: when the ngql fails
+        """
+        raise NotImplementedError
@@ -0,0 +1,110 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Callable
+
+
+class ServerStats(object):
+    """
+    what the client has seen of a graphd server
+    """
+    __slots__ = ('server', 'latency', 'in_flight', 'errors', 'ejected_until')
+
+    def __init__(self, server: str):
+        self.server = server
+        self.latency = None  # the ewma of the latencies in seconds, None before the first query
+        self.in_flight = 0
+        self.errors = 0  # the consecutive errors
+        self.ejected_until = 0.
+
+    def score(self) -> float:
+        # a server never measured is tried first, the others are weighted by the queries already waiting on them
+        return (self.latency or 0.) * (self.in_flight + 1)
+
+    def dict(self) -> dict[str, any]:
+        return {
+            'latency': self.latency, 'in_flight': self.in_flight, 'errors': self.errors,
+            'ejected': self.ejected_until > time.monotonic(),
+        }
+
+
+class LoadBalancer(object):
+    """
+    pick a graphd server by the power of two choices, comparing the ewma latencies weighted by the in-flight queries
+    a server failing eject_errors times in a row is left alone for cooldown seconds
+    """
+    DECAY = 0.3  # the weight of the latest latency in the ewma
+
+    def __init__(
+            self, servers: Iterable[str], *, eject_errors: int = 3, cooldown: float = 30.,
+            rng: random.Random | None = None
+    ):
+        self._stats = {server: ServerStats(server) for server in sorted(servers)}
+        assert self._stats, 'at least one server is needed'
+        self._eject_errors = eject_errors
+        self._cooldown = cooldown
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    @property
+    def servers(self) -> list[str]:
+        return list(self._stats)
+
+    def stats(self) -> dict[str, dict[str, any]]:
+        with self._lock:
+            return {server: stats.dict() for server, stats in self._stats.items()}
+
+    def choose(self) -> str:
+        now = time.monotonic()
+        with self._lock:
+            available = [stats for stats in self._stats.values() if stats.ejected_until <= now]
+            if not available:
+                # every server is ejected, try the one which is coming back first rather than failing at once
+                return min(self._stats.values(), key=lambda s: s.ejected_until).server
+            if len(available) == 1:
+                return available[0].server
+            first, second = self._rng.sample(available, 2)
+            return (first if first.score() <= second.score() else second).server
+
+    def start(self, server: str):
+        with self._lock:
+            self._stats[server].in_flight += 1
+
+    def succeed(self, server: str, elapsed: float):
+        with self._lock:
+            stats = self._stats[server]
+            stats.in_flight -= 1
+            stats.errors = 0
+            stats.latency = elapsed if stats.latency is None else stats.latency + self.DECAY * (elapsed - stats.latency)
+
+    def fail(self, server: str, *, started: bool = True):
+        with self._lock:
+            stats = self._stats[server]
+            if started:
+                stats.in_flight -= 1
+            stats.errors += 1
+            if stats.errors >= self._eject_errors:
+                stats.errors = 0
+                stats.ejected_until = time.monotonic() + self._cooldown
+
+    @contextmanager
+    def track(self, server: str | None, is_slow: Callable[[BaseException], bool] | None = None):
+        """
+        measure a query sent to the server, any exception raised inside is an error of the server
+        :param is_slow: tell the exceptions which only mean that the server is slow, e.g. the timeouts of the queries
+        """
+        if server is None:
+            yield
+            return
+        self.start(server)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            if is_slow is not None and is_slow(e):
+                self.succeed(server, time.perf_counter() - start)
+            else:
+                self.fail(server)
+            raise
+        self.succeed(server, time.perf_counter() - start)
@@ -1,105 +1,417 @@
+import asyncio
+import contextvars
+import os
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable
 
 from nebula3.Exception import IOErrorException
-from nebula3.data import ResultSet
+from nebula3.data.ResultSet import ResultSet
 from nebula3.gclient.net import ConnectionPool
 from nebula3.Config import Config
 
-from nebula_carina.ngql.errors import NGqlError, DefaultSpaceNotExistError
+from nebula_carina import hooks
+from nebula_carina.ngql.connection.backend import Backend
+from nebula_carina.ngql.connection.balancer import LoadBalancer
+from nebula_carina.ngql.connection.limiter import ConcurrencyLimiter
+from nebula_carina.ngql.connection.metrics import ClientMetrics
+from nebula_carina.ngql.connection.pool import SessionPool, PooledSession, HealthChecker, read_timeout
+from nebula_carina.ngql.connection.single_flight import SingleFlight, WaitTimeout, freeze
+from nebula_carina.ngql.connection.slow_log import SlowQueryLog
+from nebula_carina.ngql.connection.retry import (
+    RetryPolicy, RetryReason, StatementKind, classify, SESSION_ERROR_CODES, TRANSIENT_ERROR_CODES
+)
+from nebula_carina.ngql.errors import NGqlError, DefaultSpaceNotExistError, QueryTimeoutError
+from nebula_carina.ngql.schema.data_types import python_value2ttype
+from nebula_carina.utils.utils import json_loads
 from nebula_carina.settings import database_settings
 
 
-# TODO: fix connection / connection pool / session in a robust way later
-
-config = Config()
-config.max_connection_pool_size = database_settings.max_connection_pool_size
-connection_pool = ConnectionPool()
-
-
 def _split(server_address: str) -> tuple[str, int]:
     ip, port = server_address.split(':', 1)
     return ip, int(port)
 
 
-if not connection_pool.init([_split(i) for i in database_settings.servers], config):
-    raise RuntimeError('Cannot connect to the connection pool')
+_connection_pools: dict[str, ConnectionPool] = {}
+_connection_pools_pid = None
+_connection_pool_lock = threading.Lock()
+
+
+def get_connection_pool(server: str | None = None) -> ConnectionPool:
+    """
+    the connection pool of a server, connected by its first session
+    every server has its own pool, so that the balancer decides which server a session is opened on
+    a forked child process creates its own connection pools instead of using the ones of its parent
+    :param server: like "127.0.0.1:9669", default to the first server
+    """
+    global _connection_pools, _connection_pools_pid
+    server = server or min(database_settings.servers)
+    if _connection_pools_pid == os.getpid() and (connection_pool := _connection_pools.get(server)):
+        return connection_pool
+    with _connection_pool_lock:
+        if _connection_pools_pid != os.getpid():
+            _connection_pools, _connection_pools_pid = {}, os.getpid()
+        if server not in _connection_pools:
+            config = Config()
+            config.max_connection_pool_size = database_settings.max_connection_pool_size
+            connection_pool = ConnectionPool()
+            if not connection_pool.init([_split(server)], config):
+                raise RuntimeError(f'Cannot connect to the connection pool of {server}')
+            _connection_pools[server] = connection_pool
+        return _connection_pools[server]
+
+
+def init() -> dict[str, ConnectionPool]:
+    """
+    connect to the servers explicitly, otherwise the connection pools are created by the first queries
+    """
+    return {server: get_connection_pool(server) for server in sorted(database_settings.servers)}
+
+
+def _is_timeout(e: BaseException) -> bool:
+    return isinstance(e, IOErrorException) and e.type == IOErrorException.E_TIMEOUT
 
 
 class LocalSession(object):
+    """
+    the process-wide entry of the session pool
+    every call checks out its own session, so that threads no longer push their NGQLs through a shared one
+    """
     _lock = threading.Lock()
     _instance = None
-    _main_session = None
-    _space_settled = False
 
     def __new__(cls, *args, **kwargs):
         with cls._lock:
             if not cls._instance:
                 cls._instance = super().__new__(cls)
-                cls._instance.create_session()
-                cls._instance._space_settled = False
+                cls._instance._pool = SessionPool(
+                    cls._instance.create_session, database_settings.max_connection_pool_size,
+                    wait_timeout=database_settings.session_pool_wait_timeout, space_setter=cls._use_space,
+                    balancer=LoadBalancer(
+                        database_settings.servers, eject_errors=database_settings.server_eject_errors,
+                        cooldown=database_settings.server_eject_cooldown
+                    )
+                )
+                cls._instance._retry_policy = RetryPolicy(
+                    database_settings.retry_max_attempts, database_settings.retry_base_delay,
+                    database_settings.retry_max_delay
+                )
+                cls._instance._limiter = ConcurrencyLimiter(
+                    max_reads=database_settings.max_concurrent_reads,
+                    max_writes=database_settings.max_concurrent_writes,
+                    max_queued=database_settings.max_queued_queries, timeout=database_settings.admission_timeout
+                )
+                cls._instance._single_flight = SingleFlight()
+                cls._instance._slow_query_log = None
+                if database_settings.slow_query_log:
+                    cls._instance._slow_query_log = SlowQueryLog(database_settings.slow_query_threshold)
+                    hooks.register_hook(cls._instance._slow_query_log)
+                cls._instance._metrics = ClientMetrics()
+                if database_settings.metrics:
+                    hooks.register_hook(cls._instance._metrics)
+                cls._instance._health_checker = None
+                if database_settings.session_keepalive_interval:
+                    cls._instance._health_checker = HealthChecker(
+                        cls._instance._pool, database_settings.session_keepalive_interval
+                    )
+                    cls._instance._health_checker.start()
+                cls._instance._backend = None
+                cls._instance._space = database_settings.default_space
+                cls._instance._default_space_checked = False
         return cls._instance
 
     @property
-    def session(self):
-        return self._main_session
+    def pool(self) -> SessionPool:
+        return self._pool
+
+    @property
+    def health_checker(self) -> HealthChecker | None:
+        return self._health_checker
+
+    @property
+    def slow_query_log(self) -> SlowQueryLog | None:
+        return self._slow_query_log
+
+    @property
+    def backend(self) -> Backend | None:
+        return self._backend
 
-    def create_session(self):
-        self._main_session = connection_pool.get_session(
-            user_name=database_settings.user_name, password=database_settings.password
+    def set_backend(self, backend: Backend | None):
+        """
+        run the ngqls by the backend instead of the nebula servers, e.g. an InMemoryBackend for the tests
+        the session pool, the limiter and the retries are skipped then, None goes back to the servers
+        """
+        self._backend = backend
+
+    @property
+    def metrics(self) -> ClientMetrics:
+        return self._metrics
+
+    @property
+    def single_flight(self) -> SingleFlight:
+        return self._single_flight
+
+    @property
+    def limiter(self) -> ConcurrencyLimiter:
+        return self._limiter
+
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        return self._retry_policy
+
+    @property
+    def balancer(self) -> LoadBalancer:
+        return self._pool.balancer
+
+    @staticmethod
+    def create_session(server: str):
+        # nebula python would reconnect and run the statement again by itself, behind the retry policy
+        return get_connection_pool(server).get_session(
+            user_name=database_settings.user_name, password=database_settings.password, retry_connect=False
         )
 
-    def recover_session(self):
-        with self._lock:
-            self.create_session()
-            self.settle_space()
+    def recover_session(self, pooled: PooledSession, space: str | None = None):
+        self._pool.renew(pooled)
+        if space:
+            self.settle_space(pooled, space)
 
     def raw_use_space(self, name):
-        self._main_session.execute(f'USE {name};')
+        """
+        switch the default space of the queries which do not specify their spaces
+        """
+        if self._backend is not None:
+            self._backend.execute(f'USE {name};', None, None, False)
+        else:
+            with self._pool.session(name) as pooled:
+                self.settle_space(pooled, name)
+        self._space = name
 
     def raw_show_spaces(self) -> list[str]:
-        return [i.as_string() for i in self._main_session.execute('SHOW SPACES;').column_values('Name')]
+        if self._backend is not None:
+            result = self._backend.execute('SHOW SPACES;', None, None, False)
+            return [i.as_string() for i in result.column_values('Name')]
+        with self._pool.session() as pooled:
+            return self._show_spaces(pooled)
+
+    @staticmethod
+    def _use_space(pooled: PooledSession, name):
+        result = pooled.session.execute(f'USE {name};')
+        if result.error_code() < 0:
+            raise NGqlError(result.error_msg(), result.error_code(), f'USE {name};')
+        pooled.space = name
+
+    @staticmethod
+    def _show_spaces(pooled: PooledSession) -> list[str]:
+        return [i.as_string() for i in pooled.session.execute('SHOW SPACES;').column_values('Name')]
 
-    def settle_space(self):
+    def settle_space(self, pooled: PooledSession, space: str):
+        if pooled.space == space:
+            return
         try:
-            if database_settings.default_space not in self.raw_show_spaces():
-                raise DefaultSpaceNotExistError(database_settings.default_space)
-            self.raw_use_space(database_settings.default_space)
-            self._space_settled = True
+            if not self._default_space_checked and space == database_settings.default_space:
+                if database_settings.default_space not in self._show_spaces(pooled):
+                    raise DefaultSpaceNotExistError(database_settings.default_space)
+                self._default_space_checked = True
+            self._use_space(pooled, space)
         except (IOErrorException, RuntimeError):
-            if not self._main_session.ping():
-                LocalSession().recover_session()
-            else:
+            if pooled.session.ping():
                 raise
+            self.recover_session(pooled, space)
 
-    @property
-    def space_settled(self):
-        return self._space_settled
+    def _execute(
+            self, pooled: PooledSession, ngql: str, nebula_params, as_json: bool, timeout: float | None
+    ) -> tuple[any, int, str]:
+        with self.balancer.track(pooled.server, _is_timeout), read_timeout(pooled.session, timeout):
+            if as_json:
+                result = pooled.session.execute_json_with_parameter(ngql, nebula_params)
+            else:
+                result = pooled.session.execute_parameter(ngql, nebula_params)
+        if as_json:
+            result = json_loads(result)
+            error = result['errors'][0]
+            return result, error.get('code', 0), error.get('message', '')
+        return result, result.error_code(), result.error_msg()
+
+    def run_ngql(
+            self, ngql: str, *,
+            is_spacial_operation=False, space: str | None = None, params: dict[str, any] | None = None,
+            as_json: bool = False, idempotent: bool | None = None, timeout: float | None = None,
+            coalesce: bool | None = None
+    ) -> ResultSet | dict:
+        """
+        run the ngql by a session which is already using the space, so no USE is needed in most cases
+        a failed ngql is run again by the retry policy, as long as running it twice is harmless
+        the ngql might have to queue for the concurrency limiter first, which raises QueryRejectedError to shed load
+        :param space: the space of the ngql, default to the current default space
+        :param params: the values of the $placeholders in the ngql
+        :param as_json: return the decoded json response instead of the ResultSet
+        :param idempotent: whether the ngql is safe to run twice, default to the classification of the ngql
+        :param timeout: the seconds to wait for the response, default to database_settings.query_timeout
+        :param coalesce: share the result with the identical reads in flight, default to the coalesce_reads setting
+        """
+        timeout = database_settings.query_timeout if timeout is None else timeout
+        space = None if is_spacial_operation else (space or self._space)
+        kind = classify(ngql)
+        if idempotent is not None and kind != StatementKind.READ:
+            kind = StatementKind.IDEMPOTENT_WRITE if idempotent else StatementKind.NON_IDEMPOTENT_WRITE
+        if self._backend is not None:
+            run = partial(self._backend.execute, ngql, space, params, as_json)
+        else:
+            run = partial(self._run_ngql, ngql, space, params, as_json, kind, timeout)
+        if kind == StatementKind.READ and (database_settings.coalesce_reads if coalesce is None else coalesce):
+            run = partial(self._coalesced, ('ngql', space, ngql, freeze(params), as_json), run, ngql, timeout)
+        if not hooks.get_hooks():
+            return run()
+        return hooks.execute(ngql, run, {
+            'space': space, 'params': params, 'kind': kind, 'as_json': as_json, 'timeout': timeout
+        })
 
-    def run_ngql(self, ngql: str, *, is_spacial_operation=False) -> ResultSet:
-        if not is_spacial_operation and not self.space_settled:
-            self.settle_space()
+    def _coalesced(self, key: tuple, run: Callable[[], any], ngql: str, timeout: float | None) -> any:
+        """
+        a caller joining the identical read in flight waits for it no longer than its own timeout
+        """
         try:
-            result = self._main_session.execute(ngql)
-        except (IOErrorException, RuntimeError):
-            if self._main_session.ping():
-                raise
-            self.recover_session()
-            result = self.session.execute(ngql)
-        if result.error_code() < 0:
-            if 'Session not existed!' not in result.error_msg():
-                raise NGqlError(result.error_msg(), result.error_code(), ngql)
-            self.recover_session()
-            result = self.session.execute(ngql)
-            if result.error_code() < 0:
-                raise NGqlError(result.error_msg(), result.error_code(), ngql)
-        return result
+            return self._single_flight.do(key, run, timeout)
+        except WaitTimeout as e:
+            raise QueryTimeoutError(timeout, ngql) from e
+
+    def _run_ngql(
+            self, ngql: str, space: str | None, params: dict[str, any] | None, as_json: bool, kind: StatementKind,
+            timeout: float | None
+    ) -> ResultSet | dict:
+        nebula_params = {key: python_value2ttype(value) for key, value in params.items()} if params else None
+        attempt = 0
+        with self._limiter.admit(space, kind), self._pool.session(space) as pooled:
+            while True:
+                attempt += 1
+                if space:
+                    self.settle_space(pooled, space)
+                try:
+                    result, error_code, error_msg = self._execute(pooled, ngql, nebula_params, as_json, timeout)
+                except (IOErrorException, RuntimeError) as e:
+                    if _is_timeout(e):
+                        # graphd might still be running the ngql, leave the session to it rather than waiting behind
+                        self._recover_quietly(pooled)
+                        raise QueryTimeoutError(timeout, ngql) from e
+                    if pooled.session.ping():
+                        raise
+                    if not self._retry_policy.should_retry(kind, RetryReason.CONNECTION, attempt):
+                        self._recover_quietly(pooled)
+                        raise
+                    self._retry_policy.backoff(RetryReason.CONNECTION, attempt)
+                    self.recover_session(pooled, space)
+                    continue
+                if error_code >= 0:
+                    return result
+                if error_code in SESSION_ERROR_CODES or 'Session not existed!' in error_msg:
+                    reason = RetryReason.SESSION
+                elif error_code in TRANSIENT_ERROR_CODES:
+                    reason = RetryReason.TRANSIENT
+                else:
+                    raise NGqlError(error_msg, error_code, ngql)
+                if not self._retry_policy.should_retry(kind, reason, attempt):
+                    raise NGqlError(error_msg, error_code, ngql)
+                if reason == RetryReason.SESSION:
+                    self.recover_session(pooled, space)
+                self._retry_policy.backoff(reason, attempt)
+
+    def _recover_quietly(self, pooled: PooledSession):
+        # the ngql is not retried, still leave a working session to the next one
+        try:
+            self.recover_session(pooled)
+        except Exception:
+            pass
 
 
 def run_ngql(
         ngql: str, *,
-        is_spacial_operation=False
+        is_spacial_operation=False, space: str | None = None, params: dict[str, any] | None = None,
+        idempotent: bool | None = None, timeout: float | None = None, coalesce: bool | None = None
+) -> ResultSet:
+    return LocalSession().run_ngql(
+        ngql, is_spacial_operation=is_spacial_operation, space=space, params=params, idempotent=idempotent,
+        timeout=timeout, coalesce=coalesce
+    )
+
+
+def run_ngql_json(
+        ngql: str, *, space: str | None = None, params: dict[str, any] | None = None, timeout: float | None = None,
+        coalesce: bool | None = None
+) -> dict:
+    """
+    run the ngql and get the json response decoded by the fastest json parser available
+    """
+    return LocalSession().run_ngql(ngql, space=space, params=params, as_json=True, timeout=timeout, coalesce=coalesce)
+
+
+def prometheus_metrics() -> str:
+    """
+    the metrics of the client in the prometheus text format, to be served as metrics.CONTENT_TYPE
+    the histograms of the queries and of the decoding are only filled with the metrics setting on
+    """
+    local_session = LocalSession()
+    return local_session.metrics.render(local_session.pool, local_session.retry_policy, local_session.limiter)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    the bounded executor running the blocking nebula calls for the async api
+    it has as many workers as the session pool has sessions, so the extra calls queue up without blocking the loop
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=database_settings.max_connection_pool_size, thread_name_prefix='nebula-carina'
+            )
+        return _executor
+
+
+async def run_in_executor(func, *args, **kwargs):
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(), partial(context.run, func, *args, **kwargs)
+    )
+
+
+async def arun_ngql(
+        ngql: str, *,
+        is_spacial_operation=False, space: str | None = None, params: dict[str, any] | None = None,
+        idempotent: bool | None = None, timeout: float | None = None, coalesce: bool | None = None
 ) -> ResultSet:
-    return LocalSession().run_ngql(ngql, is_spacial_operation=is_spacial_operation)
+    return await run_in_executor(
+        run_ngql, ngql, is_spacial_operation=is_spacial_operation, space=space, params=params, idempotent=idempotent,
+        timeout=timeout, coalesce=coalesce
+    )
+
+
+def _reset_after_fork():
+    """
+    a forked child (e.g. a gunicorn worker with --preload) inherits the sockets of its parent
+    forget the connection pool, the sessions and the threads, so that the child builds its own ones
+    the locks are recreated since they might be held by a thread which does not exist in the child
+    """
+    global _connection_pools, _connection_pools_pid, _connection_pool_lock, _executor, _executor_lock
+    if LocalSession._instance is not None:
+        LocalSession._instance.pool.abandon()
+        if LocalSession._instance.health_checker is not None:
+            LocalSession._instance.health_checker.stop()
+        if LocalSession._instance.slow_query_log is not None:
+            hooks.unregister_hook(LocalSession._instance.slow_query_log)
+        hooks.unregister_hook(LocalSession._instance.metrics)
+    LocalSession._instance = None
+    LocalSession._lock = threading.Lock()
+    _connection_pools, _connection_pools_pid, _connection_pool_lock = {}, None, threading.Lock()
+    _executor, _executor_lock = None, threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
 
 if __name__ == '__main__':
     from nebula_carina.ngql.schema.space import create_space, show_spaces  # noqa
@@ -0,0 +1,128 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from nebula_carina.ngql.connection.retry import StatementKind
+from nebula_carina.ngql.errors import QueryRejectedError
+
+READ = 'read'
+WRITE = 'write'
+
+
+def statement_class(kind: StatementKind) -> str:
+    return READ if kind == StatementKind.READ else WRITE
+
+
+class Gate(object):
+    """
+    the in-flight and the queued queries of a space and a statement class
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.waited = 0  # the admitted queries which had to queue
+        self.wait_seconds = 0.
+        self.max_wait_seconds = 0.
+
+    def dict(self) -> dict[str, any]:
+        with self.condition:
+            return {
+                'limit': self.limit, 'in_flight': self.in_flight, 'queued': self.queued,
+                'max_queued': self.max_queued, 'admitted': self.admitted, 'rejected': self.rejected,
+                'waited': self.waited, 'wait_seconds': self.wait_seconds, 'max_wait_seconds': self.max_wait_seconds,
+            }
+
+
+class ConcurrencyLimiter(object):
+    """
+    cap the in-flight queries per space and per statement class, so that a spike does not collapse graphd
+    the excess queries queue up to max_queued, each for at most timeout seconds, the others are rejected at once
+    a class without a limit is never queued
+    """
+
+    def __init__(
+            self, *, max_reads: int | None = None, max_writes: int | None = None, max_queued: int | None = None,
+            timeout: float | None = None
+    ):
+        self._limits = {READ: max_reads, WRITE: max_writes}
+        self._max_queued = max_queued
+        self._timeout = timeout
+        self._gates: dict[tuple[str | None, str], Gate] = {}
+        self._lock = threading.Lock()
+
+    def _gate(self, space: str | None, klass: str) -> Gate | None:
+        if self._limits[klass] is None:
+            return None
+        try:
+            return self._gates[(space, klass)]
+        except KeyError:
+            with self._lock:
+                return self._gates.setdefault((space, klass), Gate(self._limits[klass]))
+
+    def acquire(self, space: str | None, klass: str) -> Gate | None:
+        gate = self._gate(space, klass)
+        if gate is None:
+            return None
+        with gate.condition:
+            # the queued queries go first, so that a newcomer does not overtake them
+            if gate.in_flight < gate.limit and not gate.queued:
+                gate.in_flight += 1
+                gate.admitted += 1
+                return gate
+            if self._max_queued is not None and gate.queued >= self._max_queued:
+                gate.rejected += 1
+                raise QueryRejectedError(space, klass, f'{gate.queued} queries are already queued')
+            start = time.monotonic()
+            deadline = None if self._timeout is None else start + self._timeout
+            gate.queued += 1
+            gate.max_queued = max(gate.max_queued, gate.queued)
+            try:
+                while gate.in_flight >= gate.limit:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        gate.rejected += 1
+                        raise QueryRejectedError(
+                            space, klass, f'no room among {gate.limit} in-flight queries within {self._timeout} seconds'
+                        )
+                    gate.condition.wait(remaining)
+            finally:
+                gate.queued -= 1
+            waited = time.monotonic() - start
+            gate.in_flight += 1
+            gate.admitted += 1
+            gate.waited += 1
+            gate.wait_seconds += waited
+            gate.max_wait_seconds = max(gate.max_wait_seconds, waited)
+            return gate
+
+    @staticmethod
+    def release(gate: Gate | None):
+        if gate is None:
+            return
+        with gate.condition:
+            gate.in_flight -= 1
+            gate.condition.notify()
+
+    @contextmanager
+    def admit(self, space: str | None, kind: StatementKind):
+        gate = self.acquire(space, statement_class(kind))
+        try:
+            yield
+        finally:
+            self.release(gate)
+
+    def stats(self) -> dict[str, dict[str, any]]:
+        """
+        the metrics of the gates, keyed like "main:read", the space of the space-less queries being empty
+        """
+        with self._lock:
+            gates = dict(self._gates)
+        return {f'{space or ""}:{klass}': gate.dict() for (space, klass), gate in sorted(
+            gates.items(), key=lambda item: (item[0][0] or '', item[0][1])
+        )}
@@ -0,0 +1,1193 @@
+"""
+an in-process stand-in of graphd keeping the graphs in memory, so that the models can be tested and benchmarked
+without a cluster
+it understands the ngqls carina emits: INSERT, UPDATE, UPSERT and DELETE of the vertices and the edges,
+MATCH, GO, FETCH PROP, CREATE, DROP, DESCRIBE, SHOW and USE
+"""
+import re
+import threading
+import time as time_
+from datetime import datetime, date, time, timezone
+from functools import partial
+from typing import Callable, Iterable, Iterator
+
+from nebula3.common import ttypes
+from nebula3.common.ttypes import ErrorCode
+from nebula3.data.ResultSet import ResultSet
+from nebula3.graph.ttypes import ExecutionResponse
+
+from nebula_carina.ngql.connection.backend import Backend
+from nebula_carina.ngql.errors import NGqlError
+from nebula_carina.ngql.schema.data_types import python_value2ttype, _to_utc
+from nebula_carina.settings import database_settings
+
+_token_pattern = re.compile(
+    r'\s*(?:(?P<string>"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')|(?P<number>\d+\.\d+(?:[eE][+-]?\d+)?|\d+)'
+    r'|(?P<param>\$\w+)|(?P<name>`[^`]*`|[A-Za-z_]\w*)'
+    r'|(?P<op>\$\$|\$\^|\$-|->|<-|<>|==|!=|<=|>=|\.\.|[-+*/%<>=()\[\]{},;:@.|]))'
+)
+_escape_pattern = re.compile(r'\\(.)')
+_escapes = {'n': '\n', 't': '\t', 'r': '\r'}
+
+
+class _Token(object):
+    __slots__ = ('kind', 'value', 'start', 'end')
+
+    def __init__(self, kind: str, value: any, start: int, end: int):
+        self.kind = kind
+        self.value = value
+        self.start = start
+        self.end = end
+
+
+def _tokenize(ngql: str) -> list[_Token]:
+    tokens, position = [], 0
+    while position < len(ngql):
+        match = _token_pattern.match(ngql, position)
+        if match is None:
+            if ngql[position:].strip():
+                raise NGqlError(
+                    f'SyntaxError: syntax error near `{ngql[position:position + 10]}\'', ErrorCode.E_SYNTAX_ERROR, ngql
+                )
+            break
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'string':
+            value = _escape_pattern.sub(lambda m: _escapes.get(m.group(1), m.group(1)), value[1:-1])
+        elif kind == 'number':
+            value = float(value) if '.' in value else int(value)
+        elif kind == 'name' and value.startswith('`'):
+            value = value[1:-1]
+        tokens.append(_Token(kind, value, match.start(kind), match.end()))
+        position = match.end()
+    return tokens
+
+
+def _now(function: str):
+    now = datetime.now(timezone.utc)
+    return {'datetime': now, 'date': now.date(), 'time': now.time()}[function]
+
+
+def _normalize(value: any) -> any:
+    # the datetimes are kept in utc like graphd does, so that they compare with each other
+    if isinstance(value, datetime):
+        return _to_utc(value)
+    if isinstance(value, (list, tuple, set)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+class _Now(object):
+    """
+    the default of a property being the time of the insert, e.g. DEFAULT datetime()
+    """
+    __slots__ = ('function', )
+
+    def __init__(self, function: str):
+        self.function = function
+
+    def __str__(self):
+        return f'{self.function}()'
+
+
+class _Field(object):
+    __slots__ = ('name', 'type', 'nullable', 'default', 'comment')
+
+    def __init__(self, name: str, data_type: str, nullable: bool, default: any, comment: str | None):
+        self.name = name
+        self.type = data_type
+        self.nullable = nullable
+        self.default = default
+        self.comment = comment
+
+    def default_value(self) -> any:
+        return _now(self.default.function) if isinstance(self.default, _Now) else self.default
+
+
+class _Vertex(object):
+    __slots__ = ('vid', 'tags')
+
+    def __init__(self, vid: any, tags: dict[str, dict[str, any]]):
+        self.vid = vid
+        self.tags = tags
+
+
+class _Edge(object):
+    __slots__ = ('src', 'dst', 'name', 'ranking', 'props')
+
+    def __init__(self, src: any, dst: any, name: str, ranking: int, props: dict[str, any]):
+        self.src = src
+        self.dst = dst
+        self.name = name
+        self.ranking = ranking
+        self.props = props
+
+    @property
+    def key(self) -> tuple:
+        return self.src, self.name, self.ranking, self.dst
+
+
+class _Space(object):
+    def __init__(self, name: str, options: dict[str, str], comment: str | None = None):
+        self.name = name
+        self.options = options
+        self.comment = comment
+        self.tags: dict[str, list[_Field]] = {}
+        self.edge_types: dict[str, list[_Field]] = {}
+        self.edge_type_ids: dict[str, int] = {}
+        self.vertices: dict[any, _Vertex] = {}
+        self.edges: dict[tuple, _Edge] = {}
+        self.out_edges: dict[any, dict[tuple, _Edge]] = {}
+        self.in_edges: dict[any, dict[tuple, _Edge]] = {}
+
+    def edge_type_id(self, name: str) -> int:
+        return self.edge_type_ids.setdefault(name, len(self.edge_type_ids) + 1)
+
+    def defaults(self, schema: list[_Field] | None) -> dict[str, any]:
+        return {field.name: field.default_value() for field in schema or ()}
+
+    def put_edge(self, edge: _Edge):
+        self.edge_type_id(edge.name)
+        self.edges[edge.key] = edge
+        self.out_edges.setdefault(edge.src, {})[edge.key] = edge
+        self.in_edges.setdefault(edge.dst, {})[edge.key] = edge
+
+    def clear(self):
+        self.vertices.clear()
+        self.edges.clear()
+        self.out_edges.clear()
+        self.in_edges.clear()
+
+    def remove_edge(self, key: tuple):
+        if (edge := self.edges.pop(key, None)) is not None:
+            self.out_edges[edge.src].pop(key, None)
+            self.in_edges[edge.dst].pop(key, None)
+
+    def adjacent(self, vid: any, names: set[str] | None, direction: str) -> Iterator[tuple[_Edge, any]]:
+        if direction in ('->', '-'):
+            for edge in list(self.out_edges.get(vid, {}).values()):
+                if names is None or edge.name in names:
+                    yield edge, edge.dst
+        if direction in ('<-', '-'):
+            for edge in list(self.in_edges.get(vid, {}).values()):
+                if names is None or edge.name in names:
+                    yield edge, edge.src
+
+
+class _Result(object):
+    __slots__ = ('columns', 'rows')
+
+    def __init__(self, columns: list[str] | None = None, rows: list[list[any]] | None = None):
+        self.columns = columns
+        self.rows = rows or []
+
+
+def _compare(operator: str, left: any, right: any) -> bool | None:
+    if left is None or right is None:
+        return None
+    try:
+        if operator == '==':
+            return left == right
+        if operator in ('!=', '<>'):
+            return left != right
+        if operator == '<':
+            return left < right
+        if operator == '<=':
+            return left <= right
+        if operator == '>':
+            return left > right
+        return left >= right
+    except TypeError:
+        return None
+
+
+def _arithmetic(operator: str, left: any, right: any) -> any:
+    if left is None or right is None:
+        return None
+    if operator == '+':
+        return left + right
+    if operator == '-':
+        return left - right
+    if operator == '*':
+        return left * right
+    if operator == '/':
+        return left // right if isinstance(left, int) and isinstance(right, int) else left / right
+    return left % right
+
+
+def _property(scope: dict[str, any], chain: list[str]) -> any:
+    value = scope.get(chain[0])
+    if value is None:
+        if '$props' in scope and len(chain) == 1:
+            return scope['$props'].get(chain[0])
+        if isinstance(vertex := scope.get('vertex'), _Vertex) and len(chain) == 2:
+            return vertex.tags.get(chain[0], {}).get(chain[1])
+        if isinstance(edge := scope.get('edge'), _Edge) and len(chain) == 2:
+            return edge.props.get(chain[1]) if edge.name == chain[0] else None
+        return None
+    for i, name in enumerate(chain[1:], 1):
+        if isinstance(value, _Vertex):
+            if i + 1 >= len(chain):
+                return None
+            return value.tags.get(name, {}).get(chain[i + 1])
+        if isinstance(value, _Edge):
+            value = value.props.get(name)
+        elif isinstance(value, dict):
+            value = value.get(name)
+        else:
+            return None
+    return value
+
+
+def _properties(value: any) -> dict[str, any] | None:
+    if isinstance(value, _Vertex):
+        return {k: v for props in value.tags.values() for k, v in props.items()}
+    if isinstance(value, _Edge):
+        return dict(value.props)
+    return None
+
+
+def _time_function(function: str, argument: any):
+    if argument is None:
+        return _now(function)
+    if function == 'datetime':
+        return _to_utc(datetime.fromisoformat(argument))
+    return date.fromisoformat(argument) if function == 'date' else time.fromisoformat(argument)
+
+
+_FUNCTIONS: dict[str, Callable] = {
+    'id': lambda v: v.vid if isinstance(v, _Vertex) else None,
+    'src': lambda e: e.src if isinstance(e, _Edge) else None,
+    'dst': lambda e: e.dst if isinstance(e, _Edge) else None,
+    'rank': lambda e: e.ranking if isinstance(e, _Edge) else None,
+    'type': lambda e: e.name if isinstance(e, _Edge) else None,
+    'tags': lambda v: list(v.tags) if isinstance(v, _Vertex) else None,
+    'labels': lambda v: list(v.tags) if isinstance(v, _Vertex) else None,
+    'properties': _properties,
+    'size': lambda v: None if v is None else len(v),
+    'datetime': lambda v=None: _time_function('datetime', v),
+    'date': lambda v=None: _time_function('date', v),
+    'time': lambda v=None: _time_function('time', v),
+}
+
+_Expression = Callable[[dict[str, any]], any]
+
+
+class _Parser(object):
+    """
+    a recursive descent parser of a statement, the expressions being compiled into functions of the scope
+    """
+
+    def __init__(self, ngql: str, tokens: list[_Token], params: dict[str, any]):
+        self.ngql = ngql
+        self.tokens = tokens
+        self.params = params
+        self.position = 0
+
+    def error(self, message: str | None = None) -> NGqlError:
+        token = self.peek()
+        near = self.ngql[token.start:token.end] if token else '<EOF>'
+        return NGqlError(message or f'SyntaxError: syntax error near `{near}\'', ErrorCode.E_SYNTAX_ERROR, self.ngql)
+
+    def peek(self, offset: int = 0) -> _Token | None:
+        position = self.position + offset
+        return self.tokens[position] if position < len(self.tokens) else None
+
+    def next(self) -> _Token:
+        if (token := self.peek()) is None:
+            raise self.error()
+        self.position += 1
+        return token
+
+    @property
+    def done(self) -> bool:
+        return self.position >= len(self.tokens)
+
+    def is_(self, value: str, offset: int = 0) -> bool:
+        token = self.peek(offset)
+        if token is None:
+            return False
+        if token.kind == 'name':
+            return token.value.upper() == value
+        return token.kind == 'op' and token.value == value
+
+    def accept(self, *values: str) -> bool:
+        if all(self.is_(value, i) for i, value in enumerate(values)):
+            self.position += len(values)
+            return True
+        return False
+
+    def expect(self, *values: str):
+        if not self.accept(*values):
+            raise self.error()
+
+    def name(self) -> str:
+        token = self.next()
+        if token.kind != 'name':
+            self.position -= 1
+            raise self.error()
+        return token.value
+
+    def names(self) -> list[str]:
+        names = [self.name()]
+        while self.accept(','):
+            names.append(self.name())
+        return names
+
+    def text(self, start: int) -> str:
+        return self.ngql[self.tokens[start].start:self.tokens[self.position - 1].end]
+
+    def constant(self) -> any:
+        return self.expression()({})
+
+    # expressions, from the loosest to the tightest binding
+    def expression(self) -> _Expression:
+        left = self._xor()
+        while self.accept('OR'):
+            right = self._xor()
+            left = (lambda l, r: lambda s: bool(l(s)) or bool(r(s)))(left, right)
+        return left
+
+    def _xor(self) -> _Expression:
+        left = self._and()
+        while self.accept('XOR'):
+            right = self._and()
+            left = (lambda l, r: lambda s: bool(l(s)) != bool(r(s)))(left, right)
+        return left
+
+    def _and(self) -> _Expression:
+        left = self._not()
+        while self.accept('AND'):
+            right = self._not()
+            left = (lambda l, r: lambda s: bool(l(s)) and bool(r(s)))(left, right)
+        return left
+
+    def _not(self) -> _Expression:
+        if self.accept('NOT'):
+            operand = self._not()
+            return lambda s: not operand(s)
+        return self._comparison()
+
+    def _comparison(self) -> _Expression:
+        left = self._additive()
+        token = self.peek()
+        if token is not None and token.kind == 'op' and token.value in ('==', '!=', '<>', '<', '<=', '>', '>='):
+            self.position += 1
+            right = self._additive()
+            return lambda s: _compare(token.value, left(s), right(s))
+        if self.accept('IN'):
+            right = self._additive()
+            return lambda s: None if (v := left(s)) is None or (c := right(s)) is None else v in c
+        if self.accept('NOT', 'IN'):
+            right = self._additive()
+            return lambda s: None if (v := left(s)) is None or (c := right(s)) is None else v not in c
+        if self.accept('IS', 'NULL'):
+            return lambda s: left(s) is None
+        if self.accept('IS', 'NOT', 'NULL'):
+            return lambda s: left(s) is not None
+        return left
+
+    def _additive(self) -> _Expression:
+        left = self._multiplicative()
+        while (token := self.peek()) is not None and token.kind == 'op' and token.value in ('+', '-'):
+            self.position += 1
+            right = self._multiplicative()
+            left = (lambda l, r, o: lambda s: _arithmetic(o, l(s), r(s)))(left, right, token.value)
+        return left
+
+    def _multiplicative(self) -> _Expression:
+        left = self._unary()
+        while (token := self.peek()) is not None and token.kind == 'op' and token.value in ('*', '/', '%'):
+            self.position += 1
+            right = self._unary()
+            left = (lambda l, r, o: lambda s: _arithmetic(o, l(s), r(s)))(left, right, token.value)
+        return left
+
+    def _unary(self) -> _Expression:
+        if self.accept('-'):
+            operand = self._unary()
+            return lambda s: None if (v := operand(s)) is None else -v
+        return self.primary()
+
+    def primary(self) -> _Expression:
+        token = self.next()
+        if token.kind in ('string', 'number'):
+            return lambda s: token.value
+        if token.kind == 'param':
+            name = token.value[1:]
+            if name not in self.params:
+                raise NGqlError(
+                    f'SemanticError: Undefined parameter `{name}\'', ErrorCode.E_SEMANTIC_ERROR, self.ngql
+                )
+            value = self.params[name]
+            return lambda s: value
+        if token.kind == 'op' and token.value in ('$$', '$^'):
+            # the vertices of a step of GO
+            chain = [token.value]
+            while self.accept('.'):
+                chain.append(self.name())
+            return lambda s: _property(s, chain)
+        if token.kind == 'op' and token.value == '(':
+            expression = self.expression()
+            self.expect(')')
+            return expression
+        if token.kind == 'op' and token.value == '[':
+            items = []
+            if not self.accept(']'):
+                items.append(self.expression())
+                while self.accept(','):
+                    items.append(self.expression())
+                self.expect(']')
+            return lambda s: [item(s) for item in items]
+        if token.kind != 'name':
+            self.position -= 1
+            raise self.error()
+        keyword = token.value.upper()
+        if keyword in ('TRUE', 'FALSE'):
+            return lambda s: keyword == 'TRUE'
+        if keyword == 'NULL':
+            return lambda s: None
+        if self.accept('('):
+            function = _FUNCTIONS.get(token.value.lower())
+            if function is None:
+                self.position -= 2
+                raise self.error(f'SemanticError: Unknown function `{token.value}\'')
+            arguments = []
+            if not self.accept(')'):
+                arguments.append(self.expression())
+                while self.accept(','):
+                    arguments.append(self.expression())
+                self.expect(')')
+            def call(s):
+                return function(*(argument(s) for argument in arguments))
+
+            chain = ['$value']
+            while self.accept('.'):
+                chain.append(self.name())
+            # e.g. properties(edge).times
+            return (lambda s: _property({'$value': call(s)}, chain)) if len(chain) > 1 else call
+        chain = [token.value]
+        while self.accept('.'):
+            chain.append(self.name())
+        return lambda s: _property(s, chain)
+
+    def items(self) -> list[tuple[str, _Expression]]:
+        """
+        the items of RETURN or YIELD, named by their aliases or by their texts
+        """
+        items = []
+        while True:
+            start = self.position
+            expression = self.expression()
+            name = self.name() if self.accept('AS') else self.text(start)
+            items.append((name, expression))
+            if not self.accept(','):
+                return items
+
+
+class InMemoryBackend(Backend):
+    """
+    the graphs of the spaces in memory, the default space being created at once
+    the vertices and the edges are what the ngqls insert, with the defaults of the created tags and edge types
+    """
+
+    def __init__(self, spaces: Iterable[str] | None = None):
+        self._spaces: dict[str, _Space] = {}
+        for name in (spaces if spaces is not None else [database_settings.default_space]):
+            self._spaces[name] = _Space(name, {'vid_type': 'FIXED_STRING(32)'})
+        self._lock = threading.RLock()
+
+    def execute(self, ngql: str, space: str | None, params: dict[str, any] | None, as_json: bool) -> ResultSet | dict:
+        start = time_.perf_counter()
+        params = {key: _normalize(value) for key, value in params.items()} if params else {}
+        tokens = _tokenize(ngql)
+        statements, begin = [], 0
+        for i, token in enumerate(tokens):
+            if token.kind == 'op' and token.value == ';':
+                statements.append(tokens[begin:i])
+                begin = i + 1
+        statements.append(tokens[begin:])
+        result = _Result()
+        with self._lock:
+            for statement in statements:
+                if statement:
+                    result, space = self._run(_Parser(ngql, statement, params), space)
+        latency = int((time_.perf_counter() - start) * 1e6)
+        if as_json:
+            return self._json(result, latency, space)
+        return self._result_set(result, latency, space)
+
+    def _space(self, parser: _Parser, name: str | None) -> _Space:
+        if name is None:
+            raise NGqlError('SemanticError: Space was not chosen.', ErrorCode.E_SEMANTIC_ERROR, parser.ngql)
+        if name not in self._spaces:
+            raise NGqlError(f'SpaceNotFound: SpaceName `{name}\'', ErrorCode.E_EXECUTION_ERROR, parser.ngql)
+        return self._spaces[name]
+
+    def _run(self, parser: _Parser, space: str | None) -> tuple[_Result, str | None]:
+        if parser.accept('USE'):
+            name = parser.name()
+            self._space(parser, name)
+            return _Result(), name
+        if parser.accept('YIELD'):
+            items = parser.items()
+            return _Result([name for name, _ in items], [[expression({}) for _, expression in items]]), space
+        for keywords, method in self._statements:
+            if parser.accept(*keywords):
+                result = method(parser, self._space(parser, space))
+                if not parser.done:
+                    raise parser.error()
+                return result, space
+        return self._run_space_statement(parser), space
+
+    @property
+    def _statements(self) -> list[tuple[tuple[str, ...], Callable[[_Parser, _Space], _Result]]]:
+        return [
+            (('INSERT', 'VERTEX'), self._insert_vertex), (('INSERT', 'EDGE'), self._insert_edge),
+            (('UPDATE', 'VERTEX', 'ON'), partial(self._update_vertex, upsert=False)),
+            (('UPSERT', 'VERTEX', 'ON'), partial(self._update_vertex, upsert=True)),
+            (('UPDATE', 'EDGE', 'ON'), partial(self._update_edge, upsert=False)),
+            (('UPSERT', 'EDGE', 'ON'), partial(self._update_edge, upsert=True)),
+            (('DELETE', 'VERTEX'), self._delete_vertex), (('DELETE', 'EDGE'), self._delete_edge),
+            (('DELETE', 'TAG'), self._delete_tag), (('MATCH', ), self._match), (('FETCH', 'PROP', 'ON'), self._fetch),
+            (('GO', ), self._go),
+            (('CREATE', 'TAG'), partial(self._create_schema, is_tag=True)),
+            (('CREATE', 'EDGE'), partial(self._create_schema, is_tag=False)),
+            (('DROP', 'TAG'), partial(self._drop_schema, is_tag=True)),
+            (('DROP', 'EDGE'), partial(self._drop_schema, is_tag=False)),
+            (('DESCRIBE', 'TAG'), partial(self._describe_schema, is_tag=True)),
+            (('DESC', 'TAG'), partial(self._describe_schema, is_tag=True)),
+            (('DESCRIBE', 'EDGE'), partial(self._describe_schema, is_tag=False)),
+            (('DESC', 'EDGE'), partial(self._describe_schema, is_tag=False)),
+            (('SHOW', 'TAGS'), partial(self._show_schemas, is_tag=True)),
+            (('SHOW', 'EDGES'), partial(self._show_schemas, is_tag=False)),
+        ]
+
+    # spaces
+    def _run_space_statement(self, parser: _Parser) -> _Result:
+        if parser.accept('SHOW', 'SPACES'):
+            return _Result(['Name'], [[name] for name in sorted(self._spaces)])
+        if parser.accept('CREATE', 'SPACE'):
+            if_not_exists = parser.accept('IF', 'NOT', 'EXISTS')
+            name, options, comment = parser.name(), {}, None
+            if parser.accept('('):
+                while not parser.accept(')'):
+                    key = parser.name().lower()
+                    parser.expect('=')
+                    start, depth = parser.position, 0
+                    while depth or not (parser.is_(',') or parser.is_(')')):
+                        depth += parser.is_('(') - parser.is_(')')
+                        parser.next()
+                    options[key] = parser.text(start)
+                    parser.accept(',')
+            if parser.accept('COMMENT'):
+                parser.accept('=')
+                comment = parser.constant()
+            if name in self._spaces and not if_not_exists:
+                raise NGqlError('Existed!', ErrorCode.E_EXISTED, parser.ngql)
+            self._spaces.setdefault(name, _Space(name, options, comment))
+            return _Result()
+        for keywords in (('DROP', 'SPACE'), ('CLEAR', 'SPACE')):
+            if parser.accept(*keywords):
+                if_exists = parser.accept('IF', 'EXISTS')
+                name = parser.name()
+                if name not in self._spaces:
+                    if if_exists:
+                        return _Result()
+                    self._space(parser, name)
+                if keywords[0] == 'DROP':
+                    del self._spaces[name]
+                else:
+                    self._spaces[name].clear()
+                return _Result()
+        if parser.accept('DESCRIBE', 'SPACE') or parser.accept('DESC', 'SPACE'):
+            space = self._space(parser, parser.name())
+            options = space.options
+            return _Result(
+                [
+                    'ID', 'Name', 'Partition Number', 'Replica Factor', 'Charset', 'Collate', 'Vid Type',
+                    'Atomic Edge', 'Group', 'Comment',
+                ],
+                [[
+                    list(self._spaces).index(space.name) + 1, space.name, int(options.get('partition_num', 100)),
+                    int(options.get('replica_factor', 1)), 'utf8', 'utf8_bin',
+                    options.get('vid_type', 'FIXED_STRING(32)'), False, 'default', space.comment,
+                ]]
+            )
+        raise parser.error()
+
+    # schemas
+    def _create_schema(self, parser: _Parser, space: _Space, is_tag: bool) -> _Result:
+        schemas = space.tags if is_tag else space.edge_types
+        if_not_exists = parser.accept('IF', 'NOT', 'EXISTS')
+        name = parser.name()
+        fields = []
+        parser.expect('(')
+        while not parser.accept(')'):
+            field_name = parser.name()
+            start = parser.position
+            parser.name()
+            if parser.accept('('):
+                parser.next()
+                parser.expect(')')
+            data_type = parser.text(start).lower()
+            nullable, default, comment = True, None, None
+            while not (parser.is_(',') or parser.is_(')')):
+                if parser.accept('NOT', 'NULL'):
+                    nullable = False
+                elif parser.accept('NULL'):
+                    nullable = True
+                elif parser.accept('DEFAULT'):
+                    token = parser.peek()
+                    if token.kind == 'name' and token.value.lower() in ('datetime', 'date', 'time') \
+                            and parser.is_('(', 1) and parser.is_(')', 2):
+                        parser.position += 3
+                        default = _Now(token.value.lower())
+                    else:
+                        default = parser.constant()
+                elif parser.accept('COMMENT'):
+                    comment = parser.constant()
+                else:
+                    raise parser.error()
+            fields.append(_Field(field_name, data_type, nullable, default, comment))
+            parser.accept(',')
+        while not parser.done:  # the ttl is not enforced
+            parser.next()
+        if name in schemas and not if_not_exists:
+            raise NGqlError('Existed!', ErrorCode.E_EXISTED, parser.ngql)
+        schemas.setdefault(name, fields)
+        if not is_tag:
+            space.edge_type_id(name)
+        return _Result()
+
+    def _drop_schema(self, parser: _Parser, space: _Space, is_tag: bool) -> _Result:
+        schemas = space.tags if is_tag else space.edge_types
+        if_exists = parser.accept('IF', 'EXISTS')
+        name = parser.name()
+        if name not in schemas and not if_exists:
+            raise NGqlError('Not existed!', ErrorCode.E_EXECUTION_ERROR, parser.ngql)
+        schemas.pop(name, None)
+        return _Result()
+
+    def _describe_schema(self, parser: _Parser, space: _Space, is_tag: bool) -> _Result:
+        schemas = space.tags if is_tag else space.edge_types
+        name = parser.name()
+        if name not in schemas:
+            raise NGqlError('Not existed!', ErrorCode.E_EXECUTION_ERROR, parser.ngql)
+        return _Result(['Field', 'Type', 'Null', 'Default', 'Comment'], [
+            [
+                field.name, field.type, 'YES' if field.nullable else 'NO',
+                str(field.default) if isinstance(field.default, _Now) else field.default, field.comment or '',
+            ] for field in schemas[name]
+        ])
+
+    def _show_schemas(self, parser: _Parser, space: _Space, is_tag: bool) -> _Result:
+        schemas = space.tags if is_tag else space.edge_types
+        return _Result(['Name'], [[name] for name in sorted(schemas)])
+
+    # vertices
+    def _insert_vertex(self, parser: _Parser, space: _Space) -> _Result:
+        if_not_exists = parser.accept('IF', 'NOT', 'EXISTS')
+        tags = []
+        while True:
+            tag = parser.name()
+            parser.expect('(')
+            props = [] if parser.accept(')') else parser.names()
+            if props:
+                parser.expect(')')
+            tags.append((tag, props))
+            if not parser.accept(','):
+                break
+        parser.expect('VALUES')
+        while True:
+            vid = parser.constant()
+            parser.expect(':')
+            parser.expect('(')
+            values = [] if parser.accept(')') else [parser.constant()]
+            if values:
+                while parser.accept(','):
+                    values.append(parser.constant())
+                parser.expect(')')
+            if len(values) != sum(len(props) for _, props in tags):
+                raise NGqlError(
+                    'SemanticError: Column count doesn\'t match value count.', ErrorCode.E_SEMANTIC_ERROR, parser.ngql
+                )
+            vertex = space.vertices.get(vid)
+            if vertex is None:
+                vertex = space.vertices[vid] = _Vertex(vid, {})
+            values = iter(values)
+            for tag, props in tags:
+                if if_not_exists and tag in vertex.tags:
+                    for _ in props:
+                        next(values)
+                    continue
+                vertex.tags[tag] = {**space.defaults(space.tags.get(tag)), **{prop: next(values) for prop in props}}
+            if not parser.accept(','):
+                return _Result()
+
+    def _assignments(self, parser: _Parser) -> list[tuple[str, _Expression]]:
+        parser.expect('SET')
+        assignments = []
+        while True:
+            name = parser.name()
+            parser.expect('=')
+            assignments.append((name, parser.expression()))
+            if not parser.accept(','):
+                return assignments
+
+    def _update(
+            self, parser: _Parser, props: dict[str, any] | None, make_props: Callable[[], dict[str, any]], upsert: bool
+    ) -> _Result:
+        assignments = self._assignments(parser)
+        condition = parser.expression() if parser.accept('WHEN') else None
+        items = parser.items() if parser.accept('YIELD') else None
+        if props is None:
+            if not upsert:
+                raise NGqlError('Storage Error: Vertex or edge not found.', ErrorCode.E_EXECUTION_ERROR, parser.ngql)
+            props = make_props()
+        scope = {'$props': props}
+        if condition is None or condition(scope):
+            # the values are computed from the properties before the update, like graphd does
+            props.update({name: expression(scope) for name, expression in assignments})
+        if items is None:
+            return _Result()
+        return _Result([name for name, _ in items], [[expression(scope) for _, expression in items]])
+
+    def _update_vertex(self, parser: _Parser, space: _Space, upsert: bool) -> _Result:
+        tag = parser.name()
+        vid = parser.primary()({})
+        vertex = space.vertices.get(vid)
+        props = None if vertex is None else vertex.tags.get(tag)
+
+        def make_props():
+            target = space.vertices.get(vid) or space.vertices.setdefault(vid, _Vertex(vid, {}))
+            target.tags[tag] = space.defaults(space.tags.get(tag))
+            return target.tags[tag]
+        return self._update(parser, props, make_props, upsert)
+
+    def _edge_reference(self, parser: _Parser) -> tuple[any, any, int]:
+        src = parser.primary()({})
+        parser.expect('->')
+        dst = parser.primary()({})
+        ranking = parser.primary()({}) if parser.accept('@') else 0
+        return src, dst, ranking
+
+    def _update_edge(self, parser: _Parser, space: _Space, upsert: bool) -> _Result:
+        name = parser.name()
+        src, dst, ranking = self._edge_reference(parser)
+        edge = space.edges.get((src, name, ranking, dst))
+
+        def make_props():
+            space.put_edge(_Edge(src, dst, name, ranking, space.defaults(space.edge_types.get(name))))
+            return space.edges[(src, name, ranking, dst)].props
+        return self._update(parser, None if edge is None else edge.props, make_props, upsert)
+
+    def _vids(self, parser: _Parser) -> list[any]:
+        vids = []
+        while True:
+            value = parser.constant()
+            vids.extend(value if isinstance(value, list) else [value])
+            if not parser.accept(','):
+                return vids
+
+    def _delete_vertex(self, parser: _Parser, space: _Space) -> _Result:
+        vids = self._vids(parser)
+        with_edge = parser.accept('WITH', 'EDGE')
+        for vid in vids:
+            space.vertices.pop(vid, None)
+            if with_edge:
+                for key in list(space.out_edges.get(vid, {})) + list(space.in_edges.get(vid, {})):
+                    space.remove_edge(key)
+        return _Result()
+
+    def _delete_tag(self, parser: _Parser, space: _Space) -> _Result:
+        tags = None if parser.accept('*') else parser.names()
+        parser.expect('FROM')
+        for vid in self._vids(parser):
+            if (vertex := space.vertices.get(vid)) is not None:
+                for tag in list(vertex.tags) if tags is None else tags:
+                    vertex.tags.pop(tag, None)
+        return _Result()
+
+    # edges
+    def _insert_edge(self, parser: _Parser, space: _Space) -> _Result:
+        if_not_exists = parser.accept('IF', 'NOT', 'EXISTS')
+        name = parser.name()
+        parser.expect('(')
+        props = [] if parser.accept(')') else parser.names()
+        if props:
+            parser.expect(')')
+        parser.expect('VALUES')
+        while True:
+            src, dst, ranking = self._edge_reference(parser)
+            parser.expect(':')
+            parser.expect('(')
+            values = [] if parser.accept(')') else [parser.constant()]
+            if values:
+                while parser.accept(','):
+                    values.append(parser.constant())
+                parser.expect(')')
+            if len(values) != len(props):
+                raise NGqlError(
+                    'SemanticError: Column count doesn\'t match value count.', ErrorCode.E_SEMANTIC_ERROR, parser.ngql
+                )
+            if not (if_not_exists and (src, name, ranking, dst) in space.edges):
+                space.put_edge(_Edge(src, dst, name, ranking, {
+                    **space.defaults(space.edge_types.get(name)), **dict(zip(props, values))
+                }))
+            if not parser.accept(','):
+                return _Result()
+
+    def _delete_edge(self, parser: _Parser, space: _Space) -> _Result:
+        name = parser.name()
+        while True:
+            src, dst, ranking = self._edge_reference(parser)
+            space.remove_edge((src, name, ranking, dst))
+            if not parser.accept(','):
+                return _Result()
+
+    # queries
+    @staticmethod
+    def _project(
+            parser: _Parser, scopes: Iterable[dict[str, any]], items: list[tuple[str, _Expression]], distinct: bool
+    ) -> _Result:
+        order_by = []
+        if parser.accept('ORDER', 'BY'):
+            while True:
+                expression = parser.expression()
+                descending = parser.accept('DESC')
+                if not descending:
+                    parser.accept('ASC')
+                order_by.append((expression, descending))
+                if not parser.accept(','):
+                    break
+        skip = parser.constant() if parser.accept('SKIP') else 0
+        limit = parser.constant() if parser.accept('LIMIT') else None
+        rows = []
+        for scope in scopes:
+            values = [expression(scope) for _, expression in items]
+            rows.append((values, {**scope, **{name: value for (name, _), value in zip(items, values)}}))
+        if distinct:
+            seen, unique = set(), []
+            for values, scope in rows:
+                if (key := tuple(_identity(value) for value in values)) not in seen:
+                    seen.add(key)
+                    unique.append((values, scope))
+            rows = unique
+        for expression, descending in reversed(order_by):
+            rows.sort(key=lambda row: _sort_key(expression(row[1])), reverse=descending)
+        rows = rows[skip:] if limit is None else rows[skip:skip + limit]
+        return _Result([name for name, _ in items], [values for values, _ in rows])
+
+    def _match(self, parser: _Parser, space: _Space) -> _Result:
+        nodes, edges = [self._node(parser)], []
+        while not parser.is_('WHERE') and not parser.is_('RETURN'):
+            edges.append(self._relationship(parser))
+            nodes.append(self._node(parser))
+        condition, hints = None, {}
+        if parser.accept('WHERE'):
+            start = parser.position
+            condition = parser.expression()
+            tokens = parser.tokens[start:parser.position]
+            if not any(token.kind == 'name' and token.value.upper() in ('OR', 'XOR', 'NOT') for token in tokens):
+                hints = self._id_hints(tokens, parser.params)
+        parser.expect('RETURN')
+        distinct = False
+        items = []
+        while True:
+            distinct = parser.accept('DISTINCT') or distinct
+            start = parser.position
+            expression = parser.expression()
+            items.append((parser.name() if parser.accept('AS') else parser.text(start), expression))
+            if not parser.accept(','):
+                break
+        if nodes[0][0] not in hints and nodes[-1][0] in hints and all(hops is None for *_, hops in edges):
+            # start from the end whose id is known
+            nodes.reverse()
+            edges = [
+                (name, types, {'->': '<-', '<-': '->'}.get(direction, direction), hops)
+                for name, types, direction, hops in reversed(edges)
+            ]
+        scopes = (
+            scope for scope in self._walk(space, nodes, edges, hints)
+            if condition is None or condition(scope)
+        )
+        return self._project(parser, scopes, items, distinct)
+
+    @staticmethod
+    def _id_hints(tokens: list[_Token], params: dict[str, any]) -> dict[str, list]:
+        """
+        the known ids of the variables in a condition made of ANDs only, e.g. id(v) == $vid
+        """
+        hints = {}
+        for i in range(len(tokens) - 5):
+            function, opening, name, closing, operator, operand = tokens[i:i + 6]
+            if not (
+                    function.kind == 'name' and function.value.lower() == 'id' and opening.value == '('
+                    and name.kind == 'name' and closing.value == ')' and str(operator.value).upper() in ('==', 'IN')
+            ):
+                continue
+            following = tokens[i + 6] if i + 6 < len(tokens) else None
+            if following is not None and following.kind == 'op' and following.value in ('+', '-', '*', '/', '%', '.'):
+                continue
+            if operand.kind == 'param':
+                value = params.get(operand.value[1:])
+            elif operand.kind in ('string', 'number'):
+                value = operand.value
+            else:
+                continue
+            hints[name.value] = value if operator.value != '==' and isinstance(value, list) else [value]
+        return hints
+
+    @staticmethod
+    def _node(parser: _Parser) -> tuple[str | None, list[str]]:
+        parser.expect('(')
+        name = None if parser.is_(':') or parser.is_(')') else parser.name()
+        tags = []
+        while parser.accept(':'):
+            tags.append(parser.name())
+        parser.expect(')')
+        return name, tags
+
+    @staticmethod
+    def _relationship(parser: _Parser) -> tuple[str | None, set[str] | None, str, tuple[int, int | None] | None]:
+        """
+        :return: the name, the edge types, the direction and the range of the hops of a variable length pattern
+        """
+        incoming = parser.accept('<-')
+        if not incoming:
+            parser.expect('-')
+        name, types, hops = None, None, None
+        if parser.accept('['):
+            name = None if parser.is_(':') or parser.is_(']') or parser.is_('*') else parser.name()
+            if parser.accept(':'):
+                types = {parser.name()}
+                while parser.accept('|'):
+                    types.add(parser.name())
+            if parser.accept('*'):
+                # *, *2, *1..3, *..3 or *1..
+                lower = None if parser.is_('..') or parser.is_(']') else parser.constant()
+                if parser.accept('..'):
+                    hops = (1 if lower is None else lower, None if parser.is_(']') else parser.constant())
+                else:
+                    hops = (1, None) if lower is None else (lower, lower)
+            parser.expect(']')
+        if incoming:
+            parser.expect('-')
+            return name, types, '<-', hops
+        return name, types, '->' if parser.accept('->') else (parser.expect('-') or '-'), hops
+
+    @staticmethod
+    def _walk(space: _Space, nodes: list, edges: list, hints: dict[str, list]) -> Iterator[dict[str, any]]:
+        def matches(node: tuple[str | None, list[str]], vertex: _Vertex) -> bool:
+            name, tags = node
+            if name in hints and vertex.vid not in hints[name]:
+                return False
+            return all(tag in vertex.tags for tag in tags)
+
+        def extend(index: int, vertex: _Vertex, scope: dict[str, any]) -> Iterator[dict[str, any]]:
+            if not matches(nodes[index], vertex):
+                return
+            if nodes[index][0] is not None:
+                scope = {**scope, nodes[index][0]: vertex}
+            if index == len(edges):
+                yield scope
+                return
+            name, types, direction, hops = edges[index]
+            if hops is None:
+                for edge, other in space.adjacent(vertex.vid, types, direction):
+                    yield from extend(
+                        index + 1, space.vertices.get(other) or _Vertex(other, {}),
+                        {**scope, name: edge} if name else scope
+                    )
+                return
+            for walked, other in trails(vertex.vid, types, direction, hops, []):
+                yield from extend(
+                    index + 1, space.vertices.get(other) or _Vertex(other, {}),
+                    {**scope, name: walked} if name else scope
+                )
+
+        def trails(vid: any, types, direction: str, hops: tuple, walked: list) -> Iterator[tuple[list[_Edge], any]]:
+            # the edges of a path are distinct, so that the unbounded patterns end
+            lower, upper = hops
+            if len(walked) >= lower:
+                yield walked, vid
+            if upper is None or len(walked) < upper:
+                for edge, other in space.adjacent(vid, types, direction):
+                    if all(edge is not done for done in walked):
+                        yield from trails(other, types, direction, hops, walked + [edge])
+
+        first = nodes[0][0]
+        if first in hints:
+            starts = [space.vertices.get(vid) for vid in hints[first]]
+            starts = [vertex for vertex in starts if vertex is not None]
+        else:
+            starts = list(space.vertices.values())
+        for vertex in starts:
+            yield from extend(0, vertex, {})
+
+    def _fetch(self, parser: _Parser, space: _Space) -> _Result:
+        names = None if parser.accept('*') else parser.names()
+        start = parser.position
+        parser.primary()
+        is_edge = parser.is_('->') or parser.is_('@')
+        parser.position = start
+        scopes = []
+        if is_edge:
+            while True:
+                src, dst, ranking = self._edge_reference(parser)
+                for name in names or ():
+                    if (edge := space.edges.get((src, name, ranking, dst))) is not None:
+                        scopes.append({'edge': edge})
+                if not parser.accept(','):
+                    break
+        else:
+            for vid in self._vids(parser):
+                vertex = space.vertices.get(vid)
+                if vertex is None:
+                    continue
+                tags = vertex.tags if names is None else {k: v for k, v in vertex.tags.items() if k in names}
+                if tags:
+                    scopes.append({'vertex': _Vertex(vid, tags)})
+        parser.expect('YIELD')
+        distinct = parser.accept('DISTINCT')
+        return self._project(parser, scopes, parser.items(), distinct)
+
+    def _go(self, parser: _Parser, space: _Space) -> _Result:
+        min_steps = max_steps = 1
+        if not parser.is_('FROM'):
+            min_steps = max_steps = parser.constant()
+            if parser.accept('TO'):
+                max_steps = parser.constant()
+            if not parser.accept('STEPS'):
+                parser.expect('STEP')
+        parser.expect('FROM')
+        frontier = list(dict.fromkeys(self._vids(parser)))
+        parser.expect('OVER')
+        names = None if parser.accept('*') else set(parser.names())
+        direction = '<-' if parser.accept('REVERSELY') else '-' if parser.accept('BIDIRECT') else '->'
+        condition = parser.expression() if parser.accept('WHERE') else None
+        parser.expect('YIELD')
+        distinct = parser.accept('DISTINCT')
+        items = parser.items()
+        scopes = []
+        for step in range(1, max_steps + 1):
+            # like graphd, every vertex reached is walked from once by the next step
+            reached = []
+            for vid in frontier:
+                for edge, other in space.adjacent(vid, names, direction):
+                    reached.append(other)
+                    scope = {
+                        'edge': edge, '$^': space.vertices.get(vid) or _Vertex(vid, {}),
+                        '$$': space.vertices.get(other) or _Vertex(other, {}),
+                    }
+                    if step >= min_steps and (condition is None or condition(scope)):
+                        scopes.append(scope)
+            frontier = list(dict.fromkeys(reached))
+        result = self._project(parser, scopes, items, distinct)
+        while parser.accept('|'):
+            parser.expect('LIMIT')
+            skip, limit = 0, parser.constant()
+            if parser.accept(','):
+                skip, limit = limit, parser.constant()
+            result.rows = result.rows[skip:skip + limit]
+        return result
+
+    # the responses
+    @staticmethod
+    def _value(space: _Space, value: any) -> ttypes.Value:
+        if isinstance(value, _Vertex):
+            return ttypes.Value(vVal=ttypes.Vertex(vid=python_value2ttype(value.vid), tags=[
+                ttypes.Tag(name=tag.encode('utf-8'), props={
+                    k.encode('utf-8'): python_value2ttype(v) for k, v in props.items()
+                }) for tag, props in value.tags.items()
+            ]))
+        if isinstance(value, _Edge):
+            return ttypes.Value(eVal=ttypes.Edge(
+                src=python_value2ttype(value.src), dst=python_value2ttype(value.dst),
+                type=space.edge_type_id(value.name) if space else 0, name=value.name.encode('utf-8'),
+                ranking=value.ranking, props={k.encode('utf-8'): python_value2ttype(v) for k, v in value.props.items()}
+            ))
+        if isinstance(value, dict):
+            return ttypes.Value(mVal=ttypes.NMap(kvs={
+                k.encode('utf-8'): InMemoryBackend._value(space, v) for k, v in value.items()
+            }))
+        if isinstance(value, list):
+            return ttypes.Value(lVal=ttypes.NList(values=[InMemoryBackend._value(space, v) for v in value]))
+        return python_value2ttype(value)
+
+    def _result_set(self, result: _Result, latency: int, space: str | None) -> ResultSet:
+        data = None
+        if result.columns is not None:
+            target = self._spaces.get(space)
+            data = ttypes.DataSet(
+                column_names=[column.encode('utf-8') for column in result.columns],
+                rows=[ttypes.Row(values=[self._value(target, value) for value in row]) for row in result.rows],
+            )
+        return ResultSet(ExecutionResponse(
+            error_code=ErrorCode.SUCCEEDED, latency_in_us=latency, data=data,
+            space_name=space.encode('utf-8') if space else None
+        ), all_latency=latency)
+
+    def _json(self, result: _Result, latency: int, space: str | None) -> dict:
+        target = self._spaces.get(space)
+        response = {'columns': result.columns or [], 'latencyInUs': latency, 'spaceName': space or ''}
+        if result.columns is not None:
+            data = []
+            for row in result.rows:
+                items = [_json_item(target, value) for value in row]
+                data.append({'row': [item[0] for item in items], 'meta': [item[1] for item in items]})
+            response['data'] = data
+        return {'errors': [{'code': 0}], 'results': [response]}
+
+
+def _json_value(value: any) -> any:
+    if isinstance(value, datetime):
+        value = value.astimezone(timezone.utc) if value.tzinfo else value
+        return f'{value:%Y-%m-%dT%H:%M:%S}.{value.microsecond:06}000Z'
+    if isinstance(value, time):
+        return f'{value:%H:%M:%S}.{value.microsecond:06}000Z'
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, list):
+        return [_json_value(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _json_value(v) for k, v in value.items()}
+    return value
+
+
+def _json_item(space: _Space | None, value: any) -> tuple[any, any]:
+    if isinstance(value, list) and any(isinstance(item, (_Vertex, _Edge)) for item in value):
+        items = [_json_item(space, item) for item in value]
+        return [item[0] for item in items], [item[1] for item in items]
+    if isinstance(value, _Vertex):
+        return {
+            f'{tag}.{k}': _json_value(v) for tag, props in value.tags.items() for k, v in props.items()
+        }, {'type': 'vertex', 'id': value.vid}
+    if isinstance(value, _Edge):
+        return _json_value(value.props), {'type': 'edge', 'id': {
+            'name': value.name, 'src': value.src, 'dst': value.dst,
+            'type': space.edge_type_id(value.name) if space else 0, 'ranking': value.ranking,
+        }}
+    return _json_value(value), None
+
+
+def _identity(value: any) -> any:
+    if isinstance(value, _Vertex):
+        return 'vertex', value.vid
+    if isinstance(value, _Edge):
+        return ('edge', ) + value.key
+    if isinstance(value, list):
+        return tuple(_identity(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _identity(v)) for k, v in value.items()))
+    return value
+
+
+def _sort_key(value: any) -> tuple:
+    # the nulls are the greatest, like graphd orders them
+    if value is None:
+        return 1, 0
+    if isinstance(value, (_Vertex, _Edge)):
+        return 0, _identity(value)
+    return 0, value
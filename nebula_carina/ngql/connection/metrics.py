@@ -0,0 +1,176 @@
+import threading
+from bisect import bisect_left
+from typing import Iterable
+
+from nebula3.data.ResultSet import ResultSet
+
+from nebula_carina.hooks import Hook
+from nebula_carina.ngql.connection.limiter import ConcurrencyLimiter
+from nebula_carina.ngql.connection.pool import SessionPool
+from nebula_carina.ngql.connection.retry import RetryPolicy
+from nebula_carina.ngql.connection.slow_log import server_latency
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10.)
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+DECODE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+
+
+def _escape(value: any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Iterable[str], values: Iterable[any]) -> str:
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f'{{{pairs}}}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _header(name: str, documentation: str, kind: str) -> list[str]:
+    return [f'# HELP {name} {documentation}', f'# TYPE {name} {kind}']
+
+
+def row_count(result: ResultSet | dict | None) -> int | None:
+    if isinstance(result, ResultSet):
+        return result.row_size()
+    if isinstance(result, dict) and (results := result.get('results')):
+        return len(results[0].get('data') or [])
+    return None
+
+
+class Histogram(object):
+    """
+    a prometheus histogram, whose observations are counted by the labels
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._values: dict[tuple, list] = {}  # the counts of the buckets, the sum and the count by the labels
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            if (values := self._values.get(labels)) is None:
+                values = self._values[labels] = [[0] * len(self.buckets), 0., 0]
+            if index < len(self.buckets):
+                values[0][index] += 1
+            values[1] += value
+            values[2] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(
+                (labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items()
+            )
+        lines = _header(self.name, self.documentation, 'histogram')
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(
+                    f'{self.name}_bucket{_labels(self.label_names + ("le", ), labels + (bound, ))} {cumulative}'
+                )
+            lines.append(f'{self.name}_bucket{_labels(self.label_names + ("le", ), labels + ("+Inf", ))} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {count}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class ClientMetrics(Hook):
+    """
+    the histograms of the queries and of the decoding, rendered in the prometheus text format with the counters of
+    the session pool, of the retry policy and of the gates of the concurrency limiter
+    """
+
+    def __init__(self):
+        self.query_seconds = Histogram(
+            'nebula_carina_query_seconds', 'Seconds the client waited for the queries.',
+            ('space', 'kind', 'outcome'), LATENCY_BUCKETS
+        )
+        self.query_server_seconds = Histogram(
+            'nebula_carina_query_server_seconds', 'Seconds graphd spent on the queries, as told by the responses.',
+            ('space', 'kind'), LATENCY_BUCKETS
+        )
+        self.query_rows = Histogram(
+            'nebula_carina_query_rows', 'Rows returned by the queries.', ('space', 'kind'), ROWS_BUCKETS
+        )
+        self.decode_seconds = Histogram(
+            'nebula_carina_decode_seconds', 'Seconds spent decoding a value into a model.', ('model', ),
+            DECODE_BUCKETS
+        )
+
+    def after_execute(self, ngql: str, result, elapsed: float, error: Exception | None, context: dict[str, any]):
+        space, kind = context.get('space') or '', getattr(context.get('kind'), 'value', '')
+        self.query_seconds.observe(elapsed, space, kind, 'ok' if error is None else 'error')
+        if (server_elapsed := server_latency(result)) is not None:
+            self.query_server_seconds.observe(server_elapsed, space, kind)
+        if (rows := row_count(result)) is not None:
+            self.query_rows.observe(rows, space, kind)
+
+    def after_model_event(self, event: str, model, elapsed: float, error: Exception | None, context: dict[str, any]):
+        if event == 'decode':
+            self.decode_seconds.observe(elapsed, model.__name__)
+
+    def render(
+            self, pool: SessionPool | None = None, retry_policy: RetryPolicy | None = None,
+            limiter: ConcurrencyLimiter | None = None
+    ) -> str:
+        lines = []
+        for histogram in (self.query_seconds, self.query_server_seconds, self.query_rows, self.decode_seconds):
+            lines.extend(histogram.render())
+        if pool is not None:
+            stats = pool.stats()
+            for name, key, kind, documentation in (
+                ('nebula_carina_pool_size', 'size', 'gauge', 'Sessions the pool can hold.'),
+                ('nebula_carina_pool_sessions', 'created', 'gauge', 'Sessions open in the pool.'),
+                ('nebula_carina_pool_idle_sessions', 'idle', 'gauge', 'Sessions idle in the pool.'),
+                ('nebula_carina_pool_checkouts_total', 'checkouts', 'counter', 'Sessions checked out of the pool.'),
+                ('nebula_carina_pool_checkout_waits_total', 'waited', 'counter', 'Checkouts which had to wait.'),
+                (
+                    'nebula_carina_pool_checkout_wait_seconds_total', 'wait_seconds', 'counter',
+                    'Seconds spent waiting for a session.'
+                ),
+                ('nebula_carina_session_recoveries_total', 'renewed', 'counter', 'Broken sessions replaced.'),
+            ):
+                lines.extend(_header(name, documentation, kind))
+                lines.append(f'{name} {_number(stats[key])}')
+        if limiter is not None and (gates := limiter.stats()):
+            for name, key, kind, documentation in (
+                ('nebula_carina_limiter_limit', 'limit', 'gauge', 'Queries allowed in flight.'),
+                ('nebula_carina_limiter_in_flight', 'in_flight', 'gauge', 'Queries in flight.'),
+                ('nebula_carina_limiter_queued', 'queued', 'gauge', 'Queries queued for a room.'),
+                ('nebula_carina_limiter_max_queued', 'max_queued', 'gauge', 'Most queries queued at once.'),
+                ('nebula_carina_limiter_admitted_total', 'admitted', 'counter', 'Queries admitted.'),
+                ('nebula_carina_limiter_rejected_total', 'rejected', 'counter', 'Queries rejected to shed load.'),
+                ('nebula_carina_limiter_waits_total', 'waited', 'counter', 'Admitted queries which had to queue.'),
+                (
+                    'nebula_carina_limiter_wait_seconds_total', 'wait_seconds', 'counter',
+                    'Seconds the admitted queries spent queued.'
+                ),
+                ('nebula_carina_limiter_max_wait_seconds', 'max_wait_seconds', 'gauge', 'Longest queueing.'),
+            ):
+                lines.extend(_header(name, documentation, kind))
+                for gate, stats in gates.items():
+                    lines.append(f'{name}{_labels(("space", "class"), gate.rsplit(":", 1))} {_number(stats[key])}')
+        if retry_policy is not None:
+            name = 'nebula_carina_query_retries_total'
+            lines.extend(_header(name, 'Failed queries by retry outcome, statement kind and reason.', 'counter'))
+            for key, count in retry_policy.counters().items():
+                lines.append(f'{name}{_labels(("outcome", "kind", "reason"), key.split("."))} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        for histogram in (self.query_seconds, self.query_server_seconds, self.query_rows, self.decode_seconds):
+            histogram.reset()
@@ -0,0 +1,71 @@
+import re
+from contextlib import contextmanager
+
+from nebula3.data.ResultSet import ResultSet
+
+from nebula_carina.ngql.connection.connection import run_ngql
+from nebula_carina.ngql.errors import NGqlError, PipelineError, QueryTimeoutError
+
+# the default max_allowed_statements of graphd
+MAX_STATEMENTS = 512
+
+_QUOTED_FRAGMENT = re.compile(r"`([^`']+)'")
+
+
+def find_failed_statement(error_msg: str, statements: list[str]) -> int | None:
+    """
+    graphd does not tell which statement failed, but its messages quote the failing fragment, e.g.
+    SyntaxError: syntax error near `VERTEX'
+    return the index of the only statement containing a quoted fragment, or None if it is ambiguous
+    """
+    for fragment in _QUOTED_FRAGMENT.findall(error_msg):
+        candidates = [i for i, statement in enumerate(statements) if fragment in statement]
+        if len(candidates) == 1:
+            return candidates[0]
+    return None
+
+
+class Pipeline(object):
+    """
+    buffer the statements and send them in one request separated by ;
+    graphd runs them in order and stops at the first failing one, and only the last result is returned
+    """
+
+    def __init__(self, *, space: str | None = None, max_statements: int = MAX_STATEMENTS):
+        self.space = space
+        self.max_statements = max_statements
+        self.statements: list[str] = []
+
+    def __len__(self):
+        return len(self.statements)
+
+    def add(self, ngql: str):
+        ngql = ngql.strip()
+        self.statements.append(ngql if ngql.endswith(';') else f'{ngql};')
+        if len(self.statements) >= self.max_statements:
+            self.execute()
+
+    def execute(self) -> ResultSet | None:
+        statements, self.statements = self.statements, []
+        if not statements:
+            return None
+        try:
+            return run_ngql(' '.join(statements), space=self.space)
+        except QueryTimeoutError:
+            # no statement failed, graphd might still be running them
+            raise
+        except NGqlError as e:
+            raise PipelineError(e.msg, e.code, statements, find_failed_statement(e.msg, statements)) from e
+
+
+@contextmanager
+def pipeline(*, space: str | None = None, max_statements: int = MAX_STATEMENTS):
+    """
+    with pipeline() as p:
+        p.add(update_vertex_ngql('figure', 119, {'age': 40}))
+        p.add(update_vertex_ngql('source', 119, {'name': '"movie"'}))
+    # both statements are sent in one round trip when leaving the block
+    """
+    p = Pipeline(space=space, max_statements=max_statements)
+    yield p
+    p.execute()
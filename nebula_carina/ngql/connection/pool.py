@@ -0,0 +1,341 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable
+
+from nebula3.gclient.net import Session
+
+from nebula_carina.ngql.connection.balancer import LoadBalancer
+from nebula_carina.ngql.errors import SessionPoolTimeoutError
+
+
+def release_quietly(session: Session):
+    try:
+        session.release()
+    except Exception:  # the session might already be broken, there is nothing more to do with it
+        pass
+
+
+def is_alive(session: Session) -> bool:
+    """
+    run a statement by the session, which also keeps it from expiring in graphd
+    Session.ping() only checks the connection, a session which has already expired still passes it
+    """
+    try:
+        return session.execute('YIELD 1;').is_succeeded()
+    except Exception:
+        return False
+
+
+def _transport(session: Session):
+    """
+    the socket of the session and the timeout of the config in milliseconds, found in the internals of nebula python,
+    None when they are not where nebula python 3.x keeps them
+    """
+    try:
+        connection = session._connection
+        socket = connection._connection._iprot.trans.getTransport()
+        default_timeout = connection._timeout
+    except AttributeError:
+        return None
+    if not all(callable(getattr(socket, name, None)) for name in ('setTimeout', 'isOpen')):
+        return None
+    return socket, default_timeout
+
+
+@contextmanager
+def read_timeout(session: Session, timeout: float | None):
+    """
+    bound the wait for the response of the session by the socket timeout, restoring the timeout of the config after
+    a timed out connection is reopened by nebula python, so there is nothing to restore then
+    only the read of the socket is bounded, not the waits for the limiter and for a pooled session before it,
+    which have their own settings, so a query can take longer than the timeout in total
+    the query is not bounded when a version of nebula python keeps the socket elsewhere
+    """
+    if timeout is None or (transport := _transport(session)) is None:
+        yield
+        return
+    socket, default_timeout = transport
+    socket.setTimeout(timeout * 1000)
+    try:
+        yield
+    finally:
+        if socket.isOpen():
+            socket.setTimeout(default_timeout if default_timeout > 0 else None)
+
+
+def detach(session: Session):
+    # forget the connection without signing out, as the connection actually belongs to another process
+    session._connection = None
+
+
+class PooledSession(object):
+    """
+    a nebula session owned by the pool, remembering the space it has been switched to and the server it is on
+    """
+    __slots__ = ('session', 'space', 'server', 'last_used_at')
+
+    def __init__(self, session: Session, server: str | None = None):
+        self.session = session
+        self.space = None
+        self.server = server
+        self.last_used_at = time.monotonic()
+
+
+class SessionPool(object):
+    """
+    a bounded, thread-safe pool of nebula sessions, whose idle sessions are kept by the space they are using
+    sessions are checked out per call, and a thread which already holds a session reuses it
+    with a balancer, the sessions are created by session_factory(server) on the servers it chooses
+    """
+
+    def __init__(
+            self, session_factory: Callable[..., Session], size: int, wait_timeout: float | None = None,
+            space_setter: Callable[[PooledSession, str], None] | None = None, balancer: LoadBalancer | None = None
+    ):
+        assert size > 0, 'session pool size should be positive'
+        self._session_factory = session_factory
+        self._space_setter = space_setter
+        self._balancer = balancer
+        self._size = size
+        self._wait_timeout = wait_timeout
+        self._condition = threading.Condition()
+        self._idle: dict[str | None, deque[PooledSession]] = {}
+        self._idle_count = 0
+        self._created = 0
+        self._sessions: set[PooledSession] = set()
+        self._local = threading.local()
+        self._checkouts = 0
+        self._waited = 0  # the checkouts which had to wait for a session
+        self._wait_seconds = 0.
+        self._renewed = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def created_count(self) -> int:
+        return self._created
+
+    @property
+    def idle_count(self) -> int:
+        return self._idle_count
+
+    @property
+    def balancer(self) -> LoadBalancer | None:
+        return self._balancer
+
+    def stats(self) -> dict[str, any]:
+        with self._condition:
+            return {
+                'size': self._size, 'created': self._created, 'idle': self._idle_count,
+                'checkouts': self._checkouts, 'waited': self._waited, 'wait_seconds': self._wait_seconds,
+                'renewed': self._renewed,
+            }
+
+    def _create(self, server: str | None) -> PooledSession:
+        if self._balancer is None:
+            return PooledSession(self._session_factory())
+        try:
+            return PooledSession(self._session_factory(server), server)
+        except Exception:
+            self._balancer.fail(server, started=False)
+            raise
+
+    @staticmethod
+    def _take_from(sessions: deque[PooledSession], server: str) -> PooledSession | None:
+        for i in range(len(sessions) - 1, -1, -1):
+            if sessions[i].server == server:
+                pooled = sessions[i]
+                del sessions[i]
+                return pooled
+        return None
+
+    def _take_idle_on(self, space: str | None, server: str) -> PooledSession | None:
+        if (sessions := self._idle.get(space)) and (pooled := self._take_from(sessions, server)):
+            return pooled
+        others = [
+            d for d in self._idle.values()
+            if d is not sessions and any(pooled.server == server for pooled in d)
+        ]
+        if others:
+            return self._take_from(min(others, key=lambda d: d[0].last_used_at), server)
+        return None
+
+    def _take_idle(self, space: str | None, server: str | None = None) -> PooledSession | None:
+        if not self._idle_count:
+            return None
+        if server is not None:
+            if pooled := self._take_idle_on(space, server):
+                self._idle_count -= 1
+                return pooled
+            if self._created < self._size:
+                return None  # open a session on the chosen server rather than using another one
+        self._idle_count -= 1
+        if sessions := self._idle.get(space):
+            return sessions.pop()  # LIFO, so that the hot sessions are reused
+        # no idle session is using the space yet, take the least recently used one of another space
+        return min((d for d in self._idle.values() if d), key=lambda d: d[0].last_used_at).popleft()
+
+    def acquire(self, space: str | None = None, timeout: float | None = None) -> PooledSession:
+        timeout = self._wait_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        with self._condition:
+            if not self._idle_count and self._created >= self._size:
+                self._waited += 1
+                try:
+                    while not self._idle_count and self._created >= self._size:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            raise SessionPoolTimeoutError(self._size, timeout)
+                        self._condition.wait(remaining)
+                finally:
+                    self._wait_seconds += time.monotonic() - start
+            self._checkouts += 1
+            server = self._balancer.choose() if self._balancer is not None else None
+            if pooled := self._take_idle(space, server):
+                return pooled
+            self._created += 1
+        try:
+            pooled = self._create(server)
+        except BaseException:
+            with self._condition:
+                self._created -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._sessions.add(pooled)
+        return pooled
+
+    def release(self, pooled: PooledSession, *, discard: bool = False):
+        """
+        :param discard: close the session instead of keeping it, always the case when it could not be renewed
+        """
+        discard = discard or pooled.session is None
+        with self._condition:
+            if discard:
+                self._created -= 1
+                self._sessions.discard(pooled)
+            else:
+                pooled.last_used_at = time.monotonic()
+                self._idle.setdefault(pooled.space, deque()).append(pooled)
+                self._idle_count += 1
+            self._condition.notify()
+        if discard:
+            release_quietly(pooled.session)
+
+    def renew(self, pooled: PooledSession):
+        """
+        replace the broken nebula session of a checked out pooled session with a brand new one
+        """
+        release_quietly(pooled.session)
+        # left without a session when the servers are unreachable, so that it is discarded when released
+        pooled.session, pooled.space = None, None
+        with self._condition:
+            self._renewed += 1
+        if self._balancer is None:
+            pooled.session = self._session_factory()
+            return
+        pooled.server = self._balancer.choose()
+        pooled.session = self._create(pooled.server).session
+
+    def keepalive(self, idle_for: float, probe: Callable[[Session], bool] = is_alive) -> tuple[int, int]:
+        """
+        ping the sessions which have been idle for idle_for seconds, and replace the dead ones by new sessions
+        the replacements are switched to the spaces of the dead ones, so that no request has to recover them later
+        :return: the numbers of the pinged sessions and of the replaced ones
+        """
+        stale = []
+        with self._condition:
+            # the idle sessions are appended when released, so the stale ones are on the left
+            expired_before = time.monotonic() - idle_for
+            for sessions in self._idle.values():
+                while sessions and sessions[0].last_used_at <= expired_before:
+                    stale.append(sessions.popleft())
+            self._idle_count -= len(stale)
+        replaced = 0
+        for pooled in stale:
+            if probe(pooled.session):
+                self.release(pooled)
+                continue
+            replaced += 1
+            space = pooled.space
+            try:
+                self.renew(pooled)
+            except Exception:  # the servers are unreachable, a session is created by the next checkout instead
+                self.release(pooled, discard=True)
+                continue
+            if space is not None and self._space_setter is not None:
+                try:
+                    self._space_setter(pooled, space)
+                except Exception:  # the space is settled by the next query using the session
+                    pass
+            self.release(pooled)
+        return len(stale), replaced
+
+    @contextmanager
+    def session(self, space: str | None = None, timeout: float | None = None):
+        held = getattr(self._local, 'pooled', None)
+        if held is not None:
+            yield held
+            return
+        pooled = self.acquire(space, timeout)
+        self._local.pooled = pooled
+        try:
+            yield pooled
+        finally:
+            self._local.pooled = None
+            self.release(pooled)
+
+    def close(self):
+        with self._condition:
+            idle = [pooled for sessions in self._idle.values() for pooled in sessions]
+            self._idle, self._idle_count = {}, 0
+            self._created -= len(idle)
+            self._sessions.difference_update(idle)
+        for pooled in idle:
+            release_quietly(pooled.session)
+
+    def abandon(self):
+        """
+        drop every session without touching the sockets, used in a forked child whose sessions belong to the parent
+        """
+        for pooled in self._sessions:
+            if pooled.session is not None:
+                detach(pooled.session)
+        self._sessions = set()
+        self._idle, self._idle_count = {}, 0
+        self._created = 0
+
+
+class HealthChecker(object):
+    """
+    a daemon thread keeping the idle sessions of a pool alive, so that the requests rarely meet a dead session
+    """
+
+    def __init__(self, pool: SessionPool, interval: float):
+        assert interval > 0, 'health check interval should be positive'
+        self._pool = pool
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='nebula-carina-health-checker', daemon=True)
+
+    @property
+    def interval(self) -> float:
+        return self._interval
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                self._pool.keepalive(self._interval)
+            except Exception:  # never let the checker die, the next round tries again
+                pass
@@ -0,0 +1,130 @@
+import random
+import re
+import threading
+import time
+from collections import Counter
+from enum import Enum
+
+from nebula3.common.ttypes import ErrorCode
+
+
+class StatementKind(str, Enum):
+    READ = 'read'
+    IDEMPOTENT_WRITE = 'idempotent_write'
+    NON_IDEMPOTENT_WRITE = 'non_idempotent_write'
+
+
+class RetryReason(str, Enum):
+    SESSION = 'session'  # the session is gone, so the statement was never executed
+    CONNECTION = 'connection'  # the connection broke, the statement might have been executed
+    TRANSIENT = 'transient'  # graphd or storaged had a hiccup, the statement might have been partially executed
+
+
+# the errors of the session itself, graphd refuses to execute anything by it
+SESSION_ERROR_CODES = frozenset({ErrorCode.E_SESSION_INVALID, ErrorCode.E_SESSION_TIMEOUT})
+TRANSIENT_ERROR_CODES = frozenset({
+    ErrorCode.E_DISCONNECTED, ErrorCode.E_FAIL_TO_CONNECT, ErrorCode.E_RPC_FAILURE, ErrorCode.E_LEADER_CHANGED,
+    ErrorCode.E_TOO_MANY_CONNECTIONS,
+})
+
+_string_pattern = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'')
+_read_pattern = re.compile(
+    r'(?:\$\w+\s*=\s*)?(?:MATCH|OPTIONAL\s+MATCH|FETCH|GO|LOOKUP|FIND|GET\s+SUBGRAPH|YIELD|SHOW|DESCRIBE|DESC|USE|'
+    r'EXPLAIN|PROFILE|UNWIND|WITH|RETURN)\b', re.IGNORECASE
+)
+# the clauses after a pipe which only shape the results of the statement they continue
+_pipe_clause_pattern = re.compile(r'(?:LIMIT|OFFSET|ORDER\s+BY|GROUP\s+BY|SAMPLE)\b', re.IGNORECASE)
+_idempotent_write_pattern = re.compile(
+    r'(?:INSERT|DELETE|CREATE\s+\w+(?:\s+\w+)?\s+IF\s+NOT\s+EXISTS|DROP\s+\w+(?:\s+\w+)?\s+IF\s+EXISTS)\b',
+    re.IGNORECASE
+)
+_update_pattern = re.compile(r'(?:UPDATE|UPSERT)\b.*?\bSET\b(.*?)(?:\bWHEN\b|\bYIELD\b|$)', re.IGNORECASE | re.DOTALL)
+# an identifier which is neither a function call, a parameter nor a literal, e.g. the times of "times = times + 1"
+_reference_pattern = re.compile(r'(?<![\w$.])(?!(?:true|false|null)\b)[A-Za-z_]\w*\b(?!\s*\()', re.IGNORECASE)
+
+
+def _classify_statement(statement: str) -> StatementKind:
+    if _read_pattern.match(statement):
+        return StatementKind.READ
+    if _idempotent_write_pattern.match(statement):
+        return StatementKind.IDEMPOTENT_WRITE
+    if update := _update_pattern.match(statement):
+        # setting constants again gives the same result, setting values computed from the current ones does not
+        values = ' '.join(assignment.split('=', 1)[-1] for assignment in update.group(1).split(','))
+        if '$^' not in values and '$$' not in values and not _reference_pattern.search(values):
+            return StatementKind.IDEMPOTENT_WRITE
+    return StatementKind.NON_IDEMPOTENT_WRITE
+
+
+def classify(ngql: str) -> StatementKind:
+    """
+    the kind of the ngql, the least safe one of its statements when several are sent together
+    anything not recognized is a non-idempotent write, so it is never retried by mistake
+    """
+    ngql = _string_pattern.sub('""', ngql)
+    kinds = {
+        _classify_statement(s.strip()) for s in re.split(r'[;|]', ngql)
+        if s.strip() and not _pipe_clause_pattern.match(s.strip())
+    }
+    for kind in (StatementKind.NON_IDEMPOTENT_WRITE, StatementKind.IDEMPOTENT_WRITE):
+        if kind in kinds:
+            return kind
+    return StatementKind.READ
+
+
+class RetryPolicy(object):
+    """
+    decide whether a failed ngql is run again, and how long to wait before it
+    a statement which was never executed is always retried, the others only when running them twice is harmless
+    the waits grow exponentially with full jitter, so the clients do not retry in lockstep
+    """
+
+    def __init__(
+            self, max_attempts: int = 3, base_delay: float = 0.05, max_delay: float = 1.,
+            rng: random.Random | None = None
+    ):
+        assert max_attempts > 0, 'max attempts should be positive'
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_safe(kind: StatementKind, reason: RetryReason) -> bool:
+        return reason == RetryReason.SESSION or kind != StatementKind.NON_IDEMPOTENT_WRITE
+
+    def should_retry(self, kind: StatementKind, reason: RetryReason, attempt: int) -> bool:
+        """
+        :param attempt: the number of the attempts already made
+        """
+        if not self.is_safe(kind, reason):
+            outcome = 'unsafe'
+        elif attempt >= self.max_attempts:
+            outcome = 'exhausted'
+        else:
+            outcome = 'retried'
+        with self._lock:
+            self._counters[(outcome, kind.value, reason.value)] += 1
+        return outcome == 'retried'
+
+    def delay(self, reason: RetryReason, attempt: int) -> float:
+        if reason == RetryReason.SESSION:
+            return 0.  # a new session is already there
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def backoff(self, reason: RetryReason, attempt: int):
+        if delay := self.delay(reason, attempt):
+            time.sleep(delay)
+
+    def counters(self) -> dict[str, int]:
+        """
+        the numbers of the failures by outcome, kind and reason, keyed like "retried.read.connection"
+        """
+        with self._lock:
+            return {'.'.join(key): count for key, count in sorted(self._counters.items())}
+
+    def reset_counters(self):
+        with self._lock:
+            self._counters.clear()
@@ -0,0 +1,80 @@
+import threading
+from typing import Callable, Hashable
+
+
+def freeze(value: any) -> Hashable:
+    """
+    a hashable equivalent of the parameters of a query, to tell the identical queries
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, set):
+        return frozenset(freeze(item) for item in value)
+    return value
+
+
+class WaitTimeout(TimeoutError):
+    """
+    the shared call has not returned within the timeout of a caller waiting for it
+    """
+
+
+class _Call(object):
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    the identical calls made while one of them is in flight wait for it and share its result, or its exception
+    nothing is cached, a call made after the shared one has returned runs again
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._leaders = 0
+        self._followers = 0
+
+    def do(self, key: Hashable, func: Callable[[], any], timeout: float | None = None) -> any:
+        """
+        :param timeout: the seconds to wait for the shared call when it is already in flight, forever when None,
+            the call made is not bounded by it
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._leaders += 1
+            else:
+                self._followers += 1
+        if not leader:
+            if not call.done.wait(timeout):
+                raise WaitTimeout(timeout)
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict[str, int]:
+        """
+        the calls which went to the network and the ones which shared their results
+        """
+        with self._lock:
+            return {'leaders': self._leaders, 'followers': self._followers, 'in_flight': len(self._calls)}
@@ -0,0 +1,159 @@
+import json
+import logging
+import re
+import threading
+from collections import deque, OrderedDict
+
+from nebula3.data.ResultSet import ResultSet
+
+from nebula_carina.hooks import Hook
+
+logger = logging.getLogger('nebula_carina.slow_query')
+
+_string_pattern = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'')
+_number_pattern = re.compile(r'(?<![\w$.])\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b')
+_list_pattern = re.compile(r'\?(?:\s*,\s*\?)+')
+# the values of the vertices and the edges of an insert, e.g. ?:(?, ?) or ?->?@?:(?, ?)
+_repeated_values_pattern = re.compile(r'(\?(?:\s*->\s*\?)?(?:@\?)?\s*:\s*\([^()]*\))(?:\s*,\s*\1)+')
+_space_pattern = re.compile(r'\s+')
+
+
+def fingerprint(ngql: str) -> str:
+    """
+    the shape of the ngql, with its literals replaced by ? and its lists of literals collapsed
+    MATCH (v) WHERE id(v) IN ["a", "b"] RETURN v LIMIT 10 becomes MATCH (v) WHERE id(v) IN [?, ...] RETURN v LIMIT ?
+    """
+    ngql = _string_pattern.sub('?', ngql)
+    ngql = _number_pattern.sub('?', ngql)
+    ngql = _list_pattern.sub('?, ...', ngql)
+    ngql = _repeated_values_pattern.sub(r'\1, ...', ngql)
+    return _space_pattern.sub(' ', ngql).strip()
+
+
+def server_latency(result: ResultSet | dict | None) -> float | None:
+    """
+    the seconds graphd spent on the ngql, as told by the response
+    """
+    if isinstance(result, ResultSet):
+        return result.latency() / 1e6
+    if isinstance(result, dict) and (results := result.get('results')):
+        latency = results[0].get('latencyInUs')
+        return None if latency is None else latency / 1e6
+    return None
+
+
+def _percentile(values: list[float], percent: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class FingerprintStats(object):
+    """
+    the latencies of the queries of a fingerprint, the percentiles being computed over the latest samples
+    """
+    __slots__ = ('count', 'errors', 'slow', 'total_seconds', 'max_seconds', 'latencies', 'server_latencies', 'example')
+
+    def __init__(self, samples: int, example: str):
+        self.count = self.errors = self.slow = 0
+        self.total_seconds = self.max_seconds = 0.
+        self.latencies = deque(maxlen=samples)
+        self.server_latencies = deque(maxlen=samples)
+        self.example = example
+
+    def dict(self) -> dict[str, any]:
+        latencies, server_latencies = list(self.latencies), list(self.server_latencies)
+        return {
+            'count': self.count, 'errors': self.errors, 'slow': self.slow,
+            'total_seconds': self.total_seconds, 'max_seconds': self.max_seconds,
+            'p50_seconds': _percentile(latencies, 50), 'p99_seconds': _percentile(latencies, 99),
+            'server_p50_seconds': _percentile(server_latencies, 50),
+            'server_p99_seconds': _percentile(server_latencies, 99),
+            'example': self.example,
+        }
+
+
+class SlowQueryLog(Hook):
+    """
+    aggregate the latencies of the queries by fingerprint, and log the queries slower than threshold seconds
+    at most max_fingerprints fingerprints are kept, the least recently seen one is dropped for a new one
+    """
+    FINGERPRINT_CACHE_SIZE = 1024
+
+    def __init__(self, threshold: float | None = None, *, max_fingerprints: int = 1000, samples: int = 1000):
+        self.threshold = threshold
+        self._max_fingerprints = max_fingerprints
+        self._samples = samples
+        self._stats: OrderedDict[str, FingerprintStats] = OrderedDict()
+        # the parameterized ngqls repeat a lot, so their fingerprints are remembered
+        self._fingerprints: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fingerprint(self, ngql: str) -> str:
+        with self._lock:
+            if (value := self._fingerprints.get(ngql)) is not None:
+                self._fingerprints.move_to_end(ngql)
+                return value
+        value = fingerprint(ngql)
+        with self._lock:
+            self._fingerprints[ngql] = value
+            if len(self._fingerprints) > self.FINGERPRINT_CACHE_SIZE:
+                self._fingerprints.popitem(last=False)
+        return value
+
+    def record(
+            self, ngql: str, elapsed: float, *, server_elapsed: float | None = None, error: bool = False,
+            space: str | None = None
+    ):
+        key = self.fingerprint(ngql)
+        slow = self.threshold is not None and elapsed >= self.threshold
+        with self._lock:
+            if (stats := self._stats.get(key)) is None:
+                stats = self._stats[key] = FingerprintStats(self._samples, ngql)
+                if len(self._stats) > self._max_fingerprints:
+                    self._stats.popitem(last=False)
+            else:
+                self._stats.move_to_end(key)
+            stats.count += 1
+            stats.errors += error
+            stats.slow += slow
+            stats.total_seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+            stats.latencies.append(elapsed)
+            if server_elapsed is not None:
+                stats.server_latencies.append(server_elapsed)
+        if slow:
+            logger.warning(
+                'slow query (%.3fs, server %s) on space %s: %s', elapsed,
+                'n/a' if server_elapsed is None else f'{server_elapsed:.3f}s', space, ngql,
+                extra={
+                    'fingerprint': key, 'elapsed': elapsed, 'server_elapsed': server_elapsed, 'space': space,
+                    'ngql': ngql, 'error': error,
+                }
+            )
+
+    def after_execute(self, ngql: str, result, elapsed: float, error: Exception | None, context: dict[str, any]):
+        self.record(
+            ngql, elapsed, server_elapsed=server_latency(result), error=error is not None, space=context.get('space')
+        )
+
+    def dump(self) -> list[dict[str, any]]:
+        """
+        the stats of every fingerprint, the ones taking the most time in total first
+        """
+        with self._lock:
+            items = [{'fingerprint': key, **stats.dict()} for key, stats in self._stats.items()]
+        return sorted(items, key=lambda item: item['total_seconds'], reverse=True)
+
+    def write(self, path: str):
+        """
+        write the dump as json lines for offline analysis
+        """
+        with open(path, 'w') as f:
+            for item in self.dump():
+                f.write(json.dumps(item) + '\n')
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
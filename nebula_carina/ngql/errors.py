@@ -16,3 +16,45 @@ class DefaultSpaceNotExistError(Exception):
 
     def __str__(self):
         return f'Default Space {self.space_name} does not exist.'
+
+
+class SessionPoolTimeoutError(Exception):
+    def __init__(self, pool_size, timeout):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        super().__init__()
+
+    def __str__(self):
+        return f'Cannot check out a session from the pool of size {self.pool_size} within {self.timeout} seconds.'
+
+
+class QueryRejectedError(Exception):
+    def __init__(self, space, statement_class, reason):
+        self.space = space
+        self.statement_class = statement_class
+        self.reason = reason
+        super().__init__()
+
+    def __str__(self):
+        return f'Rejected a {self.statement_class} query on space {self.space}: {self.reason}.'
+
+
+class QueryTimeoutError(NGqlError):
+    def __init__(self, timeout, ngql):
+        self.timeout = timeout
+        super().__init__(f'No response within {timeout} seconds', None, ngql)
+
+    def __str__(self):
+        return f'Timed out after {self.timeout} seconds when executing NGQL [{self.ngql}]'
+
+
+class PipelineError(NGqlError):
+    def __init__(self, msg, code, statements: list[str], index: int | None):
+        self.statements = statements
+        self.index = index
+        super().__init__(msg, code, statements[index] if index is not None else ' '.join(statements))
+
+    def __str__(self):
+        position = f'statement {self.index + 1}' if self.index is not None else 'an unknown statement'
+        return f'ERROR CODE: {self.code} at {position} of {len(self.statements)} when executing NGQL [{self.ngql}]\n' \
+               f'{self.msg}'
@@ -4,16 +4,26 @@ from nebula_carina.ngql.schema.data_types import auto_convert_value_to_db_str
 
 
 class Condition(object):
-    pass
+    def compile(self, params: dict[str, any], aliases: dict[str, str] | None = None) -> str:
+        """
+        return the condition with $placeholders instead of the inlined values, which are put into params
+        :param aliases: the expressions of the names, e.g. {'v2': '$$'} for a GO statement
+        """
+        return str(self)
 
 
 class RawCondition(Condition):
-    def __init__(self, raw_str):
+    def __init__(self, raw_str, params: dict[str, any] | None = None):
         self.raw_str = raw_str
+        self.params = params or {}
 
     def __str__(self):
         return self.raw_str
 
+    def compile(self, params: dict[str, any], aliases: dict[str, str] | None = None) -> str:
+        params.update(self.params)
+        return self.raw_str
+
 
 class ConditionOperator(Enum):
     AND = 'AND'
@@ -43,9 +53,11 @@ class NodeConditionLeaf(Condition):
             self.patterns = patterns
         self.value = value
 
-    def make_pattern(self):
+    def make_pattern(self, aliases: dict[str, str] | None = None):
         pattern = ''
-        for p in self.patterns:
+        if aliases and self.patterns[0] in aliases:
+            pattern = aliases[self.patterns[0]]
+        for p in self.patterns[1:] if pattern else self.patterns:
             if p == 'id':
                 pattern = f'id({pattern})'
             else:
@@ -55,6 +67,14 @@ class NodeConditionLeaf(Condition):
     def __str__(self):
         return f"{self.make_pattern()} {self.OPERATORS[self.__op]} {auto_convert_value_to_db_str(self.value)}"
 
+    def compile(self, params: dict[str, any], aliases: dict[str, str] | None = None) -> str:
+        index = len(params)
+        while f'q{index}' in params:  # never overwrite the parameters of the caller
+            index += 1
+        name = f'q{index}'
+        params[name] = self.value
+        return f"{self.make_pattern(aliases)} {self.OPERATORS[self.__op]} ${name}"
+
 
 class NodeCondition(Condition):
 
@@ -74,6 +94,12 @@ class NodeCondition(Condition):
             return f'NOT ({self.__leaves[0].__str__()})'
         return f' {self.__op.value} '.join(f'({leaf.__str__()})' for leaf in self.__leaves)
 
+    def compile(self, params: dict[str, any], aliases: dict[str, str] | None = None) -> str:
+        if self.__op == ConditionOperator.NOT:
+            assert len(self.__leaves) == 1
+            return f'NOT ({self.__leaves[0].compile(params, aliases)})'
+        return f' {self.__op.value} '.join(f'({leaf.compile(params, aliases)})' for leaf in self.__leaves)
+
     def __and__(self, other):
         assert isinstance(other, NodeCondition)
         return self.__init_by_leaves(ConditionOperator.AND, [self, other])
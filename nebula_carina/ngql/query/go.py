@@ -0,0 +1,80 @@
+from nebula3.data.ResultSet import ResultSet
+
+from nebula_carina import tracing
+from nebula_carina.ngql.connection.connection import run_ngql, run_ngql_json
+from nebula_carina.ngql.query.conditions import Condition
+from nebula_carina.ngql.statements.clauses import Limit
+from nebula_carina.utils.utils import vid2str
+
+# the vertex a step starts from, the edge walked and the vertex it reaches
+SOURCE = '$^'
+EDGE = 'edge'
+DESTINATION = '$$'
+
+DIRECTIONS = {'out': '', 'in': ' REVERSELY', 'both': ' BIDIRECT'}
+
+
+def go_ngql(
+        from_vids: list[str | int], over: list[str], output: str, condition: str | None = None,
+        *, steps: int | tuple[int, int] = 1, direction: str = 'out', limit: Limit | None = None
+) -> str:
+    """
+    GO 1 TO 2 STEPS FROM "char_test1" OVER love REVERSELY WHERE ... YIELD edge AS e, $$ AS v2 | LIMIT 10;
+    :param over: the edge type names, all of them when empty
+    :param steps: the number of steps, or the range of them e.g. (1, 3)
+    :param direction: out, in (REVERSELY) or both (BIDIRECT)
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f'direction should be one of {", ".join(DIRECTIONS)}')
+    if isinstance(steps, tuple):
+        steps_str = f'{steps[0]} TO {steps[1]} STEPS '
+    else:
+        steps_str = '' if steps == 1 else f'{steps} STEPS '
+    limit_str = ''
+    if limit:
+        limit_str = f' | LIMIT {limit.skip}, {limit.limit}' if limit.skip else f' | LIMIT {limit.limit}'
+    return f'GO {steps_str}FROM {", ".join(vid2str(vid) for vid in from_vids)} ' \
+           f'OVER {", ".join(over) or "*"}{DIRECTIONS[direction]}' \
+           f'{f" WHERE {condition}" if condition else ""} YIELD {output}{limit_str};'
+
+
+def compile_go(
+        from_vids: list[str | int], over: list[str], output: str, condition: Condition | None = None,
+        *, steps: int | tuple[int, int] = 1, direction: str = 'out', limit: Limit | None = None,
+        params: dict[str, any] | None = None, tags: dict[str, list[str]] | None = None,
+        aliases: dict[str, str] | None = None
+) -> tuple[str, dict[str, any] | None]:
+    """
+    the values of the condition are sent as parameters, the vids are inlined like in FETCH
+    :param tags: the tags the vertices must have, e.g. {DESTINATION: ['figure', 'source']}
+    :param aliases: the expressions of the names in the condition, e.g. {'v2': DESTINATION} for Q(v2__figure__age=1)
+    :return: the ngql and all of its parameters
+    """
+    with tracing.span('nebula_carina.build', over=over):
+        conditions = [
+            f'"{tag}" IN tags({vertex})' for vertex, tag_names in (tags or {}).items() for tag in tag_names
+        ]
+        if condition is not None:
+            params = dict(params) if params else {}
+            condition_str = condition.compile(params, aliases)
+            conditions.append(f'({condition_str})' if conditions else condition_str)
+        condition_str = ' AND '.join(conditions) or None
+        return go_ngql(
+            from_vids, over, output, condition_str, steps=steps, direction=direction, limit=limit
+        ), params
+
+
+def go(
+        from_vids: list[str | int], over: list[str], output: str, condition: Condition | None = None,
+        *, steps: int | tuple[int, int] = 1, direction: str = 'out', limit: Limit | None = None,
+        space: str | None = None, params: dict[str, any] | None = None, tags: dict[str, list[str]] | None = None,
+        aliases: dict[str, str] | None = None, as_json: bool = False, timeout: float | None = None,
+        coalesce: bool | None = None
+) -> ResultSet | dict:
+    ngql, params = compile_go(
+        from_vids, over, output, condition,
+        steps=steps, direction=direction, limit=limit, params=params, tags=tags, aliases=aliases
+    )
+    if as_json:
+        return run_ngql_json(ngql, space=space, params=params, timeout=timeout, coalesce=coalesce)
+    return run_ngql(ngql, space=space, params=params, timeout=timeout, coalesce=coalesce)
@@ -1,15 +1,43 @@
 from nebula3.data.ResultSet import ResultSet
 
-from nebula_carina.ngql.connection.connection import run_ngql
+from nebula_carina import tracing
+from nebula_carina.ngql.connection.connection import run_ngql, run_ngql_json
 from nebula_carina.ngql.query.conditions import Condition
 from nebula_carina.ngql.statements.clauses import OrderBy, Limit
 
 
-def match(
-        pattern: str, output: str, condition: Condition | None = None,
+def match_ngql(
+        pattern: str, output: str, condition: str | None = None,
         order_by: OrderBy | None = None, limit: Limit | None = None
-) -> ResultSet:
-    ngql = f'MATCH {pattern}{f" WHERE {condition}" if condition else ""} ' \
+) -> str:
+    return f'MATCH {pattern}{f" WHERE {condition}" if condition else ""} ' \
            f'RETURN {output}{" " + str(order_by) if order_by else ""}' \
            f'{" " + str(limit) if limit else ""};'
-    return run_ngql(ngql)
+
+
+def compile_match(
+        pattern: str, output: str, condition: Condition | None = None,
+        order_by: OrderBy | None = None, limit: Limit | None = None, params: dict[str, any] | None = None
+) -> tuple[str, dict[str, any] | None]:
+    """
+    the values of the condition are sent as parameters instead of being inlined into the ngql
+    :return: the ngql and all of its parameters
+    """
+    with tracing.span('nebula_carina.build', pattern=pattern):
+        condition_str = None
+        if condition is not None:
+            params = dict(params) if params else {}
+            condition_str = condition.compile(params)
+        return match_ngql(pattern, output, condition_str, order_by, limit), params
+
+
+def match(
+        pattern: str, output: str, condition: Condition | None = None,
+        order_by: OrderBy | None = None, limit: Limit | None = None, *,
+        space: str | None = None, params: dict[str, any] | None = None, as_json: bool = False,
+        timeout: float | None = None, coalesce: bool | None = None
+) -> ResultSet | dict:
+    ngql, params = compile_match(pattern, output, condition, order_by, limit, params)
+    if as_json:
+        return run_ngql_json(ngql, space=space, params=params, timeout=timeout, coalesce=coalesce)
+    return run_ngql(ngql, space=space, params=params, timeout=timeout, coalesce=coalesce)
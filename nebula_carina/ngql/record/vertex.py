@@ -58,3 +58,11 @@ def delete_vertex_ngql(vid_list: list[int | str], with_edge: bool = True):
 
 def delete_tag_ngql(tag_names: list[str], vid: str | int):
     return f'DELETE TAG {",".join(tag_names)} FROM {vid2str(vid)};'
+
+
+def fetch_vertex_ngql(tag_names: list[str], vid_list: list[int | str], output: str = 'vertex AS v'):
+    """
+    the point read of the vertices by their ids, the vertices with any of the tags are returned
+    """
+    return f'FETCH PROP ON {", ".join(tag_names) or "*"} {", ".join(vid2str(vid) for vid in vid_list)} ' \
+           f'YIELD {output};'
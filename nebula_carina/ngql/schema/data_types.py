@@ -1,5 +1,6 @@
+import re
 from abc import ABC
-from datetime import datetime, date, time
+from datetime import datetime, date, time, timezone
 
 import pytz
 
@@ -7,6 +8,9 @@ from nebula_carina.utils.utils import pascal_case_to_snake_case, read_str
 from nebula3.common import ttypes
 from nebula_carina.settings import database_settings
 
+# the json results are like 12:00:00.000012000Z
+_json_time_pattern = re.compile(r'(\d{2}):(\d{2}):(\d{2})(?:\.(\d+))?Z?')
+
 data_type_factory = {}
 ttype2data_type = {}
 python_type2data_type = {}
@@ -40,6 +44,10 @@ class DataType(metaclass=DataTypeMetaClass):
     def ttype2python_type(cls, value):
         return read_str(value)
 
+    @classmethod
+    def json2python_type(cls, value):
+        return value
+
     @classmethod
     def value2db_str(cls, value):
         raise NotImplementedError
@@ -146,6 +154,10 @@ class Date(DataType):
             return date(value.year, value.month, value.day)
         raise ValueError('Date value should be None or date')
 
+    @classmethod
+    def json2python_type(cls, value: str | None):
+        return None if value is None else date.fromisoformat(value)
+
     @classmethod
     def value2db_str(cls, value: None | str | date):
         if value is None:
@@ -181,6 +193,16 @@ class Time(DataType):
             )
         raise ValueError('Time value should be None or Time')
 
+    @classmethod
+    def json2python_type(cls, value: str | None):
+        if value is None:
+            return
+        hour, minute, sec, fraction = _json_time_pattern.fullmatch(value).groups()
+        return time(
+            int(hour), int(minute), int(sec), int((fraction or '0')[:6].ljust(6, '0')),
+            tzinfo=pytz.timezone(database_settings.timezone_name)
+        )
+
     @classmethod
     def value2db_str(cls, value: None | str | time):
         if value is None:
@@ -216,6 +238,19 @@ class Datetime(DataType):
             )
         raise ValueError('DateTime ngql value should be None or DateTime')
 
+    @classmethod
+    def json2python_type(cls, value: str | None):
+        if value is None:
+            return
+        day, time_str = value.split('T', 1)
+        year, month, day = day.split('-')
+        hour, minute, sec, fraction = _json_time_pattern.fullmatch(time_str).groups()
+        return datetime(
+            int(year), int(month), int(day), int(hour), int(minute), int(sec),
+            int((fraction or '0')[:6].ljust(6, '0')),
+            tzinfo=pytz.timezone(database_settings.timezone_name)
+        )
+
     @classmethod
     def value2db_str(cls, value: None | str | datetime):
         if value is None:
@@ -249,3 +284,39 @@ def auto_convert_value_to_db_str(val: any):
     if isinstance(val, list):
         return f'[{", ".join([auto_convert_value_to_db_str(i) for i in val])}]'
     return (python_type2data_type[type(val)] if type(val) in python_type2data_type else DataType).value2db_str(val)
+
+
+def _to_utc(value: datetime) -> datetime:
+    if not value.tzinfo:
+        value = pytz.timezone(database_settings.timezone_name).localize(value)
+    return value.astimezone(timezone.utc)
+
+
+def python_value2ttype(val: any) -> ttypes.Value:
+    """
+    convert a python value to a nebula value, used to bind the parameters of a parameterized query
+    """
+    if val is None:
+        return ttypes.Value(nVal=ttypes.NullType.__NULL__)
+    if isinstance(val, bool):  # bool should be checked before int
+        return ttypes.Value(bVal=val)
+    if isinstance(val, int):
+        return ttypes.Value(iVal=val)
+    if isinstance(val, float):
+        return ttypes.Value(fVal=val)
+    if isinstance(val, str):
+        return ttypes.Value(sVal=val.encode('utf-8'))
+    if isinstance(val, (list, tuple, set)):
+        return ttypes.Value(lVal=ttypes.NList(values=[python_value2ttype(i) for i in val]))
+    if isinstance(val, datetime):
+        val = _to_utc(val)
+        return ttypes.Value(dtVal=ttypes.DateTime(
+            val.year, val.month, val.day, val.hour, val.minute, val.second, val.microsecond
+        ))
+    if isinstance(val, date):
+        return ttypes.Value(dVal=ttypes.Date(val.year, val.month, val.day))
+    if isinstance(val, time):
+        if val.tzinfo and val.utcoffset() is not None:
+            val = _to_utc(datetime.combine(date.today(), val)).time()
+        return ttypes.Value(tVal=ttypes.Time(val.hour, val.minute, val.second, val.microsecond))
+    raise ValueError(f'Cannot convert {type(val)} to a nebula value')
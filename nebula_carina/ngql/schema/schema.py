@@ -6,20 +6,20 @@ from nebula_carina.ngql.statements.schema import Alter, Ttl, SchemaType, SchemaF
 from nebula_carina.utils.utils import read_str
 
 
-def show_schemas(schema: SchemaType) -> list[str]:
-    return [i.as_string() for i in run_ngql(f'SHOW {schema.value}S;').column_values('Name')]
+def show_schemas(schema: SchemaType, *, space: str | None = None) -> list[str]:
+    return [i.as_string() for i in run_ngql(f'SHOW {schema.value}S;', space=space).column_values('Name')]
 
 
-def show_tags() -> list[str]:
-    return show_schemas(SchemaType.TAG)
+def show_tags(*, space: str | None = None) -> list[str]:
+    return show_schemas(SchemaType.TAG, space=space)
 
 
-def show_edges() -> list[str]:
-    return show_schemas(SchemaType.EDGE)
+def show_edges(*, space: str | None = None) -> list[str]:
+    return show_schemas(SchemaType.EDGE, space=space)
 
 
-def describe_schema(schema: SchemaType, schema_name: str) -> list[SchemaField]:
-    tag_info = run_ngql(f'DESCRIBE {schema.value} {schema_name};')
+def describe_schema(schema: SchemaType, schema_name: str, *, space: str | None = None) -> list[SchemaField]:
+    tag_info = run_ngql(f'DESCRIBE {schema.value} {schema_name};', space=space)
     keys = tag_info.keys()
     fields = []
     for row in tag_info.rows():
@@ -35,12 +35,12 @@ def describe_schema(schema: SchemaType, schema_name: str) -> list[SchemaField]:
     return fields
 
 
-def describe_tag(tag_name: str) -> list[SchemaField]:
-    return describe_schema(SchemaType.TAG, tag_name)
+def describe_tag(tag_name: str, *, space: str | None = None) -> list[SchemaField]:
+    return describe_schema(SchemaType.TAG, tag_name, space=space)
 
 
-def describe_edge(edge_name: str) -> list[SchemaField]:
-    return describe_schema(SchemaType.EDGE, edge_name)
+def describe_edge(edge_name: str, *, space: str | None = None) -> list[SchemaField]:
+    return describe_schema(SchemaType.EDGE, edge_name, space=space)
 
 
 def create_schema_ngql(
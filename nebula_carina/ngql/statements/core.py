@@ -11,6 +11,9 @@ class Statement(ABC):
     def __repr__(self):
         return self.__str__()
 
+    def __hash__(self):
+        return hash((self.__class__, self.__str__()))
+
     def __eq__(self, other):
         return isinstance(other, self.__class__) and all(
             getattr(self, s, None) == getattr(other, s, None)
@@ -0,0 +1,26 @@
+"""
+the pytest fixtures of nebula carina, loaded by the pytest11 entry point
+nothing of nebula carina is imported until a fixture is used, since the settings may not be configured yet,
+e.g. under pytest-django
+"""
+import pytest
+
+
+@pytest.fixture
+def nebula_queries():
+    """
+    the recorder of the queries run by the test, e.g. assert nebula_queries.count <= 3
+    """
+    from nebula_carina.testing import record_queries
+    with record_queries() as recorder:
+        yield recorder
+
+
+@pytest.fixture
+def nebula_memory():
+    """
+    run the ngqls of the test by a fresh in-memory backend, so that no cluster is needed
+    """
+    from nebula_carina.testing import in_memory_backend
+    with in_memory_backend() as backend:
+        yield backend
@@ -9,6 +9,23 @@ try:
 
     class DjangoCarinaDatabaseSettings(object):
         max_connection_pool_size: int = 10
+        session_pool_wait_timeout: Optional[float] = 10.0
+        session_keepalive_interval: Optional[float] = None
+        server_eject_errors: int = 3
+        server_eject_cooldown: float = 30.0
+        retry_max_attempts: int = 3
+        retry_base_delay: float = 0.05
+        retry_max_delay: float = 1.0
+        query_timeout: Optional[float] = None
+        max_concurrent_reads: Optional[int] = None
+        max_concurrent_writes: Optional[int] = None
+        max_queued_queries: Optional[int] = None
+        admission_timeout: Optional[float] = 1.0
+        coalesce_reads: bool = False
+        slow_query_log: bool = False
+        slow_query_threshold: Optional[float] = 0.5
+        metrics: bool = False
+        max_statement_size: int = 65536
         servers: Set[str] = set()
         user_name: str
         password: str
@@ -17,6 +34,7 @@ try:
 
         model_paths: Set[str] = set()
         timezone_name: str = "UTC"
+        json_results: bool = False
 
         @staticmethod
         def is_optional(tp):
@@ -39,6 +57,23 @@ except ModuleNotFoundError:
 
     class DatabaseSettings(BaseSettings):
         max_connection_pool_size: int = 10
+        session_pool_wait_timeout: Optional[float] = 10.0
+        session_keepalive_interval: Optional[float] = None
+        server_eject_errors: int = 3
+        server_eject_cooldown: float = 30.0
+        retry_max_attempts: int = 3
+        retry_base_delay: float = 0.05
+        retry_max_delay: float = 1.0
+        query_timeout: Optional[float] = None
+        max_concurrent_reads: Optional[int] = None
+        max_concurrent_writes: Optional[int] = None
+        max_queued_queries: Optional[int] = None
+        admission_timeout: Optional[float] = 1.0
+        coalesce_reads: bool = False
+        slow_query_log: bool = False
+        slow_query_threshold: Optional[float] = 0.5
+        metrics: bool = False
+        max_statement_size: int = 65536
         servers: Set[str] = {"101.35.211.56:9669"}
         user_name: Optional[str] = "root"
         password: Optional[str] = "rkRK123@"
@@ -47,6 +82,7 @@ except ModuleNotFoundError:
 
         model_paths: Set[str] = set()
         timezone_name: str = "UTC"
+        json_results: bool = False
         model_config = SettingsConfigDict(env_prefix="nebula_")
 
     database_settings = DatabaseSettings()
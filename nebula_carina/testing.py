@@ -0,0 +1,126 @@
+"""
+the helpers for the tests of the applications, e.g. to keep the round trips of the hot paths within a budget
+    with assert_num_queries(2):
+        character.save()
+"""
+import threading
+from contextlib import contextmanager
+
+from nebula_carina.hooks import Hook, hooked
+from nebula_carina.ngql.connection.connection import LocalSession
+from nebula_carina.ngql.connection.memory import InMemoryBackend
+
+
+class RecordedQuery(object):
+    __slots__ = ('ngql', 'space', 'params', 'elapsed', 'error')
+
+    def __init__(
+            self, ngql: str, space: str | None, params: dict[str, any] | None, elapsed: float, error: Exception | None
+    ):
+        self.ngql = ngql
+        self.space = space
+        self.params = params
+        self.elapsed = elapsed
+        self.error = error
+
+    def __repr__(self):
+        return f'RecordedQuery({self.ngql!r}, space={self.space!r}, elapsed={self.elapsed:.6f})'
+
+
+class QueryRecorder(Hook):
+    """
+    record every ngql run by run_ngql while registered, in order of completion
+    """
+
+    def __init__(self):
+        self._queries: list[RecordedQuery] = []
+        self._lock = threading.Lock()
+
+    def after_execute(self, ngql: str, result, elapsed: float, error: Exception | None, context: dict[str, any]):
+        with self._lock:
+            self._queries.append(RecordedQuery(ngql, context.get('space'), context.get('params'), elapsed, error))
+
+    @property
+    def queries(self) -> list[RecordedQuery]:
+        with self._lock:
+            return list(self._queries)
+
+    @property
+    def ngqls(self) -> list[str]:
+        return [query.ngql for query in self.queries]
+
+    @property
+    def count(self) -> int:
+        with self._lock:
+            return len(self._queries)
+
+    @property
+    def elapsed(self) -> float:
+        return sum(query.elapsed for query in self.queries)
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        with self._lock:
+            self._queries.clear()
+
+    def report(self) -> str:
+        return '\n'.join(f'{i}. [{query.elapsed:.4f}s] {query.ngql}' for i, query in enumerate(self.queries, 1))
+
+
+@contextmanager
+def record_queries():
+    """
+    record the queries run within the block
+    """
+    with hooked(QueryRecorder()) as recorder:
+        yield recorder
+
+
+@contextmanager
+def assert_num_queries(expected: int):
+    """
+    assert that exactly expected queries are run within the block
+    """
+    with record_queries() as recorder:
+        yield recorder
+    if recorder.count != expected:
+        raise AssertionError(f'{recorder.count} queries run, {expected} expected:\n{recorder.report()}')
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """
+    assert that at most limit queries are run within the block, e.g. to catch the n + 1 queries of a loop
+    """
+    with record_queries() as recorder:
+        yield recorder
+    if recorder.count > limit:
+        raise AssertionError(f'{recorder.count} queries run, at most {limit} expected:\n{recorder.report()}')
+
+
+@contextmanager
+def in_memory_backend(backend: InMemoryBackend | None = None):
+    """
+    run the ngqls within the block by an in-memory backend instead of the nebula servers
+    """
+    local_session = LocalSession()
+    previous = local_session.backend
+    local_session.set_backend(backend or InMemoryBackend())
+    try:
+        yield local_session.backend
+    finally:
+        local_session.set_backend(previous)
+
+
+class NumQueriesMixin(object):
+    """
+    the assertNumQueries and assertMaxQueries of a unittest.TestCase
+    """
+
+    def assertNumQueries(self, expected: int):
+        return assert_num_queries(expected)
+
+    def assertMaxQueries(self, limit: int):
+        return assert_max_queries(limit)
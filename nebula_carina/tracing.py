@@ -0,0 +1,194 @@
+"""
+the spans of the phases of the queries: building the ngql, waiting on graphd and decoding the models
+nothing is traced until an exporter is set, e.g. set_exporter(InMemorySpanExporter()) in the tests
+"""
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterable, Iterator, Type
+
+from nebula_carina import hooks
+from nebula_carina.ngql.connection.metrics import row_count
+from nebula_carina.ngql.connection.slow_log import fingerprint, server_latency
+
+
+class Span(object):
+    """
+    a timed phase, whose parent is the span it happens within
+    """
+    __slots__ = ('name', 'attributes', 'trace_id', 'span_id', 'parent_id', 'start', 'end', 'error')
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str, parent: 'Span | None' = None, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.span_id = next(self._ids)
+        self.parent_id = None if parent is None else parent.span_id
+        self.trace_id = self.span_id if parent is None else parent.trace_id
+        self.start = time.perf_counter()
+        self.end = None
+        self.error = None
+
+    @property
+    def duration(self) -> float | None:
+        return None if self.end is None else self.end - self.start
+
+    def set_attribute(self, key: str, value: any):
+        self.attributes[key] = value
+
+    def finish(self, error: BaseException | None = None):
+        self.end = time.perf_counter()
+        self.error = error
+        if (exporter := _exporter) is not None:
+            exporter.export(self)
+
+    def __repr__(self):
+        return f'Span({self.name}, {self.attributes})'
+
+
+class SpanExporter(object):
+    """
+    receive the finished spans, e.g. to send them to a tracing backend
+    """
+
+    def export(self, span: Span):
+        raise NotImplementedError
+
+
+class InMemorySpanExporter(SpanExporter):
+    """
+    keep the finished spans in order of finishing, for the tests
+    """
+
+    def __init__(self):
+        self._spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+
+    @property
+    def spans(self) -> list[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def find(self, name: str) -> list[Span]:
+        return [span for span in self.spans if span.name == name]
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+_exporter: SpanExporter | None = None
+_current: ContextVar[Span | None] = ContextVar('nebula_carina_span', default=None)
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    trace the block as a child of the current span, yielding None when nothing is traced
+    """
+    if _exporter is None:
+        yield None
+        return
+    new_span = Span(name, _current.get(), **attributes)
+    token = _current.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        _current.reset(token)
+        new_span.finish(e)
+        raise
+    _current.reset(token)
+    new_span.finish()
+
+
+def traced(iterable: Iterable, name: str, parent: Span | None = None, **attributes) -> Iterator:
+    """
+    trace the consumption of a lazy iterable, the spans created while producing an item being children of its span
+    the span lasts until the iterable is exhausted or closed, its busy_seconds attribute only counts the producing
+    """
+    new_span = Span(name, parent or _current.get(), **attributes)
+    iterator = iter(iterable)
+    rows, busy, error = 0, 0., None
+    try:
+        while True:
+            token = _current.set(new_span)
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                busy += time.perf_counter() - start
+                _current.reset(token)
+            rows += 1
+            yield item
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        new_span.attributes.update(rows=rows, busy_seconds=busy)
+        new_span.finish(None if isinstance(error, GeneratorExit) else error)
+
+
+_fingerprint = lru_cache(maxsize=1024)(fingerprint)
+
+
+class TracingHook(hooks.Hook):
+    """
+    the spans of the queries and of the model events, registered by set_exporter
+    """
+
+    def before_execute(self, ngql: str, context: dict[str, any]):
+        parent = _current.get()
+        new_span = Span(
+            'nebula_carina.execute', parent, space=context.get('space'),
+            kind=getattr(context.get('kind'), 'value', None), fingerprint=_fingerprint(ngql)
+        )
+        context['span'] = new_span, _current.set(new_span)
+
+    def after_execute(self, ngql: str, result, elapsed: float, error: Exception | None, context: dict[str, any]):
+        new_span, token = context.pop('span')
+        _current.reset(token)
+        new_span.attributes.update(rows=row_count(result), server_seconds=server_latency(result))
+        new_span.finish(error)
+
+    def before_model_event(self, event: str, model: Type, context: dict[str, any]):
+        new_span = Span(f'nebula_carina.model.{event}', _current.get(), model=model.__name__)
+        context['span'] = new_span, _current.set(new_span)
+
+    def after_model_event(
+            self, event: str, model: Type, elapsed: float, error: Exception | None, context: dict[str, any]
+    ):
+        new_span, token = context.pop('span')
+        _current.reset(token)
+        new_span.finish(error)
+
+
+_hook = TracingHook()
+
+
+def get_exporter() -> SpanExporter | None:
+    return _exporter
+
+
+def set_exporter(exporter: SpanExporter | None):
+    """
+    start tracing into the exporter, or stop tracing with None
+    """
+    global _exporter
+    _exporter = exporter
+    if exporter is None:
+        hooks.unregister_hook(_hook)
+    else:
+        hooks.register_hook(_hook)
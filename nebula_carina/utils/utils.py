@@ -1,5 +1,11 @@
 import re
 
+try:
+    # the fast json parser is optional
+    from orjson import loads as json_loads
+except ModuleNotFoundError:
+    from json import loads as json_loads
+
 
 def pascal_case_to_snake_case(camel_case: str):
     """大驼峰（帕斯卡）转蛇形"""
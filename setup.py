@@ -14,8 +14,10 @@ setup(
     license='MIT Licence',
     description='Nebula Database Modeling powered by Pydantic and Nebula Python.',
     readme='README.md',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks*', 'tests*']),
     package_dir={'nebula_carina': 'nebula_carina'},
     python_requires='>=3.10',
     install_requires=['nebula3-python', 'pydantic'],
+    extras_require={'orjson': ['orjson']},
+    entry_points={'pytest11': ['nebula_carina = nebula_carina.pytest_plugin']},
 )
@@ -0,0 +1,128 @@
+"""
+Synthetic nebula responses shaped like the example models, so that the decoding paths can be tested and measured
+without a cluster.
+Both the thrift payloads and the json payloads carry the same data.
+"""
+from nebula3.common import ttypes
+from nebula3.data.ResultSet import ResultSet
+from nebula3.fbthrift.protocol.TBinaryProtocol import TBinaryProtocolFactory
+from nebula3.fbthrift.util.Serializer import serialize, deserialize
+from nebula3.graph.ttypes import ExecutionResponse
+
+from nebula_carina.utils.utils import json_loads
+
+try:
+    from orjson import dumps as json_dumps
+except ModuleNotFoundError:
+    from json import dumps as _dumps
+
+    def json_dumps(obj) -> bytes:
+        return _dumps(obj).encode('utf-8')
+
+_protocol_factory = TBinaryProtocolFactory()
+
+
+def _figure_props(i: int) -> dict[str, any]:
+    return {
+        'name': f'name{i}', 'age': i % 100, 'valid_until': 0, 'hp': 100, 'style': 'rap', 'is_virtual': i % 2 == 0,
+        'created_on': (2021, 3, 3, 0, 0, i % 60, 12), 'some_dt': (2022, 1, 1, 0, 0, 0, 0),
+    }
+
+
+def _ttype(value: any) -> ttypes.Value:
+    if isinstance(value, bool):
+        return ttypes.Value(bVal=value)
+    if isinstance(value, int):
+        return ttypes.Value(iVal=value)
+    if isinstance(value, str):
+        return ttypes.Value(sVal=value.encode('utf-8'))
+    return ttypes.Value(dtVal=ttypes.DateTime(*value))
+
+
+def _json(value: any) -> any:
+    if isinstance(value, tuple):
+        year, month, day, hour, minute, sec, microsec = value
+        return f'{year:04}-{month:02}-{day:02}T{hour:02}:{minute:02}:{sec:02}.{microsec:06}000Z'
+    return value
+
+
+def make_vertex(i: int) -> ttypes.Vertex:
+    return ttypes.Vertex(vid=ttypes.Value(sVal=f'char_{i}'.encode('utf-8')), tags=[
+        ttypes.Tag(name=b'figure', props={k.encode('utf-8'): _ttype(v) for k, v in _figure_props(i).items()}),
+        ttypes.Tag(name=b'source', props={b'name': _ttype(f'movie{i % 10}')}),
+    ])
+
+
+def make_edge(i: int) -> ttypes.Edge:
+    return ttypes.Edge(
+        src=ttypes.Value(sVal=f'char_{i}'.encode('utf-8')), dst=ttypes.Value(sVal=f'char_{i + 1}'.encode('utf-8')),
+        type=1, name=b'love', ranking=0, props={b'way': _ttype('gun'), b'times': _ttype(i % 100)},
+    )
+
+
+def make_data_set(rows: int, columns: list[str], make_values) -> ttypes.DataSet:
+    return ttypes.DataSet(
+        column_names=[c.encode('utf-8') for c in columns],
+        rows=[ttypes.Row(values=make_values(i)) for i in range(rows)],
+    )
+
+
+def make_vertex_data_set(rows: int) -> ttypes.DataSet:
+    return make_data_set(rows, ['v'], lambda i: [ttypes.Value(vVal=make_vertex(i))])
+
+
+def make_edge_data_set(rows: int) -> ttypes.DataSet:
+    return make_data_set(
+        rows, ['v', 'e', 'v2'],
+        lambda i: [ttypes.Value(vVal=make_vertex(i)), ttypes.Value(eVal=make_edge(i)), ttypes.Value(vVal=make_vertex(i + 1))]
+    )
+
+
+def make_result_set(data_set: ttypes.DataSet) -> ResultSet:
+    return ResultSet(ExecutionResponse(error_code=0, latency_in_us=100, data=data_set), all_latency=200)
+
+
+def serialize_response(data_set: ttypes.DataSet) -> bytes:
+    return serialize(_protocol_factory, ExecutionResponse(error_code=0, latency_in_us=100, data=data_set))
+
+
+def deserialize_result_set(payload: bytes) -> ResultSet:
+    """
+    what the client does with the bytes of a thrift response
+    """
+    return ResultSet(deserialize(_protocol_factory, payload, ExecutionResponse()), all_latency=200)
+
+
+def _json_vertex(i: int) -> tuple[dict, dict]:
+    props = {f'figure.{k}': _json(v) for k, v in _figure_props(i).items()}
+    props['source.name'] = f'movie{i % 10}'
+    return props, {'type': 'vertex', 'id': f'char_{i}'}
+
+
+def _json_edge(i: int) -> tuple[dict, dict]:
+    return {'way': 'gun', 'times': i % 100}, {
+        'type': 'edge', 'id': {'name': 'love', 'src': f'char_{i}', 'dst': f'char_{i + 1}', 'type': 1, 'ranking': 0}
+    }
+
+
+def _json_response(columns: list[str], rows: int, make_items) -> bytes:
+    data = []
+    for i in range(rows):
+        items = make_items(i)
+        data.append({'row': [item[0] for item in items], 'meta': [item[1] for item in items]})
+    return json_dumps({
+        'errors': [{'code': 0}],
+        'results': [{'columns': columns, 'data': data, 'latencyInUs': 100, 'spaceName': 'main'}],
+    })
+
+
+def make_vertex_json(rows: int) -> bytes:
+    return _json_response(['v'], rows, lambda i: [_json_vertex(i)])
+
+
+def make_edge_json(rows: int) -> bytes:
+    return _json_response(['v', 'e', 'v2'], rows, lambda i: [_json_vertex(i), _json_edge(i), _json_vertex(i + 1)])
+
+
+def load_json(payload: bytes) -> dict:
+    return json_loads(payload)
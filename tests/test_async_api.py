@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+import threading
+import time
+import unittest
+from unittest import mock
+
+from example.models import VirtualCharacter, Figure, Source, Love
+from nebula_carina.models.errors import VertexDoesNotExistError
+from nebula_carina.models.model_builder import ModelBuilder
+from nebula_carina.models.models import EdgeModel
+from nebula_carina.ngql.connection.connection import LocalSession, arun_ngql, get_executor, run_in_executor
+from nebula_carina.settings import database_settings
+from nebula_carina.testing import in_memory_backend
+
+request_id = contextvars.ContextVar('request_id', default=None)
+
+
+class TestRunInExecutor(unittest.TestCase):
+    def test_arun_ngql_runs_in_the_executor(self):
+        threads = []
+
+        def run(*args):
+            threads.append(threading.current_thread().name)
+            return 'result'
+        with mock.patch.object(LocalSession(), '_run_ngql', side_effect=run):
+            self.assertEqual(asyncio.run(arun_ngql('SHOW TAGS;')), 'result')
+        self.assertTrue(threads[0].startswith('nebula-carina'))
+
+    def test_context_is_propagated(self):
+        async def read():
+            request_id.set('request_1')
+            return await run_in_executor(request_id.get)
+        self.assertEqual(asyncio.run(read()), 'request_1')
+
+    def test_exceptions_surface(self):
+        def broken():
+            raise RuntimeError('broken')
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run_in_executor(broken))
+
+    def test_executor_is_bounded(self):
+        self.assertEqual(get_executor()._max_workers, database_settings.max_connection_pool_size)
+        lock, running, peak = threading.Lock(), [0], [0]
+
+        def work():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        async def flood():
+            tasks = database_settings.max_connection_pool_size * 3
+            await asyncio.gather(*(run_in_executor(work) for _ in range(tasks)))
+        asyncio.run(flood())
+        self.assertLessEqual(peak[0], database_settings.max_connection_pool_size)
+
+
+class TestAsyncModels(unittest.TestCase):
+    def setUp(self):
+        self._backend = in_memory_backend()
+        self._backend.__enter__()
+
+    def tearDown(self):
+        self._backend.__exit__(None, None, None)
+
+    def test_round_trip(self):
+        async def round_trip():
+            for vid in ('char_0', 'char_1'):
+                await VirtualCharacter(
+                    vid=vid, figure=Figure(name=vid, age=1, valid_until=0), source=Source(name='memory')
+                ).asave()
+            await EdgeModel(src_vid='char_0', dst_vid='char_1', ranking=0, edge_type=Love(way='gun', times=1)).ainsert()
+            character = await VirtualCharacter.objects.aget('char_1')
+            edge = await EdgeModel.objects.aget('char_0', 'char_1', Love)
+            destinations = await VirtualCharacter.objects.afind_destinations('char_0', Love)
+            matched = [r['v'].vid async for r in ModelBuilder.amatch('(v:figure:source)', {'v': VirtualCharacter})]
+            serialized = await ModelBuilder.aserialized_match('(v:figure:source)', {'v': VirtualCharacter})
+            await VirtualCharacter.objects.adelete(['char_1'])
+            return character, edge, destinations, matched, serialized
+
+        character, edge, destinations, matched, serialized = asyncio.run(round_trip())
+        self.assertEqual((character.vid, edge.edge_type.times), ('char_1', 1))
+        self.assertEqual([v.vid for v in destinations], ['char_1'])
+        self.assertEqual(sorted(matched), ['char_0', 'char_1'])
+        self.assertEqual(len(serialized), 2)
+        with self.assertRaises(VertexDoesNotExistError):
+            asyncio.run(VirtualCharacter.objects.aget('char_1'))
@@ -0,0 +1,16 @@
+import unittest
+
+from benchmarks import suite
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def test_run(self):
+        report = suite.run(rows=5, operations=5, repeat=1)
+        self.assertEqual(set(report['results']), {'decode', 'build', 'value2db_str', 'write'})
+        self.assertIn('vertex_edge_vertex_json', report['results']['decode'])
+        self.assertTrue(all(value > 0 for cases in report['results'].values() for value in cases.values()))
+
+    def test_compare(self):
+        baseline = {'results': {'build': {'node_condition': 100.0, 'insert_edge_ngql': 100.0}}}
+        current = {'results': {'build': {'node_condition': 85.0, 'insert_edge_ngql': 75.0, 'insert_vertex_ngql': 1.0}}}
+        self.assertEqual(suite.compare(baseline, current, 0.2), ['build.insert_edge_ngql: 75/s, was 100/s'])
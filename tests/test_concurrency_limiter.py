@@ -0,0 +1,75 @@
+import threading
+import time
+import unittest
+
+from nebula_carina.ngql.connection.limiter import ConcurrencyLimiter
+from nebula_carina.ngql.connection.retry import StatementKind
+from nebula_carina.ngql.errors import QueryRejectedError
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+    def test_caps_in_flight_queries(self):
+        limiter = ConcurrencyLimiter(max_reads=2, timeout=5)
+        in_flight, max_in_flight, lock = [0], [0], threading.Lock()
+
+        def work():
+            for _ in range(10):
+                with limiter.admit('main', StatementKind.READ):
+                    with lock:
+                        in_flight[0] += 1
+                        max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+                    time.sleep(0.001)
+                    with lock:
+                        in_flight[0] -= 1
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max_in_flight[0], 2)
+        stats = limiter.stats()['main:read']
+        self.assertEqual((stats['admitted'], stats['in_flight'], stats['queued']), (60, 0, 0))
+        self.assertGreater(stats['waited'], 0)
+        self.assertGreater(stats['max_queued'], 0)
+
+    def test_spaces_and_classes_are_limited_apart(self):
+        limiter = ConcurrencyLimiter(max_reads=1, max_writes=1, timeout=0)
+        with limiter.admit('main', StatementKind.READ), limiter.admit('other', StatementKind.READ), \
+                limiter.admit('main', StatementKind.IDEMPOTENT_WRITE):
+            with self.assertRaises(QueryRejectedError) as cm:
+                with limiter.admit('main', StatementKind.NON_IDEMPOTENT_WRITE):
+                    pass
+        self.assertEqual((cm.exception.space, cm.exception.statement_class), ('main', 'write'))
+        self.assertEqual(limiter.stats()['main:write']['rejected'], 1)
+
+    def test_unlimited_class(self):
+        limiter = ConcurrencyLimiter(max_writes=1)
+        with limiter.admit('main', StatementKind.READ), limiter.admit('main', StatementKind.READ):
+            pass
+        self.assertEqual(limiter.stats(), {})
+
+    def test_deadline_and_queue_length(self):
+        limiter = ConcurrencyLimiter(max_reads=1, max_queued=1, timeout=0.05)
+        gate = limiter.acquire('main', 'read')
+        errors = []
+
+        def queued():
+            try:
+                limiter.acquire('main', 'read')
+            except QueryRejectedError as e:
+                errors.append(e)
+        thread = threading.Thread(target=queued)
+        thread.start()
+        time.sleep(0.01)
+        # the queue is full, so the load is shed at once
+        start = time.monotonic()
+        with self.assertRaises(QueryRejectedError):
+            limiter.acquire('main', 'read')
+        self.assertLess(time.monotonic() - start, 0.04)
+        thread.join()
+        self.assertEqual(len(errors), 1)
+        self.assertIn('within 0.05 seconds', str(errors[0]))
+        limiter.release(gate)
+        limiter.release(limiter.acquire('main', 'read'))
+        self.assertEqual(limiter.stats()['main:read']['rejected'], 2)
@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from nebula_carina.ngql.connection.connection import LocalSession
+from nebula_carina.ngql.connection.pool import SessionPool, HealthChecker
+from nebula_carina.ngql.errors import SessionPoolTimeoutError
+
+
+class FakeSession(object):
+    def __init__(self):
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+    def ping(self):
+        return not self.released
+
+    def execute(self, ngql):
+        if self.released:
+            raise RuntimeError('session released')
+        return mock.Mock(is_succeeded=lambda: True)
+
+
+class TestSessionPool(unittest.TestCase):
+    def test_checkout_and_reuse(self):
+        pool = SessionPool(FakeSession, 2)
+        with pool.session() as pooled1:
+            with pool.session() as pooled1_again:
+                # the same thread reuses the session it holds
+                self.assertIs(pooled1, pooled1_again)
+            self.assertEqual(pool.created_count, 1)
+        self.assertEqual(pool.idle_count, 1)
+        with pool.session() as pooled2:
+            self.assertIs(pooled1, pooled2)
+        self.assertEqual(pool.created_count, 1)
+
+    def test_sessions_are_kept_by_space(self):
+        pool = SessionPool(FakeSession, 3)
+        pooled1, pooled2 = pool.acquire('space1'), pool.acquire('space2')
+        pooled1.space, pooled2.space = 'space1', 'space2'
+        pool.release(pooled1)
+        pool.release(pooled2)
+        self.assertIs(pool.acquire('space2'), pooled2)
+        self.assertIs(pool.acquire('space1'), pooled1)
+        pool.release(pooled1)
+        pool.release(pooled2)
+        # a session of another space is taken rather than creating a new one, the least recently used first
+        self.assertIs(pool.acquire('space3'), pooled1)
+        self.assertEqual(pool.created_count, 2)
+
+    def test_concurrent_checkout(self):
+        pool = SessionPool(FakeSession, 3)
+        in_use, max_in_use, lock = set(), [0], threading.Lock()
+
+        def work():
+            for _ in range(20):
+                with pool.session() as pooled:
+                    with lock:
+                        self.assertNotIn(id(pooled), in_use)
+                        in_use.add(id(pooled))
+                        max_in_use[0] = max(max_in_use[0], len(in_use))
+                    time.sleep(0.001)
+                    with lock:
+                        in_use.remove(id(pooled))
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(pool.created_count, 3)
+        self.assertLessEqual(max_in_use[0], 3)
+
+    def test_wait_timeout(self):
+        pool = SessionPool(FakeSession, 1, wait_timeout=0.05)
+        pooled = pool.acquire()
+        with self.assertRaises(SessionPoolTimeoutError):
+            pool.acquire()
+        pool.release(pooled)
+        self.assertIs(pool.acquire(), pooled)
+
+    def test_discard_and_renew(self):
+        pool = SessionPool(FakeSession, 1)
+        pooled = pool.acquire()
+        old_session = pooled.session
+        pooled.space = 'main'
+        pool.renew(pooled)
+        self.assertTrue(old_session.released)
+        self.assertIsNot(pooled.session, old_session)
+        self.assertIsNone(pooled.space)
+        pool.release(pooled, discard=True)
+        self.assertTrue(pooled.session.released)
+        self.assertEqual(pool.created_count, 0)
+
+    def test_factory_failure_frees_the_slot(self):
+        def broken_factory():
+            raise RuntimeError('cannot connect')
+        pool = SessionPool(broken_factory, 1, wait_timeout=0.05)
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
+        self.assertEqual(pool.created_count, 0)
+
+    def test_abandon_after_fork(self):
+        pool = SessionPool(FakeSession, 2)
+        pooled1, pooled2 = pool.acquire(), pool.acquire()
+        pooled1.session._connection = pooled2.session._connection = object()
+        pool.release(pooled1)
+        pool.abandon()
+        # the sessions are forgotten without being released, as they belong to the parent process
+        self.assertIsNone(pooled1.session._connection)
+        self.assertIsNone(pooled2.session._connection)
+        self.assertFalse(pooled1.session.released)
+        self.assertEqual((pool.created_count, pool.idle_count), (0, 0))
+        self.assertIsNot(pool.acquire(), pooled1)
+
+    def test_keepalive(self):
+        spaces_set = []
+        pool = SessionPool(FakeSession, 3, space_setter=lambda pooled, space: spaces_set.append(space))
+        stale, dead, fresh = pool.acquire(), pool.acquire(), pool.acquire()
+        dead.space = 'main'
+        dead_session = dead.session
+        pool.release(stale)
+        pool.release(dead)
+        stale.last_used_at = dead.last_used_at = time.monotonic() - 10
+        pool.release(fresh)
+        pinged = []
+
+        def probe(session):
+            pinged.append(session)
+            return session is not dead_session
+
+        self.assertEqual(pool.keepalive(5, probe), (2, 1))
+        self.assertNotIn(fresh.session, pinged)
+        # the dead session is replaced and switched to its space in the background
+        self.assertTrue(dead_session.released)
+        self.assertIsNot(dead.session, dead_session)
+        self.assertEqual(spaces_set, ['main'])
+        self.assertEqual((pool.created_count, pool.idle_count), (3, 3))
+        self.assertEqual(pool.keepalive(5, probe), (0, 0))
+
+    def test_keepalive_without_servers(self):
+        sessions = [FakeSession()]
+
+        def factory():
+            if not sessions:
+                raise RuntimeError('cannot connect')
+            return sessions.pop()
+        pool = SessionPool(factory, 1)
+        pool.release(pool.acquire())
+        self.assertEqual(pool.keepalive(0, lambda session: False), (1, 1))
+        # the slot is freed, so that the next checkout tries to connect again
+        self.assertEqual((pool.created_count, pool.idle_count), (0, 0))
+
+    def test_session_failing_to_renew_is_discarded(self):
+        sessions = [FakeSession()]
+
+        def factory():
+            if not sessions:
+                raise RuntimeError('cannot connect')
+            return sessions.pop()
+        pool = SessionPool(factory, 1)
+        with self.assertRaises(RuntimeError):
+            with pool.session() as pooled:
+                pool.renew(pooled)
+        # not put back with its released session, the next checkout connects again
+        self.assertEqual((pool.created_count, pool.idle_count), (0, 0))
+        sessions.append(FakeSession())
+        with pool.session() as pooled:
+            self.assertFalse(pooled.session.released)
+
+    def test_health_checker(self):
+        pool = SessionPool(FakeSession, 1)
+        pooled = pool.acquire()
+        pool.release(pooled)
+        pooled.session.released = True  # a dead session, as FakeSession.execute fails after release
+        checker = HealthChecker(pool, 0.01)
+        checker.start()
+        try:
+            deadline = time.monotonic() + 5
+            while pooled.session.released and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            checker.stop()
+        self.assertFalse(pooled.session.released)
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'fork is not available')
+class TestForkSafety(unittest.TestCase):
+    def test_child_gets_its_own_session_pool(self):
+        parent_pool = LocalSession().pool
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if LocalSession().pool is not parent_pool else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertIs(LocalSession().pool, parent_pool)
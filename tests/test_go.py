@@ -0,0 +1,163 @@
+import asyncio
+import unittest
+
+from example.models import VirtualCharacter, Figure, Source, Love
+from nebula_carina.models.model_builder import ModelBuilder
+from nebula_carina.models.models import EdgeModel
+from nebula_carina.ngql.connection.connection import run_ngql
+from nebula_carina.ngql.connection.retry import classify, StatementKind
+from nebula_carina.ngql.query.conditions import RawCondition, Q
+from nebula_carina.ngql.query.go import go_ngql, compile_go, DESTINATION, EDGE, SOURCE
+from nebula_carina.ngql.statements.clauses import Limit
+from nebula_carina.testing import in_memory_backend, record_queries
+
+
+class TestGoNgql(unittest.TestCase):
+    def test_go_ngql(self):
+        self.assertEqual(go_ngql(['a', 1], ['love'], '$$ AS v'), 'GO FROM "a", 1 OVER love YIELD $$ AS v;')
+        self.assertEqual(
+            go_ngql(['a'], [], 'edge AS e', 'rank(edge) > 0', steps=(1, 3), direction='both', limit=Limit(10, 5)),
+            'GO 1 TO 3 STEPS FROM "a" OVER * BIDIRECT WHERE rank(edge) > 0 YIELD edge AS e | LIMIT 5, 10;'
+        )
+        self.assertEqual(
+            go_ngql(['a'], ['love', 'support'], '$^ AS v', steps=2, direction='in'),
+            'GO 2 STEPS FROM "a" OVER love, support REVERSELY YIELD $^ AS v;'
+        )
+        with self.assertRaises(ValueError):
+            go_ngql(['a'], [], '$$ AS v', direction='sideways')
+
+    def test_go_with_limit_is_a_read(self):
+        ngql = go_ngql(['a'], ['love'], '$$ AS v', limit=Limit(3, 1))
+        self.assertEqual(classify(ngql), StatementKind.READ)
+
+    def test_compile_go(self):
+        ngql, params = compile_go(
+            ['a'], ['love'], '$$ AS v', RawCondition('properties(edge).times > $times', {'times': 3}),
+            tags={DESTINATION: ['figure']}
+        )
+        self.assertEqual(ngql, 'GO FROM "a" OVER love WHERE "figure" IN tags($$) '
+                               'AND (properties(edge).times > $times) YIELD $$ AS v;')
+        self.assertEqual(params, {'times': 3})
+
+    def test_compile_go_aliases(self):
+        ngql, params = compile_go(
+            ['a'], ['love'], '$$ AS v2', Q(v2__figure__age__gte=18) & Q(love__times__gt=3),
+            aliases={'v2': DESTINATION, 'e': EDGE}
+        )
+        self.assertEqual(
+            ngql, 'GO FROM "a" OVER love WHERE (($$.figure.age >= $q0)) AND ((love.times > $q1)) YIELD $$ AS v2;'
+        )
+        self.assertEqual(params, {'q0': 18, 'q1': 3})
+
+
+class TestGo(unittest.TestCase):
+    def setUp(self):
+        self._backend = in_memory_backend()
+        self._backend.__enter__()
+        for i in range(4):
+            VirtualCharacter(
+                vid=f'char_{i}', figure=Figure(name=f'name_{i}', age=i, valid_until=0), source=Source(name='memory')
+            ).save()
+        for src, dst, times in (('char_0', 'char_1', 1), ('char_0', 'char_2', 2), ('char_1', 'char_3', 3)):
+            EdgeModel(src_vid=src, dst_vid=dst, ranking=0, edge_type=Love(way='gun', times=times)).save()
+        # reached by the edges, but not a virtual character
+        run_ngql('INSERT VERTEX figure (name, age) VALUES "figure_only": ("name", 9);')
+        EdgeModel(src_vid='char_0', dst_vid='figure_only', ranking=0, edge_type=Love(way='gun', times=9)).save()
+
+    def tearDown(self):
+        self._backend.__exit__(None, None, None)
+
+    def test_vertices(self):
+        with record_queries() as recorder:
+            self.assertEqual([v.vid for v in VirtualCharacter.objects.go('char_0', Love)], ['char_1', 'char_2'])
+        self.assertTrue(recorder.ngqls[0].startswith('GO FROM "char_0" OVER love WHERE'))
+        self.assertEqual([v.vid for v in VirtualCharacter.objects.go(['char_0'], Love, steps=2)], ['char_3'])
+        self.assertEqual(
+            [v.vid for v in VirtualCharacter.objects.go('char_0', None, steps=(1, 2))], ['char_1', 'char_2', 'char_3']
+        )
+        self.assertEqual([v.vid for v in VirtualCharacter.objects.go('char_3', Love, direction='in')], ['char_1'])
+        self.assertEqual(
+            sorted(v.vid for v in VirtualCharacter.objects.go('char_1', Love, direction='both')), ['char_0', 'char_3']
+        )
+
+    def test_edges(self):
+        edges = EdgeModel.objects.go(
+            'char_0', Love, condition=RawCondition('properties(edge).times > $times', {'times': 1}), limit=Limit(1)
+        )
+        self.assertEqual([(edge.dst_vid, edge.edge_type.times) for edge in edges], [('char_2', 2)])
+
+    def test_yield(self):
+        self.assertEqual(
+            [v.vid for v in VirtualCharacter.objects.go('char_0', Love, yield_=SOURCE, distinct=True)], ['char_0']
+        )
+        with record_queries() as recorder:
+            edges = EdgeModel.objects.go('char_0', Love, yield_=EDGE, limit=Limit(1))
+        self.assertEqual(len(edges), 1)
+        self.assertIn(f'YIELD {EDGE} AS e', recorder.ngqls[0])
+
+    def test_vertex_model(self):
+        character = VirtualCharacter.objects.get('char_1')
+        results = list(character.go(Love, VirtualCharacter, direction='in'))
+        self.assertEqual([(r['edge'].src_vid, r['dst'].vid) for r in results], [('char_0', 'char_0')])
+        character = VirtualCharacter.objects.get('char_0')
+        results = list(character.go(Love, VirtualCharacter, condition=Q(v2__figure__age__gte=2), timeout=1))
+        self.assertEqual([(r['edge'].dst_vid, r['dst'].vid) for r in results], [('char_2', 'char_2')])
+
+    def test_json(self):
+        to_model_dict = {'e': EdgeModel, 'v2': VirtualCharacter}
+        thrift = [dict(r) for r in ModelBuilder.go('char_0', Love, to_model_dict)]
+        json = [dict(r) for r in ModelBuilder.go('char_0', Love, to_model_dict, as_json=True)]
+        self.assertEqual(json, thrift)
+
+    def test_async(self):
+        async def go():
+            return [r['v'].vid async for r in ModelBuilder.ago('char_0', Love, {'v': VirtualCharacter}, distinct=True)]
+        self.assertEqual(asyncio.run(go()), ['char_1', 'char_2'])
+
+    def test_filter_and_project(self):
+        for as_json in (False, True):
+            with record_queries() as recorder:
+                results = [dict(r) for r in ModelBuilder.go(
+                    'char_0', Love, {'v2': VirtualCharacter}, steps=(1, 2),
+                    condition=Q(v2__figure__age__gte=2) & Q(love__times__gt=1),
+                    project={'name': '$$.figure.name', 'times': 'love.times'}, as_json=as_json
+                )]
+            self.assertEqual(len(recorder.ngqls), 1)
+            self.assertEqual(
+                [(r['v2'].vid, r['name'], r['times']) for r in results],
+                [('char_2', 'name_2', 2), ('char_3', 'name_3', 3)]
+            )
+
+
+class TestVariableLengthMatch(unittest.TestCase):
+    def setUp(self):
+        self._backend = in_memory_backend()
+        self._backend.__enter__()
+        for i in range(4):
+            VirtualCharacter(
+                vid=f'char_{i}', figure=Figure(name=f'name_{i}', age=i, valid_until=0), source=Source(name='memory')
+            ).save()
+        for src, dst in (('char_0', 'char_1'), ('char_1', 'char_2'), ('char_2', 'char_3'), ('char_3', 'char_0')):
+            EdgeModel(src_vid=src, dst_vid=dst, ranking=0, edge_type=Love(way='gun', times=1)).save()
+
+    def tearDown(self):
+        self._backend.__exit__(None, None, None)
+
+    def _match(self, pattern: str, as_json: bool = False) -> list[dict]:
+        return [dict(r) for r in ModelBuilder.match(
+            pattern, {'e': EdgeModel, 'v2': VirtualCharacter}, condition=Q(v__id='char_0'),
+            project={'age': 'v2.figure.age'}, as_json=as_json
+        )]
+
+    def test_hops(self):
+        results = self._match('(v)-[e:love*1..2]->(v2)')
+        self.assertEqual([(len(r['e']), r['v2'].vid, r['age']) for r in results], [(1, 'char_1', 1), (2, 'char_2', 2)])
+        self.assertEqual([edge.dst_vid for edge in results[1]['e']], ['char_1', 'char_2'])
+        self.assertEqual([r['v2'].vid for r in self._match('(v)-[e:love*3]->(v2)')], ['char_3'])
+        # the edges of a path are distinct, so the cycle is walked once
+        self.assertEqual(
+            [r['v2'].vid for r in self._match('(v)-[e:love*]->(v2)')], ['char_1', 'char_2', 'char_3', 'char_0']
+        )
+
+    def test_json(self):
+        self.assertEqual(self._match('(v)-[e:love*..2]->(v2)', as_json=True), self._match('(v)-[e:love*..2]->(v2)'))
@@ -0,0 +1,79 @@
+import unittest
+from unittest import mock
+
+from tests import fixtures
+from example.models import VirtualCharacter, Figure, Source
+from nebula_carina.hooks import Hook, hooked, get_hooks, register_hook, unregister_hook, observed_decoder
+from nebula_carina.models.model_builder import ModelBuilder
+from nebula_carina.ngql.connection.connection import LocalSession
+
+
+class RecordingHook(Hook):
+    def __init__(self):
+        self.events = []
+
+    def before_execute(self, ngql, context):
+        context['seen'] = True
+        self.events.append(('before_execute', ngql, context['space']))
+
+    def after_execute(self, ngql, result, elapsed, error, context):
+        self.events.append(('after_execute', ngql, result, error, context['seen']))
+
+    def before_model_event(self, event, model, context):
+        self.events.append(('before', event, model))
+
+    def after_model_event(self, event, model, elapsed, error, context):
+        self.events.append(('after', event, model, context.get('instance'), error))
+
+
+class TestHooks(unittest.TestCase):
+    def test_register_and_unregister(self):
+        hook = RecordingHook()
+        register_hook(hook)
+        register_hook(hook)
+        self.assertEqual(get_hooks().count(hook), 1)
+        unregister_hook(hook)
+        self.assertNotIn(hook, get_hooks())
+
+    def test_execute(self):
+        local_session, hook = LocalSession(), RecordingHook()
+        with hooked(hook), mock.patch.object(local_session, '_run_ngql', return_value='result'):
+            local_session.run_ngql('SHOW TAGS;', space='main')
+        self.assertEqual(hook.events, [
+            ('before_execute', 'SHOW TAGS;', 'main'), ('after_execute', 'SHOW TAGS;', 'result', None, True),
+        ])
+
+    def test_execute_error(self):
+        local_session, hook, error = LocalSession(), RecordingHook(), RuntimeError('boom')
+        with hooked(hook), mock.patch.object(local_session, '_run_ngql', side_effect=error):
+            with self.assertRaises(RuntimeError):
+                local_session.run_ngql('SHOW TAGS;', space='main')
+        self.assertEqual(hook.events[-1], ('after_execute', 'SHOW TAGS;', None, error, True))
+
+    def test_model_events(self):
+        hook = RecordingHook()
+        character = VirtualCharacter(vid='a', figure=Figure(name='a', age=1), source=Source(name='b'))
+        with hooked(hook), mock.patch('nebula_carina.models.models.run_ngql'), \
+                mock.patch('nebula_carina.models.managers.run_ngql'):
+            character.insert()
+            VirtualCharacter.objects.delete(['a'])
+        self.assertEqual(hook.events, [
+            ('before', 'insert', VirtualCharacter), ('after', 'insert', VirtualCharacter, character, None),
+            ('before', 'delete', VirtualCharacter), ('after', 'delete', VirtualCharacter, None, None),
+        ])
+
+    def test_decode_events(self):
+        hook = RecordingHook()
+        with hooked(hook):
+            results = list(ModelBuilder.decode(
+                fixtures.make_result_set(fixtures.make_vertex_data_set(2)), {'v': VirtualCharacter}
+            ))
+        decoded = [event[3] for event in hook.events if event[0] == 'after']
+        self.assertEqual(decoded, [r['v'] for r in results])
+        self.assertTrue(all(event[1] == 'decode' for event in hook.events))
+
+    def test_no_overhead_without_hooks(self):
+        decode = VirtualCharacter.from_nebula_db_cls
+        self.assertIs(observed_decoder(VirtualCharacter, decode), decode)
+        with hooked(RecordingHook()):
+            self.assertIsNot(observed_decoder(VirtualCharacter, decode), decode)
@@ -0,0 +1,35 @@
+import unittest
+from datetime import date, datetime
+from unittest import mock
+
+import pytz
+
+from tests import fixtures
+from example.models import VirtualCharacter
+from nebula_carina.models.model_builder import ModelBuilder
+from nebula_carina.models.models import EdgeModel
+from nebula_carina.ngql.schema import data_types
+from nebula_carina.settings import database_settings
+
+
+class TestJsonResults(unittest.TestCase):
+    def test_json_time_values(self):
+        dt = data_types.Datetime.json2python_type('2021-03-03T01:02:03.000012000Z')
+        self.assertEqual(dt, datetime(2021, 3, 3, 1, 2, 3, 12, tzinfo=pytz.timezone(database_settings.timezone_name)))
+        self.assertEqual(data_types.Date.json2python_type('2021-03-03'), date(2021, 3, 3))
+        self.assertEqual(data_types.Int64.json2python_type(12), 12)
+
+    def test_decode_json_equals_decode(self):
+        to_model_dict = {'v': VirtualCharacter, 'e': EdgeModel, 'v2': VirtualCharacter}
+        from_thrift = list(ModelBuilder.decode(fixtures.make_result_set(fixtures.make_edge_data_set(5)), to_model_dict))
+        from_json = list(ModelBuilder.decode_json(fixtures.load_json(fixtures.make_edge_json(5)), to_model_dict))
+        self.assertEqual(len(from_json), 5)
+        self.assertEqual([dict(r) for r in from_json], [dict(r) for r in from_thrift])
+
+    def test_match_uses_the_json_setting(self):
+        with mock.patch('nebula_carina.ngql.query.match.run_ngql_json') as run_ngql_json, \
+                mock.patch.object(database_settings, 'json_results', True):
+            run_ngql_json.return_value = fixtures.load_json(fixtures.make_vertex_json(2))
+            results = list(ModelBuilder.match('(v:figure:source)', {'v': VirtualCharacter}))
+        self.assertEqual([r['v'].vid for r in results], ['char_0', 'char_1'])
+        self.assertEqual(results[1]['v'].figure.name, 'name1')
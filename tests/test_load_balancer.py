@@ -0,0 +1,97 @@
+import random
+import unittest
+from collections import Counter
+from unittest import mock
+
+from nebula_carina.ngql.connection.balancer import LoadBalancer
+from nebula_carina.ngql.connection.pool import SessionPool
+
+
+class FakeSession(object):
+    def __init__(self, server):
+        self.server = server
+
+    def release(self):
+        pass
+
+
+class TestLoadBalancer(unittest.TestCase):
+    def test_prefers_the_faster_server(self):
+        balancer = LoadBalancer(['a:1', 'b:1'], rng=random.Random(0))
+        balancer.start('a:1')
+        balancer.succeed('a:1', 0.1)
+        balancer.start('b:1')
+        balancer.succeed('b:1', 0.01)
+        self.assertEqual({balancer.choose() for _ in range(20)}, {'b:1'})
+
+    def test_in_flight_queries_weight_the_latency(self):
+        balancer = LoadBalancer(['a:1', 'b:1'], rng=random.Random(0))
+        for server in ('a:1', 'b:1'):
+            balancer.start(server)
+            balancer.succeed(server, 0.01)
+        for _ in range(3):
+            balancer.start('b:1')
+        self.assertEqual(balancer.choose(), 'a:1')
+        self.assertEqual(balancer.stats()['b:1']['in_flight'], 3)
+
+    def test_power_of_two_choices_spreads_the_load(self):
+        balancer = LoadBalancer(['a:1', 'b:1', 'c:1'], rng=random.Random(0))
+        counter = Counter()
+        for _ in range(300):
+            server = balancer.choose()
+            counter[server] += 1
+            with balancer.track(server):
+                pass
+        self.assertEqual(set(counter), {'a:1', 'b:1', 'c:1'})
+
+    def test_eject_and_cooldown(self):
+        balancer = LoadBalancer(['a:1', 'b:1'], eject_errors=2, cooldown=30, rng=random.Random(0))
+        for _ in range(2):
+            with self.assertRaises(RuntimeError), balancer.track('a:1'):
+                raise RuntimeError('broken pipe')
+        self.assertTrue(balancer.stats()['a:1']['ejected'])
+        self.assertEqual({balancer.choose() for _ in range(20)}, {'b:1'})
+        with mock.patch('nebula_carina.ngql.connection.balancer.time.monotonic', return_value=1e12):
+            self.assertFalse(balancer.stats()['a:1']['ejected'])
+
+    def test_every_server_ejected(self):
+        balancer = LoadBalancer(['a:1', 'b:1'], eject_errors=1, cooldown=30)
+        balancer.fail('b:1', started=False)
+        balancer.fail('a:1', started=False)
+        # the one coming back first is still tried
+        self.assertEqual(balancer.choose(), 'b:1')
+
+
+class TestBalancedSessionPool(unittest.TestCase):
+    def test_sessions_are_opened_on_the_chosen_servers(self):
+        balancer = LoadBalancer(['a:1', 'b:1'])
+        pool = SessionPool(FakeSession, 2, balancer=balancer)
+        with mock.patch.object(balancer, 'choose', return_value='a:1'):
+            pooled_a = pool.acquire()
+        with mock.patch.object(balancer, 'choose', return_value='b:1'):
+            pooled_b = pool.acquire()
+        self.assertEqual((pooled_a.server, pooled_a.session.server), ('a:1', 'a:1'))
+        self.assertEqual((pooled_b.server, pooled_b.session.server), ('b:1', 'b:1'))
+        pool.release(pooled_a)
+        pool.release(pooled_b)
+        with mock.patch.object(balancer, 'choose', return_value='a:1'):
+            self.assertIs(pool.acquire(), pooled_a)
+
+    def test_idle_session_of_another_server_is_used_when_full(self):
+        balancer = LoadBalancer(['a:1', 'b:1'])
+        pool = SessionPool(FakeSession, 1, balancer=balancer)
+        with mock.patch.object(balancer, 'choose', return_value='a:1'):
+            pooled = pool.acquire()
+        pool.release(pooled)
+        with mock.patch.object(balancer, 'choose', return_value='b:1'):
+            self.assertIs(pool.acquire(), pooled)
+
+    def test_connection_failure_counts_as_an_error(self):
+        def broken_factory(server):
+            raise RuntimeError('cannot connect')
+        balancer = LoadBalancer(['a:1'], eject_errors=1)
+        pool = SessionPool(broken_factory, 1, balancer=balancer)
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
+        self.assertTrue(balancer.stats()['a:1']['ejected'])
+        self.assertEqual(balancer.stats()['a:1']['in_flight'], 0)
@@ -0,0 +1,156 @@
+import unittest
+from unittest import mock
+
+from example.models import VirtualCharacter, Figure, Source, Love
+from nebula_carina.models.errors import VertexDoesNotExistError
+from nebula_carina.models.model_builder import ModelBuilder
+from nebula_carina.models.models import EdgeModel, VertexModel
+from nebula_carina.ngql.connection.connection import run_ngql
+from nebula_carina.ngql.connection.memory import InMemoryBackend
+from nebula_carina.ngql.errors import NGqlError
+from nebula_carina.ngql.query.conditions import Q
+from nebula_carina.ngql.statements.clauses import Limit, OrderBy
+from nebula_carina.ngql.statements.edge import EdgeDefinition
+from nebula_carina.ngql.schema import data_types
+from nebula_carina.ngql.schema.schema import create_tag_ngql, describe_tag, show_tags
+from nebula_carina.ngql.statements.schema import SchemaField
+from nebula_carina.settings import database_settings
+from nebula_carina.testing import in_memory_backend, record_queries
+
+
+class MaybeSourced(VertexModel):
+    figure: Figure
+    source: Source = None
+
+
+class OtherSpaceCharacter(VertexModel):
+    figure: Figure
+
+    class Meta:
+        space = 'other'
+
+
+def make_character(vid: str, age: int) -> VirtualCharacter:
+    return VirtualCharacter(
+        vid=vid, figure=Figure(name=f'name_{vid}', age=age, valid_until=0), source=Source(name='memory')
+    )
+
+
+class TestInMemoryBackend(unittest.TestCase):
+    def setUp(self):
+        self._backend = in_memory_backend()
+        self.backend = self._backend.__enter__()
+        for i in range(3):
+            make_character(f'char_{i}', 20 + i).save()
+        for dst, times in (('char_1', 1), ('char_2', 2)):
+            EdgeModel(src_vid='char_0', dst_vid=dst, ranking=0, edge_type=Love(way='gun', times=times)).save()
+
+    def tearDown(self):
+        self._backend.__exit__(None, None, None)
+
+    def test_get_and_update(self):
+        character = VirtualCharacter.objects.get('char_1')
+        self.assertEqual((character.figure.name, character.figure.age, character.figure.hp), ('name_char_1', 21, 100))
+        character.figure.age = 30
+        character.save()
+        self.assertEqual(VirtualCharacter.objects.get('char_1').figure.age, 30)
+        with self.assertRaises(VertexDoesNotExistError):
+            VirtualCharacter.objects.get('nobody')
+
+    def test_get_needs_every_tag(self):
+        run_ngql('INSERT VERTEX figure (name, age) VALUES "figure_only": ("name", 1);')
+        for json_results in (False, True):
+            with mock.patch.object(database_settings, 'json_results', json_results):
+                with self.assertRaises(VertexDoesNotExistError):
+                    VirtualCharacter.objects.get('figure_only')
+                self.assertEqual(VirtualCharacter.objects.get('char_0').figure.age, 20)
+
+    def test_in_bulk(self):
+        with mock.patch.object(database_settings, 'max_statement_size', 20), record_queries() as recorder:
+            characters = VirtualCharacter.objects.in_bulk(['char_2', 'nobody', 'char_0', 'char_2'])
+        self.assertEqual(list(characters), ['char_2', 'char_0'])
+        self.assertEqual(characters['char_0'].figure.age, 20)
+        self.assertEqual(characters.missing, ['nobody'])
+        self.assertEqual(recorder.count, 2)
+        characters = VirtualCharacter.objects.get_many(['char_1', 'nobody', 'char_0'])
+        self.assertEqual([character.vid for character in characters], ['char_1', 'char_0'])
+
+    def test_edges(self):
+        results = list(VirtualCharacter.objects.get('char_0').get_out_edge_and_destinations(Love, VirtualCharacter))
+        self.assertEqual(sorted(r['dst'].vid for r in results), ['char_1', 'char_2'])
+        edge, = EdgeModel.objects.find_by_destination('char_2', Love)
+        self.assertEqual((edge.src_vid, edge.edge_type.times), ('char_0', 2))
+        self.assertEqual(len(VirtualCharacter.objects.find_destinations('char_0', Love, distinct=True)), 2)
+
+    def test_conditions_order_and_limit(self):
+        results = ModelBuilder.match(
+            '(v:figure:source)', {'v': VirtualCharacter}, condition=Q(v__figure__age__gte=21),
+            order_by=OrderBy(['-v.figure.age']), limit=Limit(1),
+        )
+        self.assertEqual([r['v'].vid for r in results], ['char_2'])
+
+    def test_json_equals_result_set(self):
+        kwargs = dict(order_by=OrderBy(['id(v)']))
+        thrift = [r['v'] for r in ModelBuilder.match('(v:figure)', {'v': VirtualCharacter}, **kwargs)]
+        json = [r['v'] for r in ModelBuilder.match('(v:figure)', {'v': VirtualCharacter}, as_json=True, **kwargs)]
+        self.assertEqual(json, thrift)
+
+    def test_fetch(self):
+        rows = run_ngql('FETCH PROP ON figure "char_0", "nobody" YIELD figure.age AS age').rows()
+        self.assertEqual([row.values[0].get_iVal() for row in rows], [20])
+
+    def test_delete_with_edge(self):
+        VirtualCharacter.objects.delete(['char_2'])
+        self.assertEqual([e.dst_vid for e in EdgeModel.objects.find_by_source('char_0', Love)], ['char_1'])
+
+    def test_get_optional_tags(self):
+        run_ngql('INSERT VERTEX figure (name, age) VALUES "figure_only": ("name", 9);')
+        for as_json in (False, True):
+            with mock.patch.object(database_settings, 'json_results', as_json):
+                self.assertEqual(MaybeSourced.objects.get('char_1').source, Source(name='memory'))
+                self.assertIsNone(MaybeSourced.objects.get('figure_only').source)
+                self.assertEqual(
+                    [v.source for v in MaybeSourced.objects.get_many(['char_2', 'figure_only'])],
+                    [Source(name='memory'), None]
+                )
+                with self.assertRaises(VertexDoesNotExistError):
+                    VirtualCharacter.objects.get('figure_only')
+
+    def test_delete_edge(self):
+        EdgeModel.objects.delete([EdgeDefinition('char_0', 'char_1')], Love)
+        self.assertEqual([e.dst_vid for e in EdgeModel.objects.find_by_source('char_0', Love)], ['char_2'])
+        # the generic edge model does not tell which edge type to delete
+        with self.assertRaises(ValueError):
+            EdgeModel.objects.delete([EdgeDefinition('char_0', 'char_2')])
+
+    def test_delete_edge_space(self):
+        with mock.patch.object(Love, 'get_space', return_value='other'), \
+                mock.patch('nebula_carina.models.managers.run_ngql') as managers_run_ngql:
+            EdgeModel.objects.delete([EdgeDefinition('char_0', 'char_1')], Love)
+        self.assertEqual(managers_run_ngql.call_args.kwargs['space'], 'other')
+
+    def test_schema(self):
+        run_ngql(create_tag_ngql('person', [SchemaField('name', data_types.FixedString(30), nullable=True)]))
+        self.assertIn('person', show_tags())
+        field, = describe_tag('person')
+        self.assertEqual((field.prop_name, field.nullable), ('name', True))
+
+    def test_errors(self):
+        with self.assertRaises(NGqlError):
+            run_ngql('SHOW HOSTS')
+        with self.assertRaises(NGqlError):
+            run_ngql('MATCH (v) WHERE id(v) == $vid RETURN v')
+
+
+class TestOtherSpace(unittest.TestCase):
+    def test_untyped_edges_of_a_vertex(self):
+        with in_memory_backend(InMemoryBackend([database_settings.default_space, 'other'])):
+            for vid in ('a', 'b'):
+                OtherSpaceCharacter(vid=vid, figure=Figure(name=vid, age=1, valid_until=0)).save()
+            run_ngql('INSERT EDGE love (way, times) VALUES "a"->"b"@0: ("gun", 1);', space='other')
+            a, b = OtherSpaceCharacter.objects.get('a'), OtherSpaceCharacter.objects.get('b')
+            self.assertEqual([e.dst_vid for e in a.get_out_edges()], ['b'])
+            self.assertEqual([e.src_vid for e in b.get_reverse_edges()], ['a'])
+            self.assertEqual([r['dst'].vid for r in a.get_out_edge_and_destinations(None, OtherSpaceCharacter)], ['b'])
+            self.assertEqual(len(EdgeModel.objects.find_between('a', 'b', space='other')), 1)
+            self.assertEqual(EdgeModel.objects.find_between('a', 'b'), [])
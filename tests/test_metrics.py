@@ -0,0 +1,67 @@
+import unittest
+from unittest import mock
+
+from tests import fixtures
+from example.models import VirtualCharacter
+from nebula_carina.hooks import hooked
+from nebula_carina.models.model_builder import ModelBuilder
+from nebula_carina.ngql.connection.connection import LocalSession, prometheus_metrics
+from nebula_carina.ngql.connection.limiter import ConcurrencyLimiter, READ
+from nebula_carina.ngql.connection.metrics import ClientMetrics, Histogram
+from nebula_carina.ngql.errors import QueryRejectedError
+from nebula_carina.ngql.connection.pool import SessionPool
+from nebula_carina.ngql.connection.retry import RetryPolicy, StatementKind, RetryReason
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram(self):
+        histogram = Histogram('latency', 'Latency.', ('space', ), (0.1, 1.))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, 'main')
+        self.assertEqual(histogram.render(), [
+            '# HELP latency Latency.', '# TYPE latency histogram',
+            'latency_bucket{space="main",le="0.1"} 1', 'latency_bucket{space="main",le="1.0"} 2',
+            'latency_bucket{space="main",le="+Inf"} 3', 'latency_sum{space="main"} 5.55',
+            'latency_count{space="main"} 3',
+        ])
+
+    def test_queries_and_decoding(self):
+        metrics, local_session = ClientMetrics(), LocalSession()
+        result_set = fixtures.make_result_set(fixtures.make_vertex_data_set(3))
+        with hooked(metrics), mock.patch.object(local_session, '_run_ngql', return_value=result_set):
+            local_session.run_ngql('MATCH (v) RETURN v', space='main')
+            list(ModelBuilder.decode(result_set, {'v': VirtualCharacter}))
+        text = metrics.render()
+        self.assertIn('nebula_carina_query_seconds_count{space="main",kind="read",outcome="ok"} 1', text)
+        self.assertIn('nebula_carina_query_server_seconds_sum{space="main",kind="read"} 0.0001', text)
+        self.assertIn('nebula_carina_query_rows_bucket{space="main",kind="read",le="10"} 1', text)
+        self.assertIn('nebula_carina_decode_seconds_count{model="VirtualCharacter"} 3', text)
+
+    def test_pool_and_retries(self):
+        pool, retry_policy = SessionPool(object, 2), RetryPolicy()
+        with pool.session() as pooled:
+            pool.renew(pooled)
+        retry_policy.should_retry(StatementKind.READ, RetryReason.CONNECTION, 1)
+        text = ClientMetrics().render(pool, retry_policy)
+        self.assertIn('nebula_carina_pool_checkouts_total 1\n', text)
+        self.assertIn('nebula_carina_pool_checkout_waits_total 0\n', text)
+        self.assertIn('nebula_carina_session_recoveries_total 1\n', text)
+        self.assertIn('nebula_carina_query_retries_total{outcome="retried",kind="read",reason="connection"} 1\n', text)
+
+    def test_limiter(self):
+        limiter = ConcurrencyLimiter(max_reads=1, max_queued=0)
+        gate = limiter.acquire('main', READ)
+        with self.assertRaises(QueryRejectedError):
+            limiter.acquire('main', READ)
+        text = ClientMetrics().render(limiter=limiter)
+        limiter.release(gate)
+        self.assertIn('# TYPE nebula_carina_limiter_in_flight gauge', text)
+        self.assertIn('nebula_carina_limiter_in_flight{space="main",class="read"} 1\n', text)
+        self.assertIn('nebula_carina_limiter_rejected_total{space="main",class="read"} 1\n', text)
+        self.assertIn('nebula_carina_limiter_wait_seconds_total{space="main",class="read"} 0.0\n', text)
+        self.assertNotIn('nebula_carina_limiter', ClientMetrics().render(limiter=ConcurrencyLimiter()))
+
+    def test_prometheus_metrics(self):
+        text = prometheus_metrics()
+        self.assertIn('# TYPE nebula_carina_query_seconds histogram', text)
+        self.assertIn('# TYPE nebula_carina_pool_checkouts_total counter', text)
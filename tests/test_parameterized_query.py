@@ -0,0 +1,94 @@
+import unittest
+from datetime import datetime, date
+from unittest import mock
+
+import pytz
+from nebula3.common import ttypes
+
+from nebula_carina.models import models
+from nebula_carina.models.errors import VertexDoesNotExistError
+from nebula_carina.models.managers import chunk_vids
+from nebula_carina.models.fields import create_nebula_field as _
+from nebula_carina.ngql.query.conditions import Q, RawCondition
+from nebula_carina.ngql.query.match import match
+from nebula_carina.ngql.schema import data_types
+from nebula_carina.ngql.schema.data_types import python_value2ttype
+from nebula_carina.ngql.statements.clauses import Limit
+
+
+class ParamFigure(models.TagModel):
+    name: str = _(data_types.FixedString(30), ..., )
+
+
+class ParamCharacter(models.VertexModel):
+    param_figure: ParamFigure
+
+
+def empty_result():
+    result = mock.MagicMock()
+    result.rows.return_value = []
+    return result
+
+
+class TestParameterizedQuery(unittest.TestCase):
+    def test_condition_compile(self):
+        params = {}
+        condition = (Q(v__id='a') | Q(v__figure__age__gte=18, v__figure__name__in=['x', 'y'])) & -Q(v2__id=3)
+        self.assertEqual(
+            condition.compile(params),
+            '(((id(v) == $q0)) OR ((v.figure.age >= $q1) AND (v.figure.name IN $q2))) AND (NOT ((id(v2) == $q3)))'
+        )
+        self.assertEqual(params, {'q0': 'a', 'q1': 18, 'q2': ['x', 'y'], 'q3': 3})
+        params = {'q0': 'caller', 'q2': 'caller'}
+        self.assertEqual(
+            (Q(v__id='a') & Q(v2__id='b')).compile(params), '((id(v) == $q3)) AND ((id(v2) == $q4))'
+        )
+        self.assertEqual(params, {'q0': 'caller', 'q2': 'caller', 'q3': 'a', 'q4': 'b'})
+        params = {}
+        self.assertEqual(RawCondition('id(v) == $vid', {'vid': 1}).compile(params), 'id(v) == $vid')
+        self.assertEqual(params, {'vid': 1})
+
+    def test_python_value2ttype(self):
+        self.assertEqual(python_value2ttype(True), ttypes.Value(bVal=True))
+        self.assertEqual(python_value2ttype(3), ttypes.Value(iVal=3))
+        self.assertEqual(python_value2ttype('中文'), ttypes.Value(sVal='中文'.encode('utf-8')))
+        self.assertEqual(python_value2ttype(None), ttypes.Value(nVal=ttypes.NullType.__NULL__))
+        self.assertEqual(
+            python_value2ttype([1, 'a']),
+            ttypes.Value(lVal=ttypes.NList(values=[ttypes.Value(iVal=1), ttypes.Value(sVal=b'a')]))
+        )
+        self.assertEqual(python_value2ttype(date(2022, 1, 2)), ttypes.Value(dVal=ttypes.Date(2022, 1, 2)))
+        self.assertEqual(
+            python_value2ttype(pytz.timezone('Asia/Shanghai').localize(datetime(2022, 1, 2, 8, 30))),
+            ttypes.Value(dtVal=ttypes.DateTime(2022, 1, 2, 0, 30, 0, 0))
+        )
+
+    def test_match_binds_condition_values(self):
+        with mock.patch('nebula_carina.ngql.query.match.run_ngql') as run_ngql:
+            match('(v)', 'v', Q(v__id='char_test1'), limit=Limit(1), space='main')
+        run_ngql.assert_called_once_with(
+            'MATCH (v) WHERE (id(v) == $q0) RETURN v LIMIT 1;', space='main', params={'q0': 'char_test1'},
+            timeout=None, coalesce=None
+        )
+
+    def test_manager_template_cache(self):
+        with mock.patch('nebula_carina.models.managers.run_ngql', return_value=empty_result()) as run_ngql:
+            for vid in ('a', 'b'):
+                self.assertEqual(ParamCharacter.objects.find_sources(vid), [])
+        (ngql1, ), kwargs1 = run_ngql.call_args_list[0]
+        (ngql2, ), kwargs2 = run_ngql.call_args_list[1]
+        self.assertEqual(ngql1, 'MATCH (v1:param_figure)-[e]->(v2) WHERE id(v2) == $vid RETURN v1;')
+        self.assertIs(ngql1, ngql2)
+        self.assertEqual((kwargs1['params'], kwargs2['params']), ({'vid': 'a'}, {'vid': 'b'}))
+
+    def test_get_by_fetch(self):
+        with mock.patch('nebula_carina.models.managers.run_ngql', return_value=empty_result()) as run_ngql:
+            with self.assertRaises(VertexDoesNotExistError):
+                ParamCharacter.objects.get('a')
+        (ngql, ), _ = run_ngql.call_args
+        self.assertEqual(ngql, 'FETCH PROP ON param_figure "a" YIELD vertex AS v;')
+
+    def test_chunk_vids(self):
+        self.assertEqual(list(chunk_vids(['aa', 'bb', 'cc', 1], 12)), [['aa', 'bb'], ['cc', 1]])
+        self.assertEqual(list(chunk_vids(['a' * 20], 12)), [['a' * 20]])
+        self.assertEqual(list(chunk_vids([], 12)), [])
@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+
+from nebula_carina.ngql.connection.pipeline import pipeline, find_failed_statement
+from nebula_carina.ngql.errors import NGqlError, PipelineError, QueryTimeoutError
+from nebula_carina.ngql.record.vertex import update_vertex_ngql
+
+
+class TestPipeline(unittest.TestCase):
+    def test_statements_are_sent_together(self):
+        with mock.patch('nebula_carina.ngql.connection.pipeline.run_ngql') as run_ngql:
+            with pipeline(space='main') as p:
+                p.add(update_vertex_ngql('figure', 119, {'age': 40}))
+                p.add('UPDATE VERTEX ON source 119 SET name = "movie"')
+                run_ngql.assert_not_called()
+            run_ngql.assert_called_once_with(
+                'UPDATE VERTEX ON figure 119 SET age = 40; UPDATE VERTEX ON source 119 SET name = "movie";',
+                space='main'
+            )
+
+    def test_nothing_is_sent_on_error(self):
+        with mock.patch('nebula_carina.ngql.connection.pipeline.run_ngql') as run_ngql:
+            with self.assertRaises(ValueError):
+                with pipeline() as p:
+                    p.add('YIELD 1;')
+                    raise ValueError()
+            run_ngql.assert_not_called()
+
+    def test_flush_on_max_statements(self):
+        with mock.patch('nebula_carina.ngql.connection.pipeline.run_ngql') as run_ngql:
+            with pipeline(max_statements=2) as p:
+                for i in range(5):
+                    p.add(f'YIELD {i};')
+            self.assertEqual(run_ngql.call_count, 3)
+
+    def test_error_attribution(self):
+        statements = ['UPDATE VERTEX ON figure 1 SET age = 1;', 'UPDATE VERTEX ON sorce 1 SET name = "x";']
+        self.assertEqual(find_failed_statement("TagNotFound: Tag `sorce' not found", statements), 1)
+        self.assertIsNone(find_failed_statement("SyntaxError: syntax error near `VERTEX'", statements))
+        self.assertIsNone(find_failed_statement('Storage Error: The leader has changed.', statements))
+        with mock.patch(
+                'nebula_carina.ngql.connection.pipeline.run_ngql',
+                side_effect=NGqlError("TagNotFound: Tag `sorce' not found", -1, ' '.join(statements))
+        ):
+            with self.assertRaises(PipelineError) as cm:
+                with pipeline() as p:
+                    for statement in statements:
+                        p.add(statement)
+        self.assertEqual(cm.exception.index, 1)
+        self.assertEqual(cm.exception.ngql, statements[1])
+        self.assertIsInstance(cm.exception, NGqlError)
+        self.assertIsInstance(cm.exception.__cause__, NGqlError)
+
+    def test_timeout_is_not_a_failed_statement(self):
+        timeout = QueryTimeoutError(1, 'UPDATE VERTEX ON figure 1 SET age = 1;')
+        with mock.patch('nebula_carina.ngql.connection.pipeline.run_ngql', side_effect=timeout):
+            with self.assertRaises(QueryTimeoutError) as cm:
+                with pipeline() as p:
+                    p.add(update_vertex_ngql('figure', 1, {'age': 1}))
+        self.assertIs(cm.exception, timeout)
@@ -0,0 +1,57 @@
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from example.models import VirtualCharacter, Figure, Source
+from nebula_carina.ngql.connection.connection import LocalSession
+from nebula_carina.pytest_plugin import nebula_queries
+from nebula_carina.testing import NumQueriesMixin, record_queries, assert_max_queries
+
+
+class TestQueryCounting(NumQueriesMixin, unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(LocalSession(), '_run_ngql')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_record_queries(self):
+        with record_queries() as recorder:
+            LocalSession().run_ngql('SHOW TAGS;', space='main')
+            LocalSession().run_ngql('MATCH (v) WHERE id(v) == $q0 RETURN v;', space='main', params={'q0': 'a'})
+        self.assertEqual(recorder.ngqls, ['SHOW TAGS;', 'MATCH (v) WHERE id(v) == $q0 RETURN v;'])
+        self.assertEqual((len(recorder), recorder.queries[1].params), (2, {'q0': 'a'}))
+        self.assertGreaterEqual(recorder.elapsed, 0)
+        LocalSession().run_ngql('SHOW TAGS;')
+        self.assertEqual(recorder.count, 2)
+
+    def test_assert_num_queries(self):
+        character = VirtualCharacter(vid='a', figure=Figure(name='a', age=1), source=Source(name='b'))
+        with self.assertNumQueries(1):
+            character.insert()
+        with self.assertRaises(AssertionError) as cm:
+            with self.assertNumQueries(0):
+                character.insert()
+        self.assertIn('INSERT VERTEX', str(cm.exception))
+
+    def test_assert_max_queries(self):
+        with assert_max_queries(2):
+            LocalSession().run_ngql('SHOW TAGS;')
+        with self.assertRaises(AssertionError):
+            with self.assertMaxQueries(1):
+                for _ in range(2):
+                    LocalSession().run_ngql('SHOW TAGS;')
+
+    def test_fixture(self):
+        fixture = nebula_queries.__wrapped__()
+        recorder = next(fixture)
+        LocalSession().run_ngql('SHOW TAGS;')
+        self.assertEqual(recorder.count, 1)
+        with self.assertRaises(StopIteration):
+            next(fixture)
+
+    def test_plugin_imports_nothing(self):
+        # loaded by pytest in any project, before the settings of django are configured
+        code = 'import sys, nebula_carina.pytest_plugin; print("nebula_carina.settings" in sys.modules)'
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), 'False')
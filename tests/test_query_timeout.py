@@ -0,0 +1,73 @@
+import contextlib
+import unittest
+from unittest import mock
+
+from nebula3.Exception import IOErrorException
+
+from example.models import VirtualCharacter
+from nebula_carina.models.model_builder import ModelBuilder
+from nebula_carina.ngql.connection.balancer import LoadBalancer
+from nebula_carina.ngql.connection.connection import LocalSession
+from nebula_carina.ngql.connection.pool import SessionPool, read_timeout
+from nebula_carina.ngql.errors import QueryTimeoutError, NGqlError
+from nebula_carina.settings import database_settings
+from tests.test_retry_policy import FakeResult, FakeSession
+
+
+class TestQueryTimeout(unittest.TestCase):
+    def test_read_timeout_sets_and_restores_the_socket_timeout(self):
+        session = mock.Mock()
+        session._connection._timeout = 0
+        socket = session._connection._connection._iprot.trans.getTransport.return_value
+        socket.isOpen.return_value = True
+        with read_timeout(session, 1.5):
+            socket.setTimeout.assert_called_once_with(1500)
+        socket.setTimeout.assert_called_with(None)
+
+    def test_read_timeout_without_the_socket(self):
+        # another version of nebula python, whose connection keeps the socket elsewhere
+        session = mock.Mock(spec=['_connection'])
+        session._connection = mock.Mock(spec=['_timeout'])
+        with read_timeout(session, 1.5):
+            pass
+
+    def test_timeout_abandons_the_session(self):
+        executed, sessions = [], []
+
+        def factory(server):
+            sessions.append(FakeSession([IOErrorException(IOErrorException.E_TIMEOUT, 'timed out'), FakeResult()],
+                                        executed))
+            return sessions[-1]
+        local_session = LocalSession()
+        balancer = LoadBalancer(['a:1'], eject_errors=1)
+        pool = SessionPool(factory, 1, balancer=balancer)
+        with mock.patch.object(local_session, '_pool', pool), mock.patch(
+                'nebula_carina.ngql.connection.connection.read_timeout', lambda *args: contextlib.nullcontext()
+        ):
+            with self.assertRaises(QueryTimeoutError) as cm:
+                local_session.run_ngql('MATCH (v) RETURN v', is_spacial_operation=True, timeout=0.5)
+            self.assertIsInstance(cm.exception, NGqlError)
+            self.assertEqual(cm.exception.timeout, 0.5)
+            # never retried, and the next query gets a new session
+            self.assertEqual(len(executed), 1)
+            self.assertEqual(len(sessions), 2)
+            self.assertIs(pool.acquire().session, sessions[1])
+        # a timeout tells a slow server, not a broken one
+        self.assertFalse(balancer.stats()['a:1']['ejected'])
+
+    def test_timeout_is_passed_down(self):
+        with mock.patch('nebula_carina.ngql.query.match.run_ngql') as run_ngql:
+            list(ModelBuilder.match('(v:figure:source)', {'v': VirtualCharacter}, timeout=2, as_json=False))
+        self.assertEqual(run_ngql.call_args.kwargs['timeout'], 2)
+        with mock.patch('nebula_carina.models.managers.run_ngql') as run_ngql, \
+                mock.patch.object(database_settings, 'json_results', False):
+            VirtualCharacter.objects.find_destinations('char_1', None, timeout=3)
+        self.assertEqual(run_ngql.call_args.kwargs['timeout'], 3)
+
+    def test_default_timeout(self):
+        local_session = LocalSession()
+        with mock.patch.object(database_settings, 'query_timeout', 4), \
+                mock.patch.object(local_session, '_execute', return_value=(FakeResult(), 0, '')) as execute, \
+                mock.patch.object(local_session, '_pool', SessionPool(lambda: FakeSession([], []), 1)):
+            local_session.run_ngql('YIELD 1', is_spacial_operation=True)
+        self.assertEqual(execute.call_args.args[-1], 4)
@@ -0,0 +1,138 @@
+import random
+import unittest
+from unittest import mock
+
+from nebula3.Exception import IOErrorException
+from nebula3.common.ttypes import ErrorCode
+
+from nebula_carina.ngql.connection.balancer import LoadBalancer
+from nebula_carina.ngql.connection.connection import LocalSession
+from nebula_carina.ngql.connection.pool import SessionPool
+from nebula_carina.ngql.connection.retry import classify, StatementKind, RetryPolicy, RetryReason
+from nebula_carina.ngql.errors import NGqlError
+
+
+class FakeResult(object):
+    def __init__(self, code=0, msg=''):
+        self.code, self.msg = code, msg
+
+    def error_code(self):
+        return self.code
+
+    def error_msg(self):
+        return self.msg
+
+
+class FakeSession(object):
+    """
+    answers by the outcomes shared by all the sessions, an exception is raised and marks the session dead
+    """
+
+    def __init__(self, outcomes: list, executed: list):
+        self.outcomes, self.executed = outcomes, executed
+        self.alive = True
+
+    def execute_parameter(self, ngql, params):
+        self.executed.append(ngql)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            self.alive = False
+            raise outcome
+        return outcome
+
+    def ping(self):
+        return self.alive
+
+    def release(self):
+        self.alive = False
+
+
+class TestClassify(unittest.TestCase):
+    def test_classify(self):
+        self.assertEqual(classify('MATCH (v) RETURN v;'), StatementKind.READ)
+        self.assertEqual(classify('GO FROM "a" OVER love YIELD dst(edge) AS d | FETCH PROP ON t $-.d YIELD vertex AS v'),
+                         StatementKind.READ)
+        # the pipe clauses take the kind of the statement they continue
+        self.assertEqual(classify('GO FROM "a" OVER love YIELD edge AS e | LIMIT 3'), StatementKind.READ)
+        self.assertEqual(classify('GO FROM "a" OVER love YIELD edge AS e | ORDER BY $-.e | OFFSET 1'),
+                         StatementKind.READ)
+        self.assertEqual(classify('UPDATE VERTEX ON t "a" SET a = a + 1 YIELD a AS a | LIMIT 1'),
+                         StatementKind.NON_IDEMPOTENT_WRITE)
+        self.assertEqual(classify('INSERT VERTEX t(a) VALUES "a":(1);'), StatementKind.IDEMPOTENT_WRITE)
+        self.assertEqual(classify('DELETE VERTEX "a" WITH EDGE;'), StatementKind.IDEMPOTENT_WRITE)
+        self.assertEqual(classify('UPSERT VERTEX ON t "a" SET a = "times + 1", b = datetime("2021-01-01");'),
+                         StatementKind.IDEMPOTENT_WRITE)
+        self.assertEqual(classify('UPDATE EDGE ON love "a"->"b" SET times = times + 1;'),
+                         StatementKind.NON_IDEMPOTENT_WRITE)
+        self.assertEqual(classify('CREATE TAG t(a int);'), StatementKind.NON_IDEMPOTENT_WRITE)
+        self.assertEqual(classify('CREATE TAG IF NOT EXISTS t(a int);'), StatementKind.IDEMPOTENT_WRITE)
+        # the least safe statement decides
+        self.assertEqual(classify('INSERT VERTEX t() VALUES "a":(); UPDATE VERTEX ON t "a" SET a = a + 1;'),
+                         StatementKind.NON_IDEMPOTENT_WRITE)
+
+    def test_policy(self):
+        policy = RetryPolicy(3, base_delay=0.1, max_delay=0.3, rng=random.Random(0))
+        self.assertTrue(policy.should_retry(StatementKind.READ, RetryReason.CONNECTION, 1))
+        self.assertFalse(policy.should_retry(StatementKind.READ, RetryReason.CONNECTION, 3))
+        self.assertFalse(policy.should_retry(StatementKind.NON_IDEMPOTENT_WRITE, RetryReason.TRANSIENT, 1))
+        self.assertTrue(policy.should_retry(StatementKind.NON_IDEMPOTENT_WRITE, RetryReason.SESSION, 1))
+        self.assertEqual(policy.counters(), {
+            'exhausted.read.connection': 1, 'retried.non_idempotent_write.session': 1,
+            'retried.read.connection': 1, 'unsafe.non_idempotent_write.transient': 1,
+        })
+        self.assertEqual(policy.delay(RetryReason.SESSION, 1), 0)
+        for attempt in range(1, 6):
+            self.assertLessEqual(policy.delay(RetryReason.CONNECTION, attempt), min(0.3, 0.1 * 2 ** (attempt - 1)))
+
+
+class TestRunNgqlRetry(unittest.TestCase):
+    def run_ngql(self, ngql, outcomes):
+        executed = []
+        local_session = LocalSession()
+        pool = SessionPool(
+            lambda server: FakeSession(outcomes, executed), 1, balancer=LoadBalancer(['a:1'], eject_errors=100)
+        )
+        policy = RetryPolicy(3, base_delay=0)
+        with mock.patch.object(local_session, '_pool', pool), mock.patch.object(local_session, '_retry_policy', policy):
+            try:
+                return local_session.run_ngql(ngql, is_spacial_operation=True), executed, policy.counters()
+            except Exception as e:
+                return e, executed, policy.counters()
+
+    def test_read_is_retried_after_connection_errors(self):
+        ok = FakeResult()
+        result, executed, counters = self.run_ngql('MATCH (v) RETURN v', [IOErrorException(), IOErrorException(), ok])
+        self.assertIs(result, ok)
+        self.assertEqual(len(executed), 3)
+        self.assertEqual(counters, {'retried.read.connection': 2})
+
+    def test_non_idempotent_write_is_not_retried_after_connection_error(self):
+        ngql = 'UPDATE EDGE ON love "a"->"b" SET times = times + 1'
+        result, executed, counters = self.run_ngql(ngql, [IOErrorException(), FakeResult()])
+        self.assertIsInstance(result, IOErrorException)
+        self.assertEqual(len(executed), 1)
+        self.assertEqual(counters, {'unsafe.non_idempotent_write.connection': 1})
+
+    def test_expired_session_is_always_retried(self):
+        ngql = 'UPDATE EDGE ON love "a"->"b" SET times = times + 1'
+        result, executed, _ = self.run_ngql(ngql, [FakeResult(-1, 'Session not existed!'), FakeResult()])
+        self.assertEqual(result.error_code(), 0)
+        self.assertEqual(len(executed), 2)
+
+    def test_transient_errors_give_up(self):
+        outcomes = [FakeResult(ErrorCode.E_LEADER_CHANGED, 'leader changed')] * 3
+        result, executed, counters = self.run_ngql('INSERT VERTEX t() VALUES "a":()', outcomes)
+        self.assertIsInstance(result, NGqlError)
+        self.assertEqual(len(executed), 3)
+        self.assertEqual(counters['exhausted.idempotent_write.transient'], 1)
+
+    def test_sessions_do_not_reconnect_by_themselves(self):
+        # nebula python would run the statement again after reconnecting, whatever its kind
+        with mock.patch('nebula_carina.ngql.connection.connection.get_connection_pool') as get_connection_pool:
+            LocalSession.create_session('a:1')
+        self.assertIs(get_connection_pool.return_value.get_session.call_args.kwargs['retry_connect'], False)
+
+    def test_other_errors_are_raised(self):
+        result, executed, counters = self.run_ngql('MATCH (v) RETURN v', [FakeResult(-1004, 'syntax error')])
+        self.assertIsInstance(result, NGqlError)
+        self.assertEqual((len(executed), counters), (1, {}))
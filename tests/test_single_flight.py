@@ -0,0 +1,154 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from tests import fixtures
+from example.models import VirtualCharacter
+from nebula_carina.models.model_builder import ModelBuilder
+from nebula_carina.ngql.connection.connection import LocalSession
+from nebula_carina.ngql.connection.single_flight import SingleFlight, WaitTimeout, freeze
+from nebula_carina.ngql.errors import QueryTimeoutError
+from nebula_carina.settings import database_settings
+
+
+def run_together(func, count: int) -> list:
+    results, threads = [None] * count, []
+    for i in range(count):
+        def work(i=i):
+            try:
+                results[i] = func()
+            except Exception as e:
+                results[i] = e
+        threads.append(threading.Thread(target=work))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_identical_calls_share_one_call(self):
+        single_flight, calls = SingleFlight(), []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.05)
+            return object()
+        results = run_together(lambda: single_flight.do('key', slow), 5)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(single_flight.stats(), {'leaders': 1, 'followers': 4, 'in_flight': 0})
+        # nothing is cached
+        single_flight.do('key', slow)
+        self.assertEqual(len(calls), 2)
+
+    def test_errors_are_shared(self):
+        single_flight = SingleFlight()
+
+        def broken():
+            time.sleep(0.05)
+            raise RuntimeError('broken')
+        results = run_together(lambda: single_flight.do('key', broken), 3)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(single_flight.stats()['in_flight'], 0)
+
+    def test_follower_timeout(self):
+        single_flight, release = SingleFlight(), threading.Event()
+        leader = threading.Thread(target=single_flight.do, args=('key', lambda: release.wait(5)))
+        leader.start()
+        while not single_flight.stats()['in_flight']:
+            time.sleep(0.001)
+        with self.assertRaises(WaitTimeout):
+            single_flight.do('key', lambda: None, timeout=0.01)
+        release.set()
+        leader.join()
+
+    def test_freeze(self):
+        self.assertEqual(freeze({'b': [1, {2}], 'a': 1}), (('a', 1), ('b', (1, frozenset({2})))))
+
+
+class TestCoalescedQueries(unittest.TestCase):
+    def test_run_ngql_coalesces_reads_only(self):
+        local_session = LocalSession()
+        calls = []
+
+        def slow_run(ngql, *args):
+            calls.append(ngql)
+            time.sleep(0.05)
+            return ngql
+        with mock.patch.object(local_session, '_run_ngql', side_effect=slow_run):
+            run_together(lambda: local_session.run_ngql('MATCH (v) RETURN v', coalesce=True), 4)
+            self.assertEqual(len(calls), 1)
+            run_together(lambda: local_session.run_ngql('INSERT VERTEX t() VALUES "a":()', coalesce=True), 2)
+            self.assertEqual(len(calls), 3)
+            # off by default
+            run_together(lambda: local_session.run_ngql('MATCH (v) RETURN v'), 2)
+            self.assertEqual(len(calls), 5)
+
+    def test_follower_waits_no_longer_than_its_timeout(self):
+        local_session, release = LocalSession(), threading.Event()
+
+        def slow_run(ngql, *args):
+            release.wait(5)
+            return ngql
+        with mock.patch.object(local_session, '_run_ngql', side_effect=slow_run):
+            # the leader has no timeout at all
+            leader = threading.Thread(target=local_session.run_ngql, args=('MATCH (v) RETURN v',), kwargs={
+                'coalesce': True
+            })
+            leader.start()
+            while not local_session.single_flight.stats()['in_flight']:
+                time.sleep(0.001)
+            start = time.perf_counter()
+            with self.assertRaises(QueryTimeoutError):
+                local_session.run_ngql('MATCH (v) RETURN v', coalesce=True, timeout=0.05)
+            self.assertLess(time.perf_counter() - start, 1)
+            release.set()
+            leader.join()
+
+    def test_model_followers_wait_no_longer_than_their_timeout(self):
+        release = threading.Event()
+
+        def slow_run_ngql(*args, **kwargs):
+            release.wait(5)
+            return fixtures.make_result_set(fixtures.make_vertex_data_set(1))
+
+        def wait_for_leader(leader: threading.Thread):
+            leader.start()
+            while not LocalSession().single_flight.stats()['in_flight']:
+                time.sleep(0.001)
+
+        def match(**kwargs):
+            return list(ModelBuilder.match('(v:figure:source)', {'v': VirtualCharacter}, coalesce=True, **kwargs))
+        with mock.patch('nebula_carina.ngql.query.match.run_ngql', side_effect=slow_run_ngql):
+            leader = threading.Thread(target=match)
+            wait_for_leader(leader)
+            with self.assertRaises(QueryTimeoutError):
+                match(timeout=0.05)
+            release.set()
+            leader.join()
+        # the managers wait for query_timeout by default
+        release.clear()
+        with mock.patch('nebula_carina.models.managers.run_ngql', side_effect=slow_run_ngql), \
+                mock.patch.object(database_settings, 'coalesce_reads', True), \
+                mock.patch.object(database_settings, 'query_timeout', 0.05):
+            leader = threading.Thread(target=VirtualCharacter.objects.get, args=('char_0', ))
+            wait_for_leader(leader)
+            with self.assertRaises(QueryTimeoutError):
+                VirtualCharacter.objects.get('char_0')
+            release.set()
+            leader.join()
+
+    def test_match_shares_the_decoded_results(self):
+        def slow_run_ngql(*args, **kwargs):
+            time.sleep(0.05)
+            return fixtures.make_result_set(fixtures.make_vertex_data_set(2))
+        with mock.patch('nebula_carina.ngql.query.match.run_ngql', side_effect=slow_run_ngql) as run_ngql:
+            results = run_together(lambda: list(ModelBuilder.match(
+                '(v:figure:source)', {'v': VirtualCharacter}, as_json=False, coalesce=True
+            )), 4)
+        self.assertEqual(run_ngql.call_count, 1)
+        self.assertEqual(run_ngql.call_args.kwargs['coalesce'], False)
+        self.assertTrue(all(result[0]['v'] is results[0][0]['v'] for result in results))
@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from tests import fixtures
+from nebula_carina.hooks import hooked
+from nebula_carina.ngql.connection.connection import LocalSession
+from nebula_carina.ngql.connection.slow_log import fingerprint, SlowQueryLog
+
+
+class TestSlowQueryLog(unittest.TestCase):
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint('MATCH (v) WHERE id(v) IN ["a", "b\\"c"]  RETURN v LIMIT 10;'),
+            'MATCH (v) WHERE id(v) IN [?, ...] RETURN v LIMIT ?;'
+        )
+        self.assertEqual(
+            fingerprint('INSERT EDGE love(way, times) VALUES "a"->"b"@0:("gun", 40), "c"->"d"@1:("x", 4);'),
+            'INSERT EDGE love(way, times) VALUES ?->?@?:(?, ...), ...;'
+        )
+        # the parameters and the names with digits are kept
+        self.assertEqual(
+            fingerprint('MATCH (v1)-[e:love]->(v2) WHERE id(v2) == $q0 RETURN v1'),
+            'MATCH (v1)-[e:love]->(v2) WHERE id(v2) == $q0 RETURN v1'
+        )
+
+    def test_aggregate_and_dump(self):
+        log = SlowQueryLog(0.5)
+        for i in range(1, 101):
+            log.record(f'MATCH (v) WHERE id(v) == "{i}" RETURN v', i / 100, server_elapsed=i / 200)
+        log.record('SHOW TAGS;', 0.1, error=True)
+        fast, = [item for item in log.dump() if item['fingerprint'] == 'SHOW TAGS;']
+        self.assertEqual((fast['count'], fast['errors'], fast['slow']), (1, 1, 0))
+        item = log.dump()[0]
+        self.assertEqual(item['fingerprint'], 'MATCH (v) WHERE id(v) == ? RETURN v')
+        self.assertEqual((item['count'], item['slow']), (100, 51))
+        self.assertEqual((item['p50_seconds'], item['p99_seconds'], item['max_seconds']), (0.51, 1, 1))
+        self.assertEqual(item['server_p99_seconds'], 0.5)
+        self.assertEqual(item['example'], 'MATCH (v) WHERE id(v) == "1" RETURN v')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'slow.jsonl')
+            log.write(path)
+            with open(path) as f:
+                self.assertEqual([json.loads(line) for line in f], log.dump())
+
+    def test_slow_queries_are_logged(self):
+        log = SlowQueryLog(0.5)
+        with self.assertLogs('nebula_carina.slow_query', 'WARNING') as cm:
+            log.record('MATCH (v) RETURN v', 0.6, server_elapsed=0.55, space='main')
+            log.record('MATCH (v) RETURN v', 0.1)
+        self.assertEqual(len(cm.records), 1)
+        self.assertEqual(cm.records[0].fingerprint, 'MATCH (v) RETURN v')
+        self.assertEqual(cm.records[0].server_elapsed, 0.55)
+
+    def test_fingerprints_are_bounded(self):
+        log = SlowQueryLog(max_fingerprints=2)
+        for tag in ('a', 'b', 'a', 'c'):
+            log.record(f'FETCH PROP ON {tag} "x" YIELD vertex AS v', 0.1)
+        self.assertEqual({item['fingerprint'].split()[3] for item in log.dump()}, {'a', 'c'})
+
+    def test_run_ngql_records(self):
+        local_session, log = LocalSession(), SlowQueryLog()
+        result_set = fixtures.make_result_set(fixtures.make_vertex_data_set(1))
+        with hooked(log), mock.patch.object(local_session, '_run_ngql', return_value=result_set):
+            local_session.run_ngql('MATCH (v) WHERE id(v) == "a" RETURN v', space='main')
+        item, = log.dump()
+        self.assertEqual(item['count'], 1)
+        self.assertEqual(item['server_p50_seconds'], 0.0001)
@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+
+from tests import fixtures
+from example.models import VirtualCharacter, Figure, Source
+from nebula_carina import tracing
+from nebula_carina.hooks import get_hooks
+from nebula_carina.models.models import EdgeModel
+from nebula_carina.ngql.connection.connection import LocalSession
+from nebula_carina.testing import in_memory_backend
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.exporter = tracing.InMemorySpanExporter()
+        tracing.set_exporter(self.exporter)
+
+    def tearDown(self):
+        tracing.set_exporter(None)
+
+    def test_nested_spans(self):
+        with tracing.span('outer', a=1) as outer:
+            with tracing.span('inner') as inner:
+                self.assertIs(tracing.current_span(), inner)
+            self.assertIs(tracing.current_span(), outer)
+        self.assertEqual([span.name for span in self.exporter.spans], ['inner', 'outer'])
+        self.assertEqual((inner.parent_id, inner.trace_id), (outer.span_id, outer.span_id))
+        self.assertEqual(outer.attributes, {'a': 1})
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            with tracing.span('failing'):
+                raise ValueError
+        self.assertIsInstance(self.exporter.find('failing')[0].error, ValueError)
+
+    def test_get_out_edge_and_destinations(self):
+        result_set = fixtures.make_result_set(fixtures.make_edge_data_set(3))
+        character = VirtualCharacter.model_construct(vid='char_0')
+        with mock.patch.object(LocalSession(), '_run_ngql', return_value=result_set):
+            results = list(character.get_out_edge_and_destinations(None, VirtualCharacter))
+        self.assertEqual(len(results), 3)
+        match, = self.exporter.find('nebula_carina.match')
+        build, = self.exporter.find('nebula_carina.build')
+        execute, = self.exporter.find('nebula_carina.execute')
+        decode, = self.exporter.find('nebula_carina.decode')
+        self.assertEqual((build.parent_id, execute.parent_id, decode.parent_id), (match.span_id, ) * 3)
+        self.assertEqual(match.attributes['models'], {'e': 'EdgeModel', 'v2': 'VirtualCharacter'})
+        self.assertEqual(execute.attributes['fingerprint'].split()[0], 'MATCH')
+        self.assertEqual((execute.attributes['rows'], decode.attributes['rows']), (3, 3))
+        values = self.exporter.find('nebula_carina.model.decode')
+        self.assertEqual(len(values), 6)
+        self.assertTrue(all(value.parent_id == decode.span_id for value in values))
+        self.assertEqual({value.attributes['model'] for value in values}, {EdgeModel.__name__, 'VirtualCharacter'})
+
+    def test_manager_get(self):
+        with in_memory_backend():
+            VirtualCharacter(vid='char_0', figure=Figure(name='a', age=1), source=Source(name='b')).save()
+            self.exporter.clear()
+            self.assertEqual(VirtualCharacter.objects.get('char_0').vid, 'char_0')
+            self.assertEqual(len(VirtualCharacter.objects.find_destinations('char_0', None)), 0)
+        fetch, match = self.exporter.find('nebula_carina.fetch') + self.exporter.find('nebula_carina.match')
+        self.assertEqual(fetch.attributes['models'], {'v': 'VirtualCharacter'})
+        for parent, method in ((fetch, 'fetch'), (match, 'find_destinations')):
+            children = [span for span in self.exporter.spans if span.parent_id == parent.span_id]
+            self.assertEqual(
+                [span.name for span in children],
+                ['nebula_carina.build', 'nebula_carina.execute', 'nebula_carina.decode']
+            )
+            self.assertEqual(children[0].attributes['method'], method)
+        decode = self.exporter.find('nebula_carina.decode')[0]
+        self.assertEqual(decode.attributes['rows'], 1)
+        value, = self.exporter.find('nebula_carina.model.decode')
+        self.assertEqual(value.parent_id, decode.span_id)
+
+    def test_nothing_without_exporter(self):
+        tracing.set_exporter(None)
+        self.assertNotIn(tracing._hook, get_hooks())
+        with tracing.span('ignored') as span:
+            self.assertIsNone(span)
+        self.assertEqual(self.exporter.spans, [])